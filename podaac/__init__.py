@@ -0,0 +1,79 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''The podaacpy clients and their helpers. Each name is imported from its \
+module on first use, so that ``import podaac`` stays cheap and a job \
+only pays for the dependencies it actually uses. Python versions before \
+3.7 import the clients eagerly instead::
+
+    import podaac
+    client = podaac.Podaac()
+'''
+
+import importlib
+import sys
+
+# name -> module it is imported from
+_LAZY = {
+    'Podaac': 'podaac',
+    'L2SS': 'l2ss',
+    'MCC': 'mcc',
+    'OceanColor': 'oceancolor',
+    'Drive': 'drive',
+    'PodaacUtils': 'podaac_utils',
+    'AsyncTransport': 'aio',
+    'AsyncPodaac': 'aio',
+    'AsyncL2SS': 'aio',
+    'AsyncOceanColor': 'aio',
+    'Transport': 'transport',
+    'ResponseCache': 'cache',
+    'HostThrottle': 'throttle',
+    'RetryPolicy': 'retry',
+    'MetricsRegistry': 'metrics',
+    'PollingStrategy': 'polling',
+    'GranuleInventory': 'inventory',
+    'SpatialIndex': 'spatial',
+}
+
+_SUBMODULES = ['aio', 'atom', 'availability', 'cache', 'download', 'drive', 'extract',
+               'inventory', 'l2ss', 'mcc', 'metrics', 'oceancolor', 'opendap', 'paging',
+               'podaac', 'podaac_utils', 'polling', 'records', 'retry', 'spatial', 'subset',
+               'throttle', 'transport']
+
+__all__ = sorted(_LAZY)
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is ignored before Python 3.7, so the
+    # clients are imported now; the asyncio ones need Python 3.6 syntax
+    for _name, _module in sorted(_LAZY.items()):
+        if _module != 'aio' or sys.version_info >= (3, 6):
+            globals()[_name] = getattr(importlib.import_module('.' + _module, __name__), _name)
+    __all__ = [_name for _name in __all__ if _name in globals()]
+    del _name, _module
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | set(_SUBMODULES))
@@ -0,0 +1,23 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The standard library URL helpers under their Python 3 names. Importing
+# them directly is much cheaper than going through the future shims.
+try:
+    from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
+except ImportError:  # Python 2
+    from urllib import urlencode
+    from urlparse import parse_qsl, urlparse, urlsplit, urlunsplit
+
+__all__ = ['parse_qsl', 'urlencode', 'urlparse', 'urlsplit', 'urlunsplit']
@@ -0,0 +1,990 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Asyncio twins of the :class:`podaac.podaac.Podaac`, \
+:class:`podaac.l2ss.L2SS` and :class:`podaac.oceancolor.OceanColor` \
+clients. Every method takes the same parameters as its blocking \
+counterpart and returns the same value, but is a coroutine, so a single \
+event loop can drive hundreds of concurrent searches and metadata \
+fetches. Requires Python 3.6+ and aiohttp (``pip install podaacpy[aio]``).'''
+
+import asyncio
+import json
+import ntpath
+import os
+import queue
+import sys
+import tempfile
+import time
+from io import BytesIO
+import defusedxml.ElementTree as ET
+import requests
+from requests.utils import get_encoding_from_headers
+from . import atom, download, extract
+from ._compat import urlencode, urlparse
+from .cache import normalize_url
+from .l2ss import L2SS
+from .oceancolor import HEADERS as OCEANCOLOR_HEADERS, OceanColor
+from .podaac import HEADERS, Podaac, _ddx_variables, _subset_granule_name
+from .polling import PollingStrategy
+from .metrics import request_size
+from .paging import merge_pages
+from .records import BatchResults
+from .throttle import HostThrottle, host
+from .retry import RetryPolicy
+from .subset import SubsetResult, load_request
+from .transport import Client, _cached_response
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency
+    aiohttp = None
+
+
+class AsyncTransport:
+
+    def __init__(self, limit=100, limit_per_host=10, max_retries=3, backoff_factor=0.5,
+                 timeout=None, session=None, cache=None, throttle=None, retry=None,
+                 metrics=None):
+        '''The asyncio counterpart of :class:`podaac.transport.Transport`. \
+                It wraps one :class:`aiohttp.ClientSession` whose connector \
+                caps the number of open connections, in total and per host. \
+                Responses are read in full and handed back as \
+                :class:`requests.Response` objects, so status handling and \
+                error types are the same as with the blocking clients.
+
+        :param limit: maximum number of simultaneous connections.
+        :type limit: :mod:`int`
+
+        :param limit_per_host: maximum number of simultaneous connections \
+                to a single host.
+        :type limit_per_host: :mod:`int`
+
+        :param max_retries: number of times idempotent requests are retried \
+                on connection errors and on 408, 429, 500, 502, 503 and 504 \
+                responses. Ignored when `retry` is given.
+        :type max_retries: :mod:`int`
+
+        :param backoff_factor: backoff factor, in seconds, applied between \
+                retries. Ignored when `retry` is given.
+        :type backoff_factor: :mod:`float`
+
+        :param timeout: default total timeout, in seconds, for every \
+                request. None waits forever.
+        :type timeout: :mod:`float`
+
+        :param session: an existing session to use instead of a new one. \
+                It is created on first use otherwise, inside the running loop.
+        :type session: :class:`aiohttp.ClientSession`
+
+        :param cache: an optional :class:`podaac.cache.ResponseCache`, \
+                used exactly as by :class:`podaac.transport.Transport`.
+        :type cache: :class:`podaac.cache.ResponseCache`
+
+        :param throttle: an optional :class:`podaac.throttle.HostThrottle`, \
+                applied to every attempt of every request. It may also be \
+                shared with blocking transports.
+        :type throttle: :class:`podaac.throttle.HostThrottle`
+
+        :param retry: the :class:`podaac.retry.RetryPolicy` deciding which \
+                failed requests are sent again. It may also be shared with \
+                blocking transports.
+        :type retry: :class:`podaac.retry.RetryPolicy`
+
+        :param metrics: an optional :class:`podaac.metrics.MetricsRegistry`, \
+                used exactly as by :class:`podaac.transport.Transport`.
+        :type metrics: :class:`podaac.metrics.MetricsRegistry`
+        '''
+        if aiohttp is None and session is None:
+            raise ImportError("The asyncio clients require aiohttp: pip install podaacpy[aio]")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.retry = retry if retry is not None else \
+            RetryPolicy(max_retries=max_retries, backoff_factor=backoff_factor)
+        self.timeout = timeout
+        self.cache = cache
+        self.metrics = metrics
+        self.throttle = throttle
+        self.session = session
+        self._hosts = {}
+
+    def _session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self.session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def request(self, method, url, endpoint=None, retry=None, **kwargs):
+        '''Sends a request and reads the whole response body.
+
+        :param method: HTTP method, e.g. 'GET' or 'POST'.
+        :type method: :mod:`string`
+
+        :param url: the URL to request.
+        :type url: :mod:`string`
+
+        :param endpoint: name of the service endpoint being called, e.g. \
+                'granule_metadata'. It selects the cache time to live.
+        :type endpoint: :mod:`string`
+
+        :param retry: a policy used for this request instead of the \
+                transport's, e.g. to retry a read-only POST.
+        :type retry: :class:`podaac.retry.RetryPolicy`
+
+        :returns: a :class:`requests.Response`.
+        '''
+        if retry is not None:
+            kwargs['_retry'] = retry
+        if self.metrics is None:
+            return await self._request(method, url, endpoint, kwargs)
+        started = time.time()
+        try:
+            response = await self._request(method, url, endpoint, kwargs)
+        except Exception as error:
+            self.metrics.observe_request(method, url, endpoint, None, time.time() - started,
+                                         request_size(kwargs), error)
+            raise
+        self.metrics.observe_request(method, url, endpoint, response, time.time() - started,
+                                     request_size(kwargs))
+        return response
+
+    async def _request(self, method, url, endpoint, kwargs):
+        ttl = self.cache.ttl(endpoint) if self.cache is not None and endpoint else None
+        if ttl is None or method != 'GET':
+            return await self._send(method, url, kwargs)
+
+        key = normalize_url(url, kwargs.get('params'))
+        entry = self.cache.lookup(key)
+        if entry is not None and entry.expires > time.time():
+            return _cached_response(entry, url)
+        if entry is not None:
+            headers = dict(kwargs.get('headers') or {})
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+            kwargs['headers'] = headers
+        response = await self._send(method, url, kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, ttl)
+            return _cached_response(entry, url)
+        if response.status_code == 200:
+            self.cache.store(key, response, ttl)
+        return response
+
+    async def _send(self, method, url, kwargs):
+        if kwargs.get('timeout') is not None and aiohttp is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=kwargs['timeout'])
+        policy = kwargs.pop('_retry', self.retry)
+        retries = policy.retries(method)
+        attempts = []
+        for attempt in range(retries + 1):
+            result = error = None
+            try:
+                result = await self._attempt(method, url, kwargs)
+            except _network_errors() as failure:
+                error = requests.exceptions.ConnectionError(failure)
+            if attempt == retries or not policy.retryable(result, error):
+                break
+            attempts.append((result, error))
+            await asyncio.sleep(policy.backoff(attempt, result))
+        policy.record(attempts, result, error)
+        if error is not None:
+            raise error
+        result.retries = len(attempts)
+        return result
+
+    async def _attempt(self, method, url, kwargs):
+        if self.throttle is None:
+            return await self._fetch(method, url, kwargs)
+        key = host(url)
+        if key not in self._hosts:
+            self._hosts[key] = asyncio.Semaphore(self.throttle.max_in_flight or sys.maxsize)
+        async with self._hosts[key]:
+            await asyncio.sleep(self.throttle.start(url))
+            result = None
+            try:
+                result = await self._fetch(method, url, kwargs)
+            finally:
+                self.throttle.finish(url, result)
+            return result
+
+    async def _fetch(self, method, url, kwargs):
+        kwargs = dict(kwargs)
+        consume = kwargs.pop('_consume', None)
+        chunk_size = kwargs.pop('_chunk_size', download.CHUNK_SIZE)
+        async with self._session().request(method, url, **kwargs) as response:
+            if consume is None or response.status >= 400:
+                body = await response.read()
+                return _response(response, body)
+            # a streamed body is handed to `consume`, once per attempt
+            result = _response(response, False)
+            result.consumed = await consume(response.content.iter_chunked(chunk_size))
+            return result
+
+    async def get(self, url, **kwargs):
+        '''Sends a GET request.'''
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        '''Sends a POST request.'''
+        return await self.request('POST', url, **kwargs)
+
+    async def download(self, url, path, chunk_size=download.CHUNK_SIZE, headers=None):
+        '''Streams `url` into a `.part` file next to `path` and renames it \
+                once the transfer is complete.
+
+        :param url: the URL to download.
+        :type url: :mod:`string`
+
+        :param path: destination file path.
+        :type path: :mod:`string`
+
+        :param chunk_size: number of bytes read from the network at a time.
+        :type chunk_size: :mod:`int`
+
+        :param headers: extra request headers.
+        :type headers: :mod:`dict`
+
+        :returns: the number of bytes received.
+        '''
+        async def write(chunks):
+            received = 0
+            with open(path + '.part', 'wb') as f:
+                async for chunk in chunks:
+                    received += len(chunk)
+                    f.write(chunk)
+            return received
+
+        # sent like every other request, so that it is throttled, retried and measured
+        response = await self.request('GET', url, headers=headers, _consume=write,
+                                      _chunk_size=chunk_size)
+        response.raise_for_status()
+        os.rename(path + '.part', path)
+        return response.consumed
+
+    async def fetch_zip(self, url, path='', members=None, spool_size=None,
+                        chunk_size=extract.CHUNK_SIZE, headers=None):
+        '''Async counterpart of :func:`podaac.extract.fetch_zip`: the \
+                members are extracted on a worker thread while the body \
+                streams in, and the archive itself is never written to disk.
+
+        :param url: the URL of the zip archive.
+        :type url: :mod:`string`
+
+        :param path: directory into which the members are extracted.
+        :type path: :mod:`string`
+
+        :param members: names of the members to extract. None extracts every member.
+        :type members: :mod:`list`
+
+        :param spool_size: when given, spool the archive and extract it once \
+                complete, keeping at most this many bytes in memory.
+        :type spool_size: :mod:`int`
+
+        :param chunk_size: number of bytes read from the network at a time.
+        :type chunk_size: :mod:`int`
+
+        :param headers: extra request headers.
+        :type headers: :mod:`dict`
+
+        :returns: the paths of the extracted files, in archive order.
+        '''
+        async def unzip(chunks):
+            return await _extract_chunks(chunks, path, members, spool_size)
+
+        response = await self.request('GET', url, headers=headers, _consume=unzip,
+                                      _chunk_size=chunk_size)
+        response.raise_for_status()
+        return response.consumed
+
+    async def close(self):
+        '''Closes the session, every pooled connection and the cache.'''
+        if self.session is not None:
+            await self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def _network_errors():
+    if aiohttp is None:
+        return (asyncio.TimeoutError, OSError)
+    return (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def _response(response, body):
+    result = requests.Response()
+    result.status_code = response.status
+    result.reason = response.reason
+    result.url = str(response.url)
+    result.headers.update(response.headers)
+    result.encoding = get_encoding_from_headers(result.headers)
+    result._content = body
+    return result
+
+
+async def _checked(transport, method, url, **kwargs):
+    try:
+        response = await transport.request(method, url, **kwargs)
+        status_codes = [404, 400, 503, 408]
+        if response.status_code in status_codes:
+            response.raise_for_status()
+
+    except requests.exceptions.HTTPError as error:
+        print(error)
+        raise
+
+    return response
+
+
+async def _gather_pages(fetch_page, total_results, start_index, items_per_page, max_workers):
+    '''Async counterpart of :func:`podaac.paging.fetch_remaining_pages`.'''
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def bounded(index):
+        async with semaphore:
+            return await fetch_page(index)
+
+    indexes = range(start_index + items_per_page, total_results, items_per_page)
+    return await asyncio.gather(*[bounded(index) for index in indexes])
+
+
+async def _poll(polling, token, fetch_job):
+    '''Async counterpart of :meth:`podaac.polling.PollingStrategy.poll`.'''
+    state = (polling if polling is not None else PollingStrategy()).start(token)
+    while True:
+        job = await fetch_job()
+        if state.update(job['status']):
+            return job
+        await asyncio.sleep(state.next_delay())
+
+
+async def _extract_chunks(chunks, path, members=None, spool_size=None):
+    '''Extracts a zip archive arriving as an async iterable of byte \
+            chunks with :mod:`podaac.extract`, which runs in an executor.'''
+    loop = asyncio.get_event_loop()
+    if spool_size is not None:
+        with tempfile.SpooledTemporaryFile(max_size=spool_size) as spool:
+            async for chunk in chunks:
+                spool.write(chunk)
+            spool.seek(0)
+            return await loop.run_in_executor(None, extract.extract_file, spool, path, members)
+
+    # a bounded queue, so that the download never runs far ahead of the extractor
+    feed = queue.Queue(maxsize=4)
+    extracting = loop.run_in_executor(None, extract.extract_stream, iter(feed.get, None),
+                                      path, members)
+
+    async def send(chunk):
+        put = loop.run_in_executor(None, feed.put, chunk)
+        await asyncio.wait([put, extracting], return_when=asyncio.FIRST_COMPLETED)
+        if not extracting.done():
+            return True
+        # nothing reads the queue any more: empty it to release a blocked put
+        while not feed.empty():
+            feed.get_nowait()
+        await put
+        return False
+
+    try:
+        async for chunk in chunks:
+            if not await send(chunk):
+                break
+        else:
+            await send(None)
+    except BaseException:
+        if not extracting.done():
+            await send(None)
+        await asyncio.wait([extracting])
+        if not extracting.cancelled():
+            extracting.exception()
+        raise
+    return await extracting
+
+
+class AsyncClient(Client):
+    '''The asyncio lifecycle of the service clients: :meth:`close` is a \
+            coroutine and the clients are used in async with blocks. A \
+            client closes the transport it created, and leaves a shared \
+            one open.'''
+
+    async def close(self):
+        '''Closes the transport of the client if the client created it.'''
+        if self._owns_transport:
+            await self.transport.close()
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with the asyncio clients.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncPodaac(AsyncClient, Podaac):
+
+    def __init__(self, transport=None):
+        '''Sets the base WebServices URL to https://podaac.jpl.nasa.gov/ws/
+
+        :param transport: a shared :class:`AsyncTransport`. A private \
+                transport is created when none is given.
+        :type transport: :class:`AsyncTransport`
+        '''
+        self.URL = 'https://podaac.jpl.nasa.gov/ws/'
+        self._use_transport(transport, AsyncTransport)
+
+    async def dataset_metadata(self, dataset_id='', short_name='', _format='iso'):
+        '''See :meth:`podaac.podaac.Podaac.dataset_metadata`.'''
+        url = self._dataset_metadata_url(dataset_id, short_name, _format)
+        response = await _checked(self.transport, 'GET', url, headers=HEADERS,
+                                  endpoint='dataset_metadata')
+        return response.text
+
+    async def dataset_search(self, keyword='', start_time='', end_time='', start_index='',
+                             dataset_id='', short_name='', instrument='', satellite='',
+                             file_format='', status='', process_level='', sort_by='', bbox='',
+                             items_per_page='50', _format='atom', full='False', parse=False):
+        '''See :meth:`podaac.podaac.Podaac.dataset_search`.'''
+        if parse and _format != 'atom':
+            raise ValueError("parse=True requires the 'atom' format.")
+        url = self._dataset_search_url(keyword, start_time, end_time, start_index, dataset_id,
+                                       short_name, instrument, satellite, file_format, status,
+                                       process_level, sort_by, bbox, items_per_page, _format, full)
+        response = await _checked(self.transport, 'GET', url, headers=HEADERS)
+        if parse:
+            return self._parse('dataset_search', atom.parse_results, response.content,
+                               response.encoding, atom.dataset_from_entry)
+        return response.text
+
+    async def dataset_search_all(self, keyword='', start_time='', end_time='', dataset_id='',
+                                 short_name='', instrument='', satellite='', file_format='',
+                                 status='', process_level='', sort_by='', bbox='',
+                                 items_per_page='400', full='False', max_workers=4):
+        '''See :meth:`podaac.podaac.Podaac.dataset_search_all`.'''
+        async def fetch_page(start_index):
+            url = self._dataset_search_url(
+                keyword, start_time, end_time, str(start_index), dataset_id, short_name,
+                instrument, satellite, file_format, status, process_level, sort_by, bbox,
+                items_per_page, 'atom', full)
+            response = await _checked(self.transport, 'GET', url, headers=HEADERS)
+            return self._parse('dataset_search', atom.parse_results, response.content,
+                               response.encoding, atom.dataset_from_entry)
+
+        return await self._fetch_all_pages_async(fetch_page, int(items_per_page), max_workers)
+
+    async def _fetch_all_pages_async(self, fetch_page, items_per_page, max_workers):
+        first = await fetch_page(0)
+        return merge_pages([first] + await _gather_pages(
+            fetch_page, first.total_results or 0, 0, items_per_page, max_workers))
+
+    async def dataset_variables(self, dataset_id, parse=False):
+        '''See :meth:`podaac.podaac.Podaac.dataset_variables`.'''
+        dataset_url = ""
+        url = self._granule_search_url(dataset_id, '', '', '', '', 'timeAsc', '1', 'atom')
+        dataset = await _checked(self.transport, 'GET', url, headers=HEADERS,
+                                 endpoint='dataset_variables')
+        granule = next(atom.Feed(BytesIO(dataset.content)).granules(), None)
+        if granule is not None and granule.opendap_url:
+            dataset_url = granule.opendap_url.replace('html', 'ddx')
+        try:
+            response = await _checked(self.transport, 'GET', dataset_url, headers=HEADERS,
+                                      endpoint='dataset_variables')
+        except requests.exceptions.HTTPError:
+            print("It's likely that variable search is not available for your dataset. " +
+                  "Please see https://github.com/nasa/podaacpy/issues/128")
+            raise
+        dataset_variables = _ddx_variables(
+            self._parse('dataset_variables', ET.fromstring, response.content))
+        if parse:
+            return dataset_variables
+        return [variable.name for variable in dataset_variables]
+
+    async def granule_opendap(self, opendap_url, variables=None, index=None):
+        '''See :meth:`podaac.podaac.Podaac.granule_opendap`.'''
+        from . import opendap
+        shapes = None
+        if opendap.needs_shapes(variables, index):
+            dds = opendap.check(await self.transport.get(
+                opendap.dds_url(opendap_url, variables), headers=HEADERS,
+                endpoint='granule_opendap'))
+            shapes = opendap.shapes(self._parse('granule_opendap', opendap.parse_dds, dds.text))
+        url = opendap.request_url(opendap_url, variables, index, shapes)
+        response = opendap.check(await self.transport.get(url, headers=HEADERS,
+                                                          endpoint='granule_opendap'))
+        return self._parse('granule_opendap', opendap.decode, response.content)
+
+    async def granule_opendap_all(self, opendap_urls, variable, index=None, bbox=None,
+                                  max_workers=8, out=None, fill_value=None, callback=None):
+        '''See :meth:`podaac.podaac.Podaac.granule_opendap_all`.'''
+        from . import opendap
+        aggregator = opendap.Aggregator(opendap_urls, variable, index, bbox, out, fill_value,
+                                        callback)
+        workers = asyncio.Semaphore(max(1, max_workers))
+
+        async def get(url):
+            return opendap.check(await self.transport.get(url, headers=HEADERS,
+                                                          endpoint='granule_opendap'))
+
+        for url in aggregator.urls:
+            try:
+                located = aggregator.describe(url, (await get(opendap.dds_url(url))).text)
+                if located is not None:
+                    aggregator.locate((await get(located)).content)
+                break
+            except (EnvironmentError, opendap.DAPError) as error:
+                aggregator.failed(url, error)
+
+        async def fetch(position, url, slab):
+            async with workers:
+                try:
+                    aggregator.store(position, url, (await get(slab)).content)
+                except Exception as error:
+                    aggregator.failed(url, error)
+
+        await asyncio.gather(*[fetch(position, url, slab)
+                               for position, url, slab in aggregator.slabs()])
+        return aggregator.result()
+
+    async def granule_metadata(self, dataset_id='', short_name='', granule_name='',
+                               _format='iso'):
+        '''See :meth:`podaac.podaac.Podaac.granule_metadata`.'''
+        url = self._granule_metadata_url(dataset_id, short_name, granule_name, _format)
+        response = await _checked(self.transport, 'GET', url, headers=HEADERS,
+                                  endpoint='granule_metadata')
+        return response.text
+
+    async def granule_metadata_all(self, granule_names, dataset_id='', short_name='',
+                                   _format='iso', max_workers=8, throttle=None, parse=True,
+                                   callback=None):
+        '''See :meth:`podaac.podaac.Podaac.granule_metadata_all`.'''
+        granule_names = list(granule_names)
+        urls = [self._granule_metadata_url(dataset_id, short_name, name, _format)
+                for name in granule_names]
+        shared = getattr(self.transport, 'throttle', None)
+        if throttle is None and shared is None:
+            throttle = HostThrottle()
+        elif throttle is shared:
+            # the transport already throttles every request
+            throttle = None
+        workers = asyncio.Semaphore(max(1, max_workers))
+        hosts = {}
+        started = time.time()
+        results = BatchResults()
+
+        async def get(url):
+            if throttle is None:
+                return await self.transport.get(url, headers=HEADERS, endpoint='granule_metadata')
+            key = host(url)
+            if key not in hosts:
+                hosts[key] = asyncio.Semaphore(throttle.max_in_flight or len(urls) or 1)
+            async with hosts[key]:
+                await asyncio.sleep(throttle.start(url))
+                response = None
+                try:
+                    response = await self.transport.get(url, headers=HEADERS,
+                                                        endpoint='granule_metadata')
+                finally:
+                    throttle.finish(url, response)
+                return response
+
+        async def fetch(name, url):
+            async with workers:
+                try:
+                    response = await get(url)
+                    response.raise_for_status()
+                    results[name] = self._parse('granule_metadata', ET.fromstring,
+                                                response.content) if parse else response.text
+                except Exception as error:
+                    results.errors[name] = error
+            if callback is not None:
+                callback(name, results.get(name), results.errors.get(name))
+
+        await asyncio.gather(*[fetch(name, url) for name, url in zip(granule_names, urls)])
+        results.seconds = time.time() - started
+        return results
+
+    async def last24hours_datacasting_granule_md(self, dataset_id='', short_name='',
+                                                 _format='datacasting', items_per_page=50):
+        '''See :meth:`podaac.podaac.Podaac.last24hours_datacasting_granule_md`.'''
+        url = self._granule_metadata_url(dataset_id, short_name, '', _format) + \
+            '&itemsPerPage=' + str(items_per_page)
+        response = await _checked(self.transport, 'GET', url, headers=HEADERS)
+        return response.text
+
+    async def granule_search(self, dataset_id='', start_time='', end_time='', bbox='',
+                             start_index='', sort_by='timeAsc', items_per_page='50',
+                             _format='atom', parse=False):
+        '''See :meth:`podaac.podaac.Podaac.granule_search`.'''
+        if parse and _format != 'atom':
+            raise ValueError("parse=True requires the 'atom' format.")
+        url = self._granule_search_url(dataset_id, start_time, end_time, bbox,
+                                       start_index, sort_by, items_per_page, _format)
+        response = await _checked(self.transport, 'GET', url, headers=HEADERS)
+        if parse:
+            return self._parse('granule_search', atom.parse_results, response.content,
+                               response.encoding)
+        return response.text
+
+    async def granule_search_all(self, dataset_id='', start_time='', end_time='', bbox='',
+                                 sort_by='timeAsc', items_per_page='400', max_workers=4):
+        '''See :meth:`podaac.podaac.Podaac.granule_search_all`.'''
+        async def fetch_page(start_index):
+            url = self._granule_search_url(dataset_id, start_time, end_time, bbox,
+                                           str(start_index), sort_by, items_per_page, 'atom')
+            response = await _checked(self.transport, 'GET', url, headers=HEADERS)
+            return self._parse('granule_search', atom.parse_results, response.content,
+                               response.encoding)
+
+        return await self._fetch_all_pages_async(fetch_page, int(items_per_page), max_workers)
+
+    async def iter_granules(self, dataset_id='', start_time='', end_time='', bbox='',
+                            sort_by='timeAsc', items_per_page='400', prefetch=False):
+        '''Asynchronous generator counterpart of \
+                :meth:`podaac.podaac.Podaac.iter_granules`. With `prefetch` \
+                the next page is requested while the current one is consumed.'''
+        page_size = int(items_per_page)
+        start_index = 0
+        pending = None
+
+        def page_url(index):
+            return self._granule_search_url(dataset_id, start_time, end_time, bbox,
+                                            str(index), sort_by, items_per_page, 'atom')
+        try:
+            while True:
+                if pending is not None:
+                    response = await pending
+                else:
+                    response = await _checked(self.transport, 'GET', page_url(start_index),
+                                              headers=HEADERS)
+                pending = None
+                next_index = start_index + page_size
+                feed = atom.Feed(BytesIO(response.content))
+                granules = list(feed.granules())
+                if prefetch and len(granules) == page_size and \
+                        (feed.total_results is None or feed.total_results > next_index):
+                    pending = asyncio.ensure_future(_checked(
+                        self.transport, 'GET', page_url(next_index), headers=HEADERS))
+                for granule in granules:
+                    yield granule
+                if len(granules) < page_size or \
+                        (feed.total_results is not None and next_index >= feed.total_results):
+                    break
+                start_index = next_index
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def granule_preview(self, dataset_id='', image_variable='', path=''):
+        '''See :meth:`podaac.podaac.Podaac.granule_preview`.'''
+        if dataset_id == '':
+            raise Exception("Required dataset_id")
+        granules = await self.granule_search(dataset_id=dataset_id, bbox='-180,-90,180,90',
+                                             parse=True)
+        url_template = next((granule.preview_url for granule in granules
+                             if granule.preview_url), '')
+        if url_template == '':
+            raise Exception("Preview Image not available for this dataset.")
+        if path == '':
+            path = os.path.join(os.path.dirname(__file__), dataset_id + '.png')
+        else:
+            path = path + '/' + dataset_id + '.png'
+        response = await _checked(self.transport, 'GET',
+                                  url_template + '/' + image_variable + '.png')
+        with open(path, 'wb') as image:
+            image.write(response.content)
+        return image
+
+    async def granule_subset(self, input_file_path, path='', polling=None, members=None,
+                             spool_size=None):
+        '''See :meth:`podaac.podaac.Podaac.granule_subset`.'''
+        with open(input_file_path) as data:
+            token = await self._submit_subset(json.load(data))
+        subset_response_json = await _poll(polling, token, lambda: self._subset_job(token))
+        if subset_response_json['status'] != "done":
+            raise Exception("Unexpected error during subset job, post your issue to the "
+                            "PO.DAAC forum https://podaac.jpl.nasa.gov/forum/")
+
+        download_url = subset_response_json['resultURLs'][0]
+        granule_paths = await self._fetch_subset_result(download_url, path, members=members,
+                                                        spool_size=spool_size)
+        granule_name = _subset_granule_name(granule_paths, download_url, path, members)
+        print("Podaacpy completed granule subset task for granule '%s'. "
+              "Granule available at '%s'." % (granule_name, path))
+        return granule_name
+
+    async def granule_subset_all(self, subset_requests, path='', max_jobs=4, download_workers=4,
+                                 callback=None, polling=None):
+        '''See :meth:`podaac.podaac.Podaac.granule_subset_all`. Every job \
+                is polled by its own task.'''
+        subset_requests = list(subset_requests)
+        jobs = asyncio.Semaphore(max(1, max_jobs))
+        downloads = asyncio.Semaphore(max(1, download_workers))
+
+        async def run_job(subset_request):
+            started = time.time()
+            token = None
+            try:
+                async with jobs:
+                    token = await self._submit_subset(load_request(subset_request))
+                    job = await _poll(polling, token, lambda: self._subset_job(token))
+                if job['status'] == 'done':
+                    async with downloads:
+                        granules = await self._fetch_subset_result(job['resultURLs'][0], path)
+                    result = SubsetResult(subset_request, token, job['status'], granules, None,
+                                          time.time() - started)
+                else:
+                    error = Exception("Subset job '%s' ended with status '%s'."
+                                      % (token, job['status']))
+                    result = SubsetResult(subset_request, token, job['status'], [], error,
+                                          time.time() - started)
+            except Exception as error:
+                result = SubsetResult(subset_request, token, 'failed', [], error,
+                                      time.time() - started)
+            if callback is not None:
+                callback(result)
+            return result
+
+        return list(await asyncio.gather(*[run_job(subset_request)
+                                           for subset_request in subset_requests]))
+
+    async def _submit_subset(self, subset_request):
+        params = urlencode({'query': json.dumps(subset_request)})
+        headers = {
+            "Content-type": "application/x-www-form-urlencoded", "Accept": "*"}
+        response = await self.transport.post(
+            self.URL + "subset/granule?request=submit", data=params, headers=headers)
+        return json.loads(response.text)['token']
+
+    async def _subset_job(self, token):
+        response = await self.transport.get(self.URL + "subset/status?token=" + token,
+                                            headers=HEADERS)
+        return json.loads(response.text)
+
+    async def _fetch_subset_result(self, download_url, path, members=None, spool_size=None):
+        return await self.transport.fetch_zip(download_url, path, members=members,
+                                              spool_size=spool_size, headers=HEADERS)
+
+    async def subset_status(self, token=''):
+        '''See :meth:`podaac.podaac.Podaac.subset_status`.'''
+        return (await self._subset_job(token))['status']
+
+    async def extract_l4_granule(self, dataset_id='', path=''):
+        '''See :meth:`podaac.podaac.Podaac.extract_l4_granule`. The \
+                granule is downloaded as a single stream.'''
+        granules = await self.granule_search(dataset_id=dataset_id, start_index='1', parse=True)
+        if not granules or not granules[0].drive_url:
+            raise Exception("No granule available for dataset '%s'." % dataset_id)
+        url = granules[0].drive_url
+        granule_name = granules[0].name
+        compressed_granule = ntpath.basename(url)
+        if path == '':
+            compressed_path = os.path.join(os.path.dirname(__file__), compressed_granule)
+        else:
+            compressed_path = path + '/' + compressed_granule
+        await self.transport.download(url, compressed_path, headers=HEADERS)
+        if compressed_granule.endswith('.gz'):
+            await asyncio.get_event_loop().run_in_executor(
+                None, download.gunzip_file, compressed_path, path + '/' + granule_name)
+        return granule_name
+
+
+class AsyncL2SS(AsyncClient, L2SS):
+
+    def __init__(self, transport=None):
+        ''' Sets the base L2SS URL to https://podaac-tools.jpl.nasa.gov/l2ss-services/l2ss/
+
+            :param transport: a shared :class:`AsyncTransport`. A private \
+                transport is created when none is given.
+            :type transport: :class:`AsyncTransport`
+        '''
+        self.URL = 'https://podaac-tools.jpl.nasa.gov/l2ss-services/l2ss/'
+        self._use_transport(transport, AsyncTransport)
+
+    async def dataset_search(self, dataset_id='', variable=None, sensor=None, provider=None,
+                             start_time='', end_time='', start_index='', items_per_page='50'):
+        ''' See :meth:`podaac.l2ss.L2SS.dataset_search`.'''
+        url = self._dataset_search_url(dataset_id, variable, sensor, provider,
+                                       start_time, end_time, start_index, items_per_page)
+        return (await _checked(self.transport, 'GET', url)).text
+
+    async def dataset_variables(self, dataset_id):
+        ''' See :meth:`podaac.l2ss.L2SS.dataset_variables`.'''
+        url = self.URL + '/dataset/variable?datasetId=' + dataset_id
+        return (await _checked(self.transport, 'GET', url,
+                               endpoint='l2ss_dataset_variables')).text
+
+    async def granule_search(self, dataset_id='', bbox='', start_time='', end_time='',
+                             name='', sort='', start_index='', items_per_page='50'):
+        ''' See :meth:`podaac.l2ss.L2SS.granule_search`.'''
+        url = self._granule_search_url(dataset_id, bbox, start_time, end_time,
+                                       name, sort, start_index, items_per_page)
+        return (await _checked(self.transport, 'GET', url)).text
+
+    async def granule_search_all(self, dataset_id='', bbox='', start_time='', end_time='',
+                                 name='', sort='', items_per_page='400', max_workers=4):
+        ''' See :meth:`podaac.l2ss.L2SS.granule_search_all`.'''
+        async def fetch_page(start_index):
+            url = self._granule_search_url(dataset_id, bbox, start_time, end_time,
+                                           name, sort, str(start_index), items_per_page)
+            return (await _checked(self.transport, 'GET', url)).json()
+
+        result = await fetch_page(0)
+        total_results = int(result['response']['numFound'])
+        for page in await _gather_pages(fetch_page, total_results, 0, int(items_per_page),
+                                        max_workers):
+            result['response']['docs'].extend(page['response']['docs'])
+        return result
+
+    async def granules_availability(self, dataset_id='', start_time='', end_time='', gap='',
+                                    bbox=''):
+        ''' See :meth:`podaac.l2ss.L2SS.granules_availability`.'''
+        url = self._granules_availability_url(dataset_id, start_time, end_time, gap, bbox)
+        return (await _checked(self.transport, 'GET', url)).text
+
+    async def granules_availability_timeline(self, dataset_id='', start_time='', end_time='',
+                                             gap='DAY', bbox='', chunk_bins=None, max_workers=4):
+        ''' See :meth:`podaac.l2ss.L2SS.granules_availability_timeline`.'''
+        matrix = await self.granules_availability_matrix(
+            [(dataset_id, bbox)], start_time, end_time, gap, chunk_bins, max_workers)
+        from . import availability
+        return availability.Timeline(matrix.times, matrix.counts[0])
+
+    async def granules_availability_matrix(self, queries, start_time='', end_time='', gap='DAY',
+                                           chunk_bins=None, max_workers=4):
+        ''' See :meth:`podaac.l2ss.L2SS.granules_availability_matrix`.'''
+        from . import availability
+        queries = list(queries)
+        windows = availability.chunks(start_time, end_time, gap, chunk_bins)
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def fetch(query):
+            dataset_id, bbox = query if isinstance(query, tuple) else (query, '')
+
+            async def fetch_window(window):
+                async with semaphore:
+                    return self._parse('granules_availability', availability.parse,
+                                       await self.granules_availability(
+                                           dataset_id=dataset_id, start_time=window[0],
+                                           end_time=window[1], gap=gap, bbox=bbox))
+            return availability.concatenate(
+                await asyncio.gather(*[fetch_window(window) for window in windows]))
+
+        timelines = await asyncio.gather(*[fetch(query) for query in queries])
+        return availability.merge(timelines, queries)
+
+    async def granule_preview_image(self, dataset_id, granule, year, day, variable, path=''):
+        ''' See :meth:`podaac.l2ss.L2SS.granule_preview_image`.'''
+        url = self.URL + 'preview/' + dataset_id + '/' + year + \
+            '/' + day + '/' + granule + '/' + variable + '.png'
+        if path:
+            path = path + '/' + dataset_id + '.png'
+        else:
+            path = os.path.join(os.path.dirname(__file__), dataset_id + '.png')
+        response = await _checked(self.transport, 'GET', url)
+        with open(path, 'wb') as image_file:
+            image_file.write(response.content)
+        return response
+
+    async def image_palette(self, palette_name):
+        ''' See :meth:`podaac.l2ss.L2SS.image_palette`.'''
+        url = self.URL + 'palettes/' + palette_name + '.json'
+        return (await _checked(self.transport, 'GET', url)).text
+
+    async def granule_download(self, query_string, path='', polling=None, members=None,
+                               spool_size=None):
+        ''' See :meth:`podaac.l2ss.L2SS.granule_download`.'''
+        params = urlencode({'query': query_string})
+        headers = {
+            "Content-type": "application/x-www-form-urlencoded", "Accept": "*"}
+        response = await self.transport.post(self.URL + "subset/submit", data=params,
+                                             headers=headers)
+        token = json.loads(response.text)['token']
+
+        async def fetch_job():
+            response = await self.transport.get(self.URL + "subset/status?token=" + token)
+            return json.loads(response.text)
+
+        subset_response_json = await _poll(polling, token, fetch_job)
+        status = subset_response_json['status']
+        if status == "partial error":
+            raise Exception(
+                "The job was done but with some errors, please submit the job again")
+        if status != "done":
+            raise Exception(
+                "Unexpected error occured for the subset job you have requested")
+
+        print("Done! downloading the dataset zip .....")
+        download_url = subset_response_json['resultURLs'][0]
+        return await self.transport.fetch_zip(download_url, path, members=members,
+                                              spool_size=spool_size)
+
+    async def subset_status(self, token):
+        ''' See :meth:`podaac.l2ss.L2SS.subset_status`.'''
+        try:
+            response = await self.transport.get(self.URL + 'subset/status?token=' + token)
+            status = json.loads(response.text)['status']
+            if status == "unknown":
+                raise Exception("Invalid Token : Please check your token")
+
+        except Exception as e:
+            print(e)
+            raise
+
+        return status
+
+
+class AsyncOceanColor(AsyncClient, OceanColor):
+
+    def __init__(self, transport=None):
+        '''Sets the OBPG file search URL to https://oceandata.sci.gsfc.nasa.gov/api/file_search
+
+        :param transport: a shared :class:`AsyncTransport`. A private \
+                transport is created when none is given.
+        :type transport: :class:`AsyncTransport`
+        '''
+        self.SEARCH_URL = 'https://oceandata.sci.gsfc.nasa.gov/api/file_search?'
+        self._use_transport(transport, AsyncTransport)
+
+    async def file_search(self, sensor='', sdate='', edate='', dtype='', add_url='1',
+                          results_as_file='1', search='', sub_id='', std_only='1', cksum='',
+                          output_format='json'):
+        '''See :meth:`podaac.oceancolor.OceanColor.file_search`.'''
+        url = self._file_search_url(sensor, sdate, edate, dtype, add_url, results_as_file,
+                                    search, sub_id, std_only, cksum, output_format)
+        response = await _checked(self.transport, 'POST', url, headers=OCEANCOLOR_HEADERS,
+                                  retry=self.transport.retry.allowing('POST'))
+        return str(response.text)
+
+    async def get_file(self, url='', path=''):
+        '''See :meth:`podaac.oceancolor.OceanColor.get_file`. The file is \
+                downloaded as a single stream.'''
+        if not url:
+            raise Exception("'file' parameter is required!")
+        file = os.path.basename(urlparse(url).path)
+        if path == '':
+            path = os.path.join(os.path.dirname(__file__), file)
+        else:
+            path = path + '/' + file
+        await self.transport.download(url, path, headers=OCEANCOLOR_HEADERS)
+        print("Downloaded '%s' to '%s'" % (file, path))
+        return file
@@ -0,0 +1,225 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from io import BytesIO
+import defusedxml.ElementTree as ET
+from .records import Dataset, Granule, Results
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+OPENSEARCH = '{http://a9.com/-/spec/opensearch/1.1/}'
+PODAAC = '{https://podaac.jpl.nasa.gov/opensearch/}'
+GEORSS = '{http://www.georss.org/georss}'
+GML = '{http://www.opengis.net/gml}'
+TIME = '{http://a9.com/-/opensearch/extensions/time/1.0/}'
+
+ENTRY = ATOM + 'entry'
+LINK = ATOM + 'link'
+
+
+class Feed:
+
+    def __init__(self, source):
+        '''Incremental reader for a PO.DAAC OpenSearch Atom feed. The feed \
+                is parsed with iterparse as entries are consumed, and every \
+                entry is freed once it has been handed to the caller, so \
+                memory stays flat however long the feed is. The OpenSearch \
+                header values are populated as soon as the parser has read \
+                past them, which is always before the first entry.
+
+        :param source: a file-like object (e.g. a streamed response body), \
+                the Atom document itself as a string or bytes, or a path \
+                to the Atom document.
+        :type source: :mod:`file`
+        '''
+        if isinstance(source, bytes) or \
+                (isinstance(source, type(u'')) and source.lstrip().startswith(u'<')):
+            if not isinstance(source, bytes):
+                source = source.encode('utf-8')
+            source = BytesIO(source)
+        self.source = source
+        self.total_results = None
+        self.start_index = None
+        self.items_per_page = None
+
+    def entries(self):
+        '''Yields each Atom entry element of the feed. An element is only \
+                valid until the next one is requested.
+        '''
+        root = None
+        for event, element in ET.iterparse(self.source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            if element.tag == ENTRY:
+                yield element
+                root.remove(element)
+            elif element.tag == OPENSEARCH + 'totalResults':
+                self.total_results = _int(element.text)
+            elif element.tag == OPENSEARCH + 'startIndex':
+                self.start_index = _int(element.text)
+            elif element.tag == OPENSEARCH + 'itemsPerPage':
+                self.items_per_page = _int(element.text)
+
+    def granules(self):
+        '''Yields a :class:`podaac.records.Granule` for each entry of the feed.'''
+        for entry in self.entries():
+            yield granule_from_entry(entry)
+
+    def datasets(self):
+        '''Yields a :class:`podaac.records.Dataset` for each entry of the feed.'''
+        for entry in self.entries():
+            yield dataset_from_entry(entry)
+
+
+def mine_links(response, match):
+    '''Returns the href of every entry link containing `match`, in \
+            document order, reading the feed in a single incremental pass.
+
+    :param response: a granule search response, as accepted by :class:`Feed`.
+    :type response: :mod:`string`
+
+    :param match: substring the link href must contain.
+    :type match: :mod:`string`
+
+    :returns: a list of URLs.
+    '''
+    if not response:
+        return []
+    return [href for entry in Feed(response).entries()
+            for href in (link.get('href') for link in entry.iter(LINK))
+            if href and match in href]
+
+
+def mine_titles(response):
+    '''Returns the title of every entry of a feed, in document order.
+
+    :param response: a granule search response, as accepted by :class:`Feed`.
+    :type response: :mod:`string`
+
+    :returns: a list of titles.
+    '''
+    if not response:
+        return []
+    return [entry.findtext(ATOM + 'title') for entry in Feed(response).entries()]
+
+
+def parse_results(content, encoding=None, record=None):
+    '''Parses a whole Atom response in a single pass.
+
+    :param content: the response body.
+    :type content: :mod:`bytes`
+
+    :param encoding: encoding of the body, used when the raw text is requested.
+    :type encoding: :mod:`string`
+
+    :param record: callable building a record from an entry element. \
+            Defaults to :func:`granule_from_entry`.
+    :type record: :mod:`callable`
+
+    :returns: a :class:`podaac.records.Results` of records.
+    '''
+    record = record or granule_from_entry
+    feed = Feed(BytesIO(content))
+    records = [record(entry) for entry in feed.entries()]
+    return Results(records, content, encoding, feed.total_results,
+                   feed.start_index, feed.items_per_page)
+
+
+def granule_from_entry(entry):
+    '''Builds a compact :class:`podaac.records.Granule` from a granule \
+            search Atom entry element.
+
+    :param entry: an Atom entry element.
+    :type entry: :class:`xml.etree.ElementTree.Element`
+
+    :returns: a :class:`podaac.records.Granule`.
+    '''
+    links = tuple((link.get('title'), link.get('href')) for link in entry.iter(LINK))
+    opendap_url = drive_url = preview_url = None
+    for title, href in links:
+        if title == 'OPeNDAP URL':
+            opendap_url = href
+        elif title == 'Preview Image':
+            preview_url = href
+        elif title == 'HTTP URL' or (href and '/drive/files/' in href):
+            drive_url = href
+    return Granule(
+        name=entry.findtext(ATOM + 'title'),
+        dataset_id=entry.findtext(PODAAC + 'datasetId'),
+        short_name=entry.findtext(PODAAC + 'shortName'),
+        start_time=entry.findtext(TIME + 'start'),
+        end_time=entry.findtext(TIME + 'end'),
+        updated=entry.findtext(ATOM + 'updated'),
+        opendap_url=opendap_url,
+        drive_url=drive_url,
+        preview_url=preview_url,
+        box=_box(entry),
+        links=links,
+        footprint=_footprint(entry))
+
+
+def dataset_from_entry(entry):
+    '''Builds a compact :class:`podaac.records.Dataset` from a dataset \
+            search Atom entry element.
+
+    :param entry: an Atom entry element.
+    :type entry: :class:`xml.etree.ElementTree.Element`
+
+    :returns: a :class:`podaac.records.Dataset`.
+    '''
+    return Dataset(
+        dataset_id=entry.findtext(PODAAC + 'datasetId'),
+        short_name=entry.findtext(PODAAC + 'shortName'),
+        title=entry.findtext(ATOM + 'title'),
+        start_time=entry.findtext(TIME + 'start'),
+        end_time=entry.findtext(TIME + 'end'),
+        updated=entry.findtext(ATOM + 'updated'),
+        box=_box(entry),
+        links=tuple((link.get('title'), link.get('href')) for link in entry.iter(LINK)))
+
+
+def _box(entry):
+    box = entry.findtext(GEORSS + 'box')
+    if box:
+        return tuple(float(value) for value in box.split())
+    return None
+
+
+def _footprint(entry):
+    # GeoRSS lists coordinates as latitude longitude pairs
+    polygons = []
+    for polygon in entry.iter(GEORSS + 'polygon'):
+        polygons.append((_ring(polygon.text),))
+    for polygon in entry.iter(GML + 'Polygon'):
+        rings = []
+        for ring in polygon.iter(GML + 'LinearRing'):
+            positions = ring.findtext(GML + 'posList') or \
+                ' '.join(position.text for position in ring.iter(GML + 'pos'))
+            rings.append(_ring(positions))
+        polygons.append(tuple(ring for ring in rings if ring))
+    polygons = tuple(polygon for polygon in polygons if polygon and polygon[0])
+    return polygons or None
+
+
+def _ring(text):
+    values = [float(value) for value in (text or '').split()]
+    return tuple(zip(values[1::2], values[0::2]))
+
+
+def _int(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,175 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Typed, vectorized views of the L2SS granules availability service. \
+        This module requires NumPy.'''
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+import json
+import numpy as np
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+FACET = 'Granule-StartTime'
+# Bins requested by one call when a long range is split into chunks.
+CHUNK_BINS = {'DAY': 366, 'MONTH': 120, 'YEAR': 50}
+
+Timeline = namedtuple('Timeline', ['times', 'counts'])
+Timeline.__doc__ = '''Granule counts of one dataset: `times` is a \
+        datetime64[s] array holding the start of every bin, in order, and \
+        `counts` an int64 array of the same length.'''
+
+AvailabilityMatrix = namedtuple('AvailabilityMatrix', ['labels', 'times', 'counts'])
+AvailabilityMatrix.__doc__ = '''Granule counts of several datasets or \
+        bounding boxes on one aligned time axis: `counts[i, j]` is the \
+        count of `labels[i]` in the bin starting at `times[j]`. Bins a \
+        query reported nothing for hold 0.'''
+
+Gaps = namedtuple('Gaps', ['rows', 'starts', 'ends', 'bins'])
+Gaps.__doc__ = '''Runs of consecutive empty bins. `rows` holds the row \
+        of each run in the counts, `starts` and `ends` the start times of \
+        its first and last empty bin, and `bins` its length in bins.'''
+
+
+def parse(text):
+    '''Parses a granules_availability() response into a :class:`Timeline`.
+
+    :param text: the json response of granules_availability().
+    :type text: :mod:`string`
+
+    :returns: a :class:`Timeline`.
+    '''
+    facets = json.loads(text)['facet_counts']['facet_dates'][FACET]
+    # the facet also holds its 'gap', 'start' and 'end' parameters
+    keys = [key for key in facets if key[:1].isdigit()]
+    times = np.array([key.rstrip('Z') for key in keys], dtype='datetime64[s]')
+    counts = np.array([facets[key] for key in keys], dtype=np.int64)
+    order = np.argsort(times, kind='stable')
+    return Timeline(times[order], counts[order])
+
+
+def concatenate(timelines):
+    '''Joins the timelines of consecutive chunks into one, keeping a \
+            single bin where chunks share a bin start.'''
+    timelines = list(timelines)
+    if not timelines:
+        return Timeline(np.array([], dtype='datetime64[s]'), np.array([], dtype=np.int64))
+    times = np.concatenate([timeline.times for timeline in timelines])
+    counts = np.concatenate([timeline.counts for timeline in timelines])
+    times, first = np.unique(times, return_index=True)
+    return Timeline(times, counts[first])
+
+
+def merge(timelines, labels=None):
+    '''Aligns several timelines on the union of their bins.
+
+    :param timelines: the :class:`Timeline` of every dataset or bbox.
+    :type timelines: :mod:`list`
+
+    :param labels: a label per timeline. Defaults to their positions.
+    :type labels: :mod:`list`
+
+    :returns: an :class:`AvailabilityMatrix`.
+    '''
+    timelines = list(timelines)
+    labels = list(labels) if labels is not None else list(range(len(timelines)))
+    if timelines:
+        times = np.unique(np.concatenate([timeline.times for timeline in timelines]))
+    else:
+        times = np.array([], dtype='datetime64[s]')
+    counts = np.zeros((len(timelines), len(times)), dtype=np.int64)
+    for row, timeline in enumerate(timelines):
+        counts[row, np.searchsorted(times, timeline.times)] = timeline.counts
+    return AvailabilityMatrix(labels, times, counts)
+
+
+def find_gaps(times, counts, min_bins=1):
+    '''Finds every run of at least `min_bins` consecutive empty bins, \
+            for all rows at once.
+
+    :param times: the bin start times.
+    :type times: :class:`numpy.ndarray`
+
+    :param counts: the counts, one row per timeline, or a single row.
+    :type counts: :class:`numpy.ndarray`
+
+    :param min_bins: shortest run reported.
+    :type min_bins: :mod:`int`
+
+    :returns: a :class:`Gaps`, ordered by row then time.
+    '''
+    counts = np.atleast_2d(counts)
+    padded = np.zeros((counts.shape[0], counts.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = counts == 0
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+    bins = stops - starts
+    keep = bins >= min_bins
+    return Gaps(rows[keep], times[starts[keep]], times[stops[keep] - 1], bins[keep])
+
+
+def chunks(start_time, end_time, gap, chunk_bins=None):
+    '''Splits a time range into consecutive (start_time, end_time) \
+            windows of whole bins, so that the bins of every window line \
+            up with those of a single request over the whole range. A \
+            range which cannot be split is returned as one window.
+
+    :param start_time: start of the range, YYYY-MM-DDTHH:mm:ssZ.
+    :type start_time: :mod:`string`
+
+    :param end_time: end of the range, YYYY-MM-DDTHH:mm:ssZ.
+    :type end_time: :mod:`string`
+
+    :param gap: the bin size, 'DAY', 'MONTHS' or 'YEARS'.
+    :type gap: :mod:`string`
+
+    :param chunk_bins: number of bins per window. Defaults to CHUNK_BINS.
+    :type chunk_bins: :mod:`int`
+
+    :returns: a list of (start_time, end_time) string pairs.
+    '''
+    unit = gap.upper().rstrip('S')
+    try:
+        start = datetime.strptime(start_time, TIME_FORMAT)
+        end = datetime.strptime(end_time, TIME_FORMAT)
+    except (TypeError, ValueError):
+        return [(start_time, end_time)]
+    if unit not in CHUNK_BINS:
+        return [(start_time, end_time)]
+    size = chunk_bins or CHUNK_BINS[unit]
+    windows = []
+    index = 0
+    while True:
+        lower = _add(start, unit, index * size)
+        if lower >= end:
+            break
+        upper = min(end, _add(start, unit, (index + 1) * size))
+        windows.append((lower.strftime(TIME_FORMAT), upper.strftime(TIME_FORMAT)))
+        index += 1
+    return windows or [(start_time, end_time)]
+
+
+def _add(start, unit, bins):
+    if unit == 'DAY':
+        return start + timedelta(days=bins)
+    months = start.month - 1 + bins * (12 if unit == 'YEAR' else 1)
+    year, month = start.year + months // 12, months % 12 + 1
+    # clamp the day to the end of shorter months
+    day = start.day
+    while True:
+        try:
+            return start.replace(year=year, month=month, day=day)
+        except ValueError:
+            day -= 1
@@ -0,0 +1,174 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from ._compat import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DAY = 24 * 60 * 60
+
+# Seconds a response stays fresh, per endpoint. Metadata documents are
+# effectively immutable, so they are kept for a long time and revalidated
+# with ETag/Last-Modified once they expire.
+DEFAULT_TTLS = {
+    'dataset_metadata': 7 * DAY,
+    'granule_metadata': 30 * DAY,
+    'dataset_variables': 7 * DAY,
+    'l2ss_dataset_variables': 7 * DAY,
+}
+
+CacheEntry = namedtuple('CacheEntry', [
+    'status', 'headers', 'body', 'etag', 'last_modified', 'expires'])
+
+
+def normalize_url(url, params=None):
+    '''Returns a canonical cache key for a request URL: scheme and host \
+            are lower-cased, the fragment is dropped and the query \
+            parameters, including `params`, are sorted.
+
+    :param url: the request URL.
+    :type url: :mod:`string`
+
+    :param params: extra query parameters sent with the request.
+    :type params: :mod:`dict`
+
+    :returns: the normalized URL.
+    '''
+    scheme, netloc, path, query, _ = urlsplit(url)
+    pairs = parse_qsl(query, keep_blank_values=True)
+    if params:
+        pairs.extend(params.items() if hasattr(params, 'items') else params)
+    return urlunsplit((scheme.lower(), netloc.lower(), path or '/',
+                       urlencode(sorted(pairs)), ''))
+
+
+class ResponseCache:
+
+    def __init__(self, path=None, max_size=256 * 1024 * 1024, ttls=None):
+        '''A persistent HTTP response cache stored in a SQLite database. \
+                Bodies are zlib-compressed, entries expire after a \
+                per-endpoint time to live, stale entries are revalidated \
+                with If-None-Match/If-Modified-Since, and the least \
+                recently used entries are evicted once the cache grows \
+                beyond `max_size`. The cache may be shared between threads.
+
+                Any object providing the same lookup(), store() and \
+                refresh() methods can be plugged into a \
+                :class:`podaac.transport.Transport` instead.
+
+        :param path: path of the SQLite database. Defaults to \
+                ~/.cache/podaacpy/responses.sqlite. Use ':memory:' for a \
+                cache which only lives as long as the process.
+        :type path: :mod:`string`
+
+        :param max_size: maximum total size, in bytes, of the stored bodies.
+        :type max_size: :mod:`int`
+
+        :param ttls: seconds a response stays fresh, per endpoint name. \
+                Only endpoints listed here are cached. Defaults to DEFAULT_TTLS.
+        :type ttls: :mod:`dict`
+        '''
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'podaacpy', 'responses.sqlite')
+        if path != ':memory:' and not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+            os.makedirs(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self.max_size = max_size
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                             'key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, '
+                             'etag TEXT, last_modified TEXT, expires REAL, accessed REAL, '
+                             'size INTEGER)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed '
+                             'ON responses (accessed)')
+
+    def ttl(self, endpoint):
+        '''Returns the time to live of an endpoint, or None if it is not cached.'''
+        return self.ttls.get(endpoint)
+
+    def lookup(self, key):
+        '''Returns the :class:`CacheEntry` stored under `key`, fresh or \
+                stale, or None.'''
+        with self._lock:
+            row = self._db.execute('SELECT status, headers, body, etag, last_modified, expires '
+                                   'FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            with self._db:
+                self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?',
+                                 (time.time(), key))
+        status, headers, body, etag, last_modified, expires = row
+        return CacheEntry(status, json.loads(headers), zlib.decompress(body),
+                          etag, last_modified, expires)
+
+    def store(self, key, response, ttl):
+        '''Stores a successful :class:`requests.Response` under `key` for \
+                `ttl` seconds and evicts least recently used entries if the \
+                cache has grown too large.'''
+        body = zlib.compress(response.content)
+        headers = json.dumps(dict(response.headers))
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO responses '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 (key, response.status_code, headers, sqlite3.Binary(body),
+                                  response.headers.get('ETag'),
+                                  response.headers.get('Last-Modified'),
+                                  now + ttl, now, len(body)))
+                self._evict()
+
+    def refresh(self, key, ttl):
+        '''Marks the entry under `key` fresh for another `ttl` seconds, \
+                after the server confirmed it is unchanged.'''
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute('UPDATE responses SET expires = ?, accessed = ? WHERE key = ?',
+                                 (now + ttl, now, key))
+
+    def size(self):
+        '''Returns the total size, in bytes, of the stored bodies.'''
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def clear(self):
+        '''Removes every entry from the cache.'''
+        with self._lock:
+            with self._db:
+                self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        '''Closes the underlying database.'''
+        with self._lock:
+            self._db.close()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_size:
+            return
+        for key, size in self._db.execute('SELECT key, size FROM responses '
+                                          'ORDER BY accessed ASC').fetchall():
+            if total <= self.max_size:
+                break
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
@@ -0,0 +1,400 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import os
+import threading
+import time
+import zlib
+
+CHUNK_SIZE = 1024 * 1024
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class DownloadResult(namedtuple('DownloadResult',
+                                ['url', 'path', 'size', 'seconds', 'skipped', 'error'])):
+    '''Outcome of a single file download. `size` is the number of bytes \
+            received over the network and `seconds` the wall time spent. \
+            `error` holds the exception of a failed download, or None.'''
+
+    __slots__ = ()
+
+    def __new__(cls, url, path, size, seconds, skipped, error=None):
+        return super(DownloadResult, cls).__new__(cls, url, path, size, seconds, skipped, error)
+
+    @property
+    def throughput(self):
+        '''Bytes per second received for this file.'''
+        return self.size / self.seconds if self.seconds else 0.0
+
+
+class DownloadReport:
+
+    def __init__(self, results, seconds):
+        '''Aggregate outcome of a batch of downloads.
+
+        :param results: the :class:`DownloadResult` of every file, in the \
+                order the files were requested.
+        :type results: :mod:`list`
+
+        :param seconds: wall time spent on the whole batch.
+        :type seconds: :mod:`float`
+        '''
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def size(self):
+        '''Total bytes received over the network.'''
+        return sum(result.size for result in self.results)
+
+    @property
+    def throughput(self):
+        '''Aggregate bytes per second received over the whole batch.'''
+        return self.size / self.seconds if self.seconds else 0.0
+
+    @property
+    def skipped(self):
+        '''Results of the files which were already complete on disk.'''
+        return [result for result in self.results if result.skipped]
+
+    @property
+    def failed(self):
+        '''Results of the files whose download raised an error.'''
+        return [result for result in self.results if result.error is not None]
+
+    def __str__(self):
+        return "%d files, %d skipped, %d failed, %.1f MB in %.1f s (%.2f MB/s)" % (
+            len(self.results), len(self.skipped), len(self.failed), self.size / 1e6,
+            self.seconds, self.throughput / 1e6)
+
+
+def fetch(transport, url, path, decompress=False, segments=1, min_segment_size=SEGMENT_SIZE,
+          chunk_size=CHUNK_SIZE, headers=None, **kwargs):
+    '''Downloads `url` to `path` through a :class:`podaac.transport.Transport`. \
+            Data is written to a `.part` file, next to a small `.json` file \
+            recording the ETag, Last-Modified and length announced by \
+            the server. If a previous transfer was interrupted the `.part` \
+            file is resumed with an HTTP Range request, guarded by If-Range \
+            so that a file which changed on the server is downloaded afresh. \
+            The final length is checked against Content-Length before the \
+            `.part` file is renamed to `path`, so an existing `path` is \
+            always a complete file. Large files can be split into several \
+            byte ranges which are fetched in parallel.
+
+    :param transport: the transport used for every request.
+    :type transport: :class:`podaac.transport.Transport`
+
+    :param url: the URL to download.
+    :type url: :mod:`string`
+
+    :param path: destination file path.
+    :type path: :mod:`string`
+
+    :param decompress: True to gunzip the downloaded file into `path`. \
+            A single stream is decompressed as it arrives and restarts \
+            from byte zero when interrupted; only segmented transfers, \
+            whose byte ranges arrive out of order, keep the compressed \
+            data in a resumable `.gz.part` file until they are complete.
+    :type decompress: :mod:`bool`
+
+    :param segments: number of byte ranges fetched in parallel. Files \
+            smaller than `min_segment_size`, or served without \
+            `Accept-Ranges: bytes`, are fetched as a single stream.
+    :type segments: :mod:`int`
+
+    :param min_segment_size: smallest file, in bytes, which is split into segments.
+    :type min_segment_size: :mod:`int`
+
+    :param chunk_size: number of bytes read from the network at a time.
+    :type chunk_size: :mod:`int`
+
+    :param headers: extra request headers. Any other keyword argument, \
+            e.g. `auth`, is passed on to the transport.
+    :type headers: :mod:`dict`
+
+    :returns: the number of bytes received over the network.
+    '''
+    part_path = path + ('.gz.part' if decompress else '.part')
+    headers = dict(headers or {})
+    # byte offsets are only meaningful on the unencoded body
+    headers['Accept-Encoding'] = 'identity'
+    received = None
+    if segments > 1:
+        head = transport.request('HEAD', url, headers=headers, allow_redirects=True, **kwargs)
+        size = int(head.headers.get('Content-Length') or 0)
+        if head.ok and head.headers.get('Accept-Ranges') == 'bytes' and size >= min_segment_size:
+            received = _fetch_segments(transport, url, part_path, head, size, segments,
+                                       chunk_size, headers, kwargs)
+    if received is None and decompress:
+        return _fetch_gunzip(transport, url, path, chunk_size, headers, kwargs)
+    if received is None:
+        received = _fetch_stream(transport, url, part_path, chunk_size, headers, kwargs)
+
+    if decompress:
+        gunzip_file(part_path, path, chunk_size)
+        os.remove(part_path)
+    else:
+        os.rename(part_path, path)
+    os.remove(part_path + '.json')
+    return received
+
+
+def _fetch_gunzip(transport, url, path, chunk_size, headers, kwargs):
+    # the decompressed data cannot be resumed, so a failed transfer leaves nothing behind
+    response = transport.get(url, headers=headers, stream=True, **kwargs)
+    received = 0
+    try:
+        response.raise_for_status()
+        size = response.headers.get('Content-Length')
+        with open(path + '.part', 'wb') as f:
+            gunzip = _Gunzip(f)
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                gunzip.write(chunk)
+            gunzip.flush()
+        if size is not None and received != int(size):
+            raise IOError("Incomplete download of '%s': received %d of %s bytes."
+                          % (url, received, size))
+    except Exception:
+        if os.path.exists(path + '.part'):
+            os.remove(path + '.part')
+        raise
+    finally:
+        response.close()
+    os.rename(path + '.part', path)
+    return received
+
+
+def _fetch_stream(transport, url, part_path, chunk_size, headers, kwargs):
+    state = _load_state(part_path)
+    if state and 'done' in state:
+        # a preallocated segmented transfer cannot be resumed as a stream
+        state = None
+    offset = os.path.getsize(part_path) if state and os.path.exists(part_path) else 0
+    request_headers = dict(headers)
+    if offset:
+        request_headers['Range'] = 'bytes=%d-' % offset
+        validator = state.get('etag') or state.get('last_modified')
+        if validator:
+            request_headers['If-Range'] = validator
+    response = transport.get(url, headers=request_headers, stream=True, **kwargs)
+    try:
+        if offset and response.status_code == 416 and state.get('size') == offset:
+            # the previous transfer ended just before the rename
+            return 0
+        resumed = offset and response.status_code == 206 and \
+            _content_range(response)[0] == offset and \
+            (not state.get('etag') or state.get('etag') == response.headers.get('ETag'))
+        if offset and not resumed and response.status_code in (206, 416):
+            # the partial file cannot be continued, start again from byte zero
+            os.remove(part_path + '.json')
+            return _fetch_stream(transport, url, part_path, chunk_size, headers, kwargs)
+        response.raise_for_status()
+        if resumed:
+            size = _content_range(response)[1]
+        else:
+            size = response.headers.get('Content-Length')
+            size = int(size) if size is not None else None
+        _save_state(part_path, {'url': url, 'etag': response.headers.get('ETag'),
+                                'last_modified': response.headers.get('Last-Modified'),
+                                'size': size})
+        received = 0
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                f.write(chunk)
+    finally:
+        response.close()
+    if size is not None and os.path.getsize(part_path) != size:
+        raise IOError("Incomplete download of '%s': received %d of %d bytes."
+                      % (url, os.path.getsize(part_path), size))
+    return received
+
+
+def _fetch_segments(transport, url, part_path, head, size, segments, chunk_size, headers, kwargs):
+    etag = head.headers.get('ETag')
+    last_modified = head.headers.get('Last-Modified')
+    state = _load_state(part_path)
+    if not state or state.get('size') != size or state.get('etag') != etag or \
+            state.get('last_modified') != last_modified or 'done' not in state or \
+            not os.path.exists(part_path):
+        step = -(-size // segments)
+        state = {'url': url, 'etag': etag, 'last_modified': last_modified, 'size': size,
+                 'segments': [[start, min(start + step, size) - 1]
+                              for start in range(0, size, step)],
+                 'done': []}
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        _save_state(part_path, state)
+
+    lock = threading.Lock()
+    validator = etag or last_modified
+
+    def fetch_segment(index):
+        start, end = state['segments'][index]
+        request_headers = dict(headers)
+        request_headers['Range'] = 'bytes=%d-%d' % (start, end)
+        if validator:
+            request_headers['If-Range'] = validator
+        response = transport.get(url, headers=request_headers, stream=True, **kwargs)
+        received = 0
+        try:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError("Server did not honour the byte range request for '%s'." % url)
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    received += len(chunk)
+                    f.write(chunk)
+        finally:
+            response.close()
+        if received != end - start + 1:
+            raise IOError("Incomplete segment %d-%d of '%s': received %d bytes."
+                          % (start, end, url, received))
+        with lock:
+            state['done'].append(index)
+            _save_state(part_path, state)
+        return received
+
+    pending = [index for index in range(len(state['segments'])) if index not in state['done']]
+    if not pending:
+        return 0
+    with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+        return sum(executor.map(fetch_segment, pending))
+
+
+def gunzip_file(source, destination, chunk_size=CHUNK_SIZE):
+    '''Decompresses a gzip file chunk by chunk, without ever holding \
+            the whole file in memory.
+
+    :param source: path of the gzip file.
+    :type source: :mod:`string`
+
+    :param destination: path of the decompressed file.
+    :type destination: :mod:`string`
+
+    :param chunk_size: number of bytes decompressed at a time.
+    :type chunk_size: :mod:`int`
+    '''
+    with open(source, 'rb') as compressed, open(destination + '.part', 'wb') as f:
+        gunzip = _Gunzip(f)
+        for chunk in iter(lambda: compressed.read(chunk_size), b''):
+            gunzip.write(chunk)
+        gunzip.flush()
+    os.rename(destination + '.part', destination)
+
+
+class _Gunzip(object):
+    # writes the decompressed bytes of gzip data fed to it chunk by chunk
+
+    def __init__(self, f):
+        self.f = f
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def write(self, chunk):
+        while chunk:
+            self.f.write(self.decompressor.decompress(chunk))
+            chunk = self.decompressor.unused_data
+            if chunk:
+                # concatenated gzip members
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def flush(self):
+        self.f.write(self.decompressor.flush())
+
+
+def _content_range(response):
+    # 'bytes 100-199/200' -> (100, 200)
+    value = response.headers.get('Content-Range', '')
+    try:
+        span, total = value.split(' ', 1)[1].split('/')
+        return int(span.split('-')[0]), (int(total) if total != '*' else None)
+    except (IndexError, ValueError):
+        return None, None
+
+
+def _load_state(part_path):
+    try:
+        with open(part_path + '.json') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _save_state(part_path, state):
+    with open(part_path + '.json', 'w') as f:
+        json.dump(state, f)
+
+
+def download_all(download, items, workers=4, callback=None, raise_errors=False):
+    '''Runs `download` for every item on a pool of worker threads.
+
+    :param download: a callable taking one item and returning its \
+            :class:`DownloadResult`.
+    :type download: :mod:`callable`
+
+    :param items: the items to download.
+    :type items: :mod:`list`
+
+    :param workers: number of concurrent downloads.
+    :type workers: :mod:`int`
+
+    :param callback: optional callable invoked with each \
+            :class:`DownloadResult` as soon as its download finishes.
+    :type callback: :mod:`callable`
+
+    :param raise_errors: True to raise the error of the first failed \
+            item, in the order of `items`, once every download is over.
+    :type raise_errors: :mod:`bool`
+
+    :returns: a :class:`DownloadReport` whose results follow the order of \
+            `items`. A download which raised is recorded in its result, \
+            whose `url` is the item and whose `error` is the exception, \
+            and does not stop the others.
+    '''
+    items = list(items)
+    started = time.time()
+    results = [None] * len(items)
+
+    def run(item):
+        item_started = time.time()
+        try:
+            return download(item)
+        except Exception as error:
+            return DownloadResult(item, None, 0, time.time() - item_started, False, error)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = dict((executor.submit(run, item), index) for index, item in enumerate(items))
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if callback is not None:
+                callback(result)
+    report = DownloadReport(results, time.time() - started)
+    if raise_errors and report.failed:
+        raise report.failed[0].error
+    return report
+
+
+def makedirs(path):
+    '''Creates a directory and its parents if they do not already exist.'''
+    try:
+        from pathlib import Path
+    except ImportError:
+        from pathlib2 import Path  # python 2 backport
+    Path(path).mkdir(parents=True, exist_ok=True)
@@ -11,23 +11,29 @@
 # limitations under the License.
 
 import configparser
-import gzip
 import os
+import time
 import requests
 from requests.auth import HTTPBasicAuth
+from . import atom, download
+from .transport import Client
 
 
-class Drive:
+class Drive(Client):
 
-    def __init__(self, file, username, password, webdav_url='https://podaac-tools.jpl.nasa.gov/drive/files'):
+    def __init__(self, file, username, password, webdav_url='https://podaac-tools.jpl.nasa.gov/drive/files',
+                 transport=None):
         ''' In order to access PODAAC Drive, all users are required to be registered \
            with NASA Earthdata system. User can login to the PODAAC Drive using the \
            following link https://podaac-tools.jpl.nasa.gov/drive/. \
            Once you have authenticated, you will be able to view, retrieve and change \
            your encrypted password. N.B. The encrypted password must then either be entered \
            into `podaac.ini` and passes as an argument to `file`, or alternatively provided \
-           via the `username` parameter.
+           via the `username` parameter. An optional shared \
+           :class:`podaac.transport.Transport` can be passed as `transport` so that \
+           granule downloads reuse its pooled connections.
         '''
+        self._use_transport(transport)
         config = configparser.ConfigParser()
         if file:
             config_file_path = os.path.join(os.path.dirname(__file__), file)
@@ -53,23 +59,21 @@ class Drive:
 
             :returns: prints an array of PO.DAAC Drive URLs.
         '''
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(granule_search_response, 'html.parser')
-        drive_list = []
-        for drive_link in soup.find_all('link'):
-            href = drive_link.get('href')
-            if self.URL in href:
-                drive_list.append(href)
-        return drive_list
-
-    def download_granules(self, granule_collection=None, path=''):
+        return atom.mine_links(granule_search_response, self.URL)
+
+    def download_granules(self, granule_collection=None, path='', workers=4, segments=1,
+                          chunk_size=download.CHUNK_SIZE, skip_existing=True, callback=None,
+                          raise_errors=True):
         ''' Granule download service downloads a granule collection \
             from PO.DAAC Drive to the users' local machine at the given path. Note, as \
             of https://github.com/nasa/podaacpy/issues/131 we now maintain the PO.DAAC \
             Drive directory structure. This is to say, if the Drive URL was \
             https://podaac-tools.jpl.nasa.gov/drive/files/allData/ghrsst/data/GDS2/L2P/AVHRR19_L/NAVO/v1/2019/088/20190329001403-NAVO-L2P_GHRSST-SST1m-AVHRR19_L-v02.0-fv01.0.nc \
             then a directory structure would be created as follows \
-            allData/ghrsst/data/GDS2/L2P/AVHRR19_L/NAVO/v1/2019/088/20190329001403-NAVO-L2P_GHRSST-SST1m-AVHRR19_L-v02.0-fv01.0.nc
+            allData/ghrsst/data/GDS2/L2P/AVHRR19_L/NAVO/v1/2019/088/20190329001403-NAVO-L2P_GHRSST-SST1m-AVHRR19_L-v02.0-fv01.0.nc \
+            Granules are downloaded concurrently, interrupted transfers are \
+            resumed from their `.part` files with HTTP Range requests, and \
+            `.gz` granules are decompressed chunk by chunk as they arrive.
 
             :param granule_collection: a populated collection of PO.DAAC Drive Granule URLs. \
                 These can be obtained by using the drive.mine_drive_urls_from_granule_search() \
@@ -79,35 +83,67 @@ class Drive:
             :param path: path to a directory where you want the data to be stored.
             :type path: :mod:`string`
 
-            :returns: a zip file downloaded and extracted in the destination \
-                directory path provided.
+            :param workers: number of granules downloaded at once. Keep this \
+                at or below the `pool_maxsize` of the transport so that every \
+                worker gets a pooled connection.
+            :type workers: :mod:`int`
+
+            :param segments: number of byte ranges fetched in parallel for each \
+                granule of at least 64 MB.
+            :type segments: :mod:`int`
+
+            :param chunk_size: number of bytes read from the network at a time.
+            :type chunk_size: :mod:`int`
+
+            :param skip_existing: True to skip granules already complete on disk.
+            :type skip_existing: :mod:`bool`
+
+            :param callback: optional callable invoked with the \
+                :class:`podaac.download.DownloadResult` of each granule as soon \
+                as it is done.
+            :type callback: :mod:`callable`
+
+            :param raise_errors: True to raise the error of the first granule \
+                which failed, e.g. a PermissionError when the credentials are \
+                refused, once the other granules are done. False to only list \
+                the failed granules in the `failed` results of the report.
+            :type raise_errors: :mod:`bool`
+
+            :returns: a :class:`podaac.download.DownloadReport` holding the \
+                per-granule and aggregate throughput of the batch.
         '''
         if granule_collection is None:
             granule_collection = []
 
-        for granule_url in granule_collection:
-            directory_structure, granule = os.path.split(granule_url[46:])
-            granule_name = os.path.splitext(granule)[0]
-            if path == '':
-                granule_path = os.path.join(os.path.dirname(__file__), directory_structure)
-            else:
-                granule_path = path + '/' + directory_structure
-            r = requests.get(granule_url, auth=HTTPBasicAuth(self.USERNAME, self.PASSWORD), stream=True)
-            if r.status_code != 200:
-                raise PermissionError("Granule: '%s' not downloaded. Please check authentication configuration and try again." % (granule))
-            try:
-                from pathlib import Path
-            except ImportError:
-                from pathlib2 import Path  # python 2 backport
-            Path(granule_path).mkdir(parents=True, exist_ok=True)
-            with open(granule_path + "/" + granule, 'wb') as f:
-                for chunk in r:
-                    f.write(chunk)
-
-            if granule.endswith('.gz'):
-                gzip_granule = gzip.open(granule_path + "/" + granule, 'rb')
-                with open(granule_path + "/" + granule_name, 'wb') as uncompressed_granule:
-                    uncompressed_granule.write(gzip_granule.read())
-                    gzip_granule.close()
-                    uncompressed_granule.close()
-                    os.remove(granule_path + "/" + granule)
+        def download_granule(granule_url):
+            return self._download_granule(granule_url, path, segments, chunk_size, skip_existing)
+
+        return download.download_all(download_granule, granule_collection,
+                                     workers=workers, callback=callback,
+                                     raise_errors=raise_errors)
+
+    def _download_granule(self, granule_url, path, segments, chunk_size, skip_existing):
+        directory_structure, granule = os.path.split(granule_url[46:])
+        if path == '':
+            granule_path = os.path.join(os.path.dirname(__file__), directory_structure)
+        else:
+            granule_path = path + '/' + directory_structure
+        compressed = granule.endswith('.gz')
+        granule_name = os.path.splitext(granule)[0] if compressed else granule
+        granule_file = granule_path + "/" + granule_name
+        if skip_existing and os.path.exists(granule_file):
+            return download.DownloadResult(granule_url, granule_file, 0, 0.0, True)
+
+        started = time.time()
+        download.makedirs(granule_path)
+        try:
+            size = download.fetch(self.transport, granule_url, granule_file, decompress=compressed,
+                                  segments=segments, chunk_size=chunk_size,
+                                  auth=HTTPBasicAuth(self.USERNAME, self.PASSWORD))
+        except requests.exceptions.HTTPError as error:
+            if error.response is None or error.response.status_code not in (401, 403):
+                raise
+            raise PermissionError("Granule: '%s' not downloaded. Please check authentication "
+                                  "configuration and try again." % (granule))
+        return download.DownloadResult(granule_url, granule_file, size, time.time() - started,
+                                       False)
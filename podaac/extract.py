@@ -0,0 +1,262 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import struct
+import tempfile
+import zipfile
+import zlib
+from .download import CHUNK_SIZE, makedirs
+
+LOCAL_FILE_HEADER = b'PK\x03\x04'
+CENTRAL_DIRECTORY = (b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06')
+DATA_DESCRIPTOR = b'PK\x07\x08'
+STORED = 0
+DEFLATED = 8
+ZIP64_EXTRA = 0x0001
+
+
+def fetch_zip(transport, url, path='', members=None, spool_size=None, chunk_size=CHUNK_SIZE,
+              headers=None, **kwargs):
+    '''Downloads a zip archive and extracts it without ever writing the \
+            archive itself to disk. By default the members are extracted \
+            from the HTTP body as it streams in, so the first files are \
+            complete while the rest of the archive is still downloading. \
+            With `spool_size` the body is instead collected in a \
+            :class:`tempfile.SpooledTemporaryFile` which stays in memory up \
+            to that many bytes, and the selected members are extracted \
+            from it once the download has finished; use it for archives \
+            which cannot be read front to back, such as stored members \
+            followed by a data descriptor.
+
+    :param transport: the transport used for the request.
+    :type transport: :class:`podaac.transport.Transport`
+
+    :param url: the URL of the zip archive.
+    :type url: :mod:`string`
+
+    :param path: directory into which the members are extracted. \
+            Defaults to the current directory.
+    :type path: :mod:`string`
+
+    :param members: names of the members to extract. None extracts every member.
+    :type members: :mod:`list`
+
+    :param spool_size: when given, spool the archive and extract it once \
+            complete, keeping at most this many bytes in memory.
+    :type spool_size: :mod:`int`
+
+    :param chunk_size: number of bytes read from the network at a time.
+    :type chunk_size: :mod:`int`
+
+    :param headers: extra request headers. Any other keyword argument is \
+            passed on to the transport.
+    :type headers: :mod:`dict`
+
+    :returns: the paths of the extracted files, in archive order.
+    '''
+    response = transport.get(url, headers=headers, stream=True, **kwargs)
+    try:
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=chunk_size)
+        if spool_size is None:
+            return extract_stream(chunks, path, members)
+        with tempfile.SpooledTemporaryFile(max_size=spool_size) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+            spool.seek(0)
+            return extract_file(spool, path, members)
+    finally:
+        response.close()
+
+
+def extract_file(source, path='', members=None):
+    '''Extracts members of a complete zip archive.
+
+    :param source: a path or seekable file object holding the archive.
+    :type source: :mod:`file`
+
+    :param path: directory into which the members are extracted.
+    :type path: :mod:`string`
+
+    :param members: names of the members to extract. None extracts every member.
+    :type members: :mod:`list`
+
+    :returns: the paths of the extracted files, in archive order.
+    '''
+    with zipfile.ZipFile(source) as archive:
+        names = [name for name in archive.namelist()
+                 if (members is None or name in members) and not name.endswith('/')]
+        return [archive.extract(name, path or None) for name in names]
+
+
+def extract_stream(chunks, path='', members=None):
+    '''Extracts a zip archive front to back from an iterable of byte \
+            chunks, reading each member from its local file header. Every \
+            member is written to a `.part` file which is renamed once its \
+            CRC-32 has been checked.
+
+    :param chunks: the archive bytes, e.g. a response's iter_content().
+    :type chunks: :mod:`iterable`
+
+    :param path: directory into which the members are extracted.
+    :type path: :mod:`string`
+
+    :param members: names of the members to extract. None extracts every member.
+    :type members: :mod:`list`
+
+    :returns: the paths of the extracted files, in archive order.
+    '''
+    reader = _ChunkReader(chunks)
+    extracted = []
+    while reader.peek(4) == LOCAL_FILE_HEADER:
+        header = reader.read(30)
+        (flags, method, crc, compressed_size, size, name_length,
+         extra_length) = struct.unpack('<6xHH4xIIIHH', header)
+        name = reader.read(name_length).decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = reader.read(extra_length)
+        zip64 = _zip64_sizes(extra, size, compressed_size)
+        if zip64 is not None:
+            size, compressed_size = zip64
+        if flags & 0x1:
+            raise ValueError("Encrypted zip member '%s' cannot be extracted." % name)
+        if method not in (STORED, DEFLATED):
+            raise ValueError("Zip member '%s' uses unsupported compression method %d."
+                             % (name, method))
+        descriptor = bool(flags & 0x8)
+        if descriptor and method == STORED:
+            raise ValueError("Stored zip member '%s' has no size in its header; "
+                             "extract the archive with a spool instead." % name)
+
+        target = None
+        if not name.endswith('/') and (members is None or name in members):
+            target = _member_path(path, name)
+            makedirs(os.path.dirname(target) or '.')
+        output = open(target + '.part', 'wb') if target else None
+        try:
+            actual_crc = _copy_member(reader, method, None if descriptor else compressed_size,
+                                      output)
+        except Exception:
+            if output is not None:
+                output.close()
+                os.remove(target + '.part')
+            raise
+        if output is not None:
+            output.close()
+        if descriptor:
+            crc = _read_descriptor(reader, zip64 is not None)
+        if target:
+            if actual_crc != crc:
+                os.remove(target + '.part')
+                raise IOError("Zip member '%s' is corrupt: bad CRC-32." % name)
+            os.rename(target + '.part', target)
+            extracted.append(target)
+    if reader.peek(4) not in CENTRAL_DIRECTORY:
+        raise IOError("Zip archive ended unexpectedly.")
+    # the central directory repeats what has been read already
+    for _ in reader.chunks:
+        pass
+    return extracted
+
+
+def _copy_member(reader, method, compressed_size, output):
+    crc = 0
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == DEFLATED else None
+    remaining = compressed_size
+    while remaining is None or remaining > 0:
+        chunk = reader.read_some(remaining)
+        if remaining is not None:
+            remaining -= len(chunk)
+        if decompressor is not None:
+            data = decompressor.decompress(chunk)
+            if decompressor.eof:
+                # the member ended inside this chunk, hand the rest back
+                reader.unread(decompressor.unused_data)
+                remaining = 0
+        else:
+            data = chunk
+        crc = zlib.crc32(data, crc)
+        if output is not None:
+            output.write(data)
+    if decompressor is not None:
+        data = decompressor.flush()
+        crc = zlib.crc32(data, crc)
+        if output is not None:
+            output.write(data)
+    return crc & 0xffffffff
+
+
+def _read_descriptor(reader, zip64):
+    if reader.peek(4) == DATA_DESCRIPTOR:
+        reader.read(4)
+    crc, = struct.unpack('<I', reader.read(4))
+    reader.read(16 if zip64 else 8)
+    return crc
+
+
+def _zip64_sizes(extra, size, compressed_size):
+    while len(extra) >= 4:
+        header_id, length = struct.unpack('<HH', extra[:4])
+        if header_id == ZIP64_EXTRA:
+            values = extra[4:4 + length]
+            if size == 0xffffffff and len(values) >= 8:
+                size, = struct.unpack('<Q', values[:8])
+                values = values[8:]
+            if compressed_size == 0xffffffff and len(values) >= 8:
+                compressed_size, = struct.unpack('<Q', values[:8])
+            return size, compressed_size
+        extra = extra[4 + length:]
+    return None
+
+
+def _member_path(path, name):
+    # never write outside of the extraction directory
+    parts = [part for part in name.replace('\\', '/').split('/')
+             if part not in ('', '.', '..')]
+    return os.path.join(path or '', *parts)
+
+
+class _ChunkReader:
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def _fill(self, size):
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.buffer += chunk
+        return True
+
+    def peek(self, size):
+        self._fill(size)
+        return self.buffer[:size]
+
+    def read(self, size):
+        if not self._fill(size):
+            raise IOError("Zip archive ended unexpectedly.")
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def read_some(self, limit=None):
+        if not self.buffer and not self._fill(1):
+            raise IOError("Zip archive ended unexpectedly.")
+        size = len(self.buffer) if limit is None else min(limit, len(self.buffer))
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def unread(self, data):
+        self.buffer = data + self.buffer
@@ -0,0 +1,317 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import calendar
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import defusedxml.ElementTree as ET
+from .records import Granule
+
+DAY = 24 * 60 * 60
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+_ISO = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(\.\d+)?)?)?')
+
+
+def to_epoch(value):
+    '''Converts an ISO 8601 UTC time string, as published by PO.DAAC, \
+            to seconds since the epoch. Returns None for empty values.'''
+    if not value or isinstance(value, (int, float)):
+        return value or None
+    match = _ISO.match(value.strip())
+    if match is None:
+        raise ValueError("Not an ISO 8601 time: '%s'" % value)
+    year, month, day, hour, minute, second, fraction = match.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day), int(hour or 0),
+                               int(minute or 0), int(second or 0)))
+    return seconds + (float(fraction) if fraction else 0)
+
+
+def to_iso(seconds):
+    '''Formats seconds since the epoch as YYYY-MM-DDTHH:mm:ssZ.'''
+    return time.strftime(TIME_FORMAT, time.gmtime(seconds))
+
+
+class GranuleInventory:
+
+    def __init__(self, path=None):
+        '''A local inventory of granule search results stored in a SQLite \
+                database, indexed by dataset, time and bounding box. \
+                :meth:`sync` fills it incrementally, asking PO.DAAC only \
+                for the granules that follow the previous sync, and \
+                :meth:`granules` then answers time and bbox queries \
+                locally. The inventory may be shared between threads.
+
+        :param path: path of the SQLite database. Defaults to \
+                ~/.cache/podaacpy/inventory.sqlite. Use ':memory:' for an \
+                inventory which only lives as long as the process.
+        :type path: :mod:`string`
+        '''
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'podaacpy', 'inventory.sqlite')
+        if path != ':memory:' and not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+            os.makedirs(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS granules ('
+                             'dataset_id TEXT, name TEXT, short_name TEXT, start_time TEXT, '
+                             'end_time TEXT, updated TEXT, opendap_url TEXT, drive_url TEXT, '
+                             'preview_url TEXT, links TEXT, start REAL, end REAL, '
+                             'south REAL, west REAL, north REAL, east REAL, '
+                             'PRIMARY KEY (dataset_id, name))')
+            self._db.execute('CREATE INDEX IF NOT EXISTS granules_start '
+                             'ON granules (dataset_id, start)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS granules_end '
+                             'ON granules (dataset_id, end)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS granules_box '
+                             'ON granules (dataset_id, south, north, west, east)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS syncs ('
+                             'dataset_id TEXT PRIMARY KEY, synced_until REAL, synced_at REAL)')
+
+    def add(self, granules):
+        '''Stores granule records, replacing any earlier record of the \
+                same granule.
+
+        :param granules: the :class:`podaac.records.Granule` records.
+        :type granules: :mod:`iterable`
+
+        :returns: the number of records stored.
+        '''
+        rows = [_row(granule) for granule in granules]
+        with self._lock:
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO granules VALUES '
+                                     '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def sync(self, podaac, dataset_id, start_time=None, end_time=None, overlap=3600,
+             datacasting=True, prefetch=True):
+        '''Brings the inventory of a dataset up to date. The first sync \
+                searches from `start_time`; every later sync only searches \
+                from the end of the latest granule stored so far, reaching \
+                back `overlap` seconds to catch granules archived late. \
+                When the previous sync is less than a day old, the \
+                Datacasting feed of the last 24 hours is checked first, and \
+                the search is skipped entirely if it holds no granule the \
+                inventory does not already know.
+
+        :param podaac: the client used for the searches.
+        :type podaac: :class:`podaac.podaac.Podaac`
+
+        :param dataset_id: dataset persistent ID.
+        :type dataset_id: :mod:`string`
+
+        :param start_time: start of the first sync, YYYY-MM-DDTHH:mm:ssZ. \
+                Required when the dataset has never been synced.
+        :type start_time: :mod:`string`
+
+        :param end_time: end of the window, YYYY-MM-DDTHH:mm:ssZ. Defaults to now.
+        :type end_time: :mod:`string`
+
+        :param overlap: seconds an incremental sync reaches back before \
+                the latest granule already stored.
+        :type overlap: :mod:`float`
+
+        :param datacasting: whether to check the Datacasting feed before searching.
+        :type datacasting: :mod:`bool`
+
+        :param prefetch: download the next search page while the current \
+                one is being stored.
+        :type prefetch: :mod:`bool`
+
+        :returns: the number of granule records stored by this sync.
+        '''
+        now = time.time()
+        until = to_epoch(end_time) if end_time else now
+        with self._lock:
+            row = self._db.execute('SELECT synced_until, synced_at FROM syncs '
+                                   'WHERE dataset_id = ?', (dataset_id,)).fetchone()
+        if row is not None:
+            since = row[0] - overlap
+            latest = row[0]
+            if datacasting and end_time is None and now - row[1] < DAY and \
+                    self._known(dataset_id, _datacasting_titles(podaac, dataset_id)):
+                self._synced(dataset_id, latest, now)
+                return 0
+        elif start_time:
+            since = latest = to_epoch(start_time)
+        else:
+            raise ValueError("start_time is required for the first sync of '%s'." % dataset_id)
+
+        stored = 0
+        batch = []
+        for granule in podaac.iter_granules(dataset_id=dataset_id, start_time=to_iso(since),
+                                            end_time=to_iso(until), prefetch=prefetch):
+            batch.append(granule._replace(dataset_id=dataset_id))
+            end = to_epoch(granule.end_time or granule.start_time)
+            if end is not None:
+                latest = max(latest, min(end, until))
+            if len(batch) == 400:
+                stored += self.add(batch)
+                batch = []
+        stored += self.add(batch)
+        self._synced(dataset_id, latest, now)
+        return stored
+
+    def synced_until(self, dataset_id):
+        '''Returns the end time of the latest granule synced for a dataset, \
+                where the next sync resumes, as YYYY-MM-DDTHH:mm:ssZ, or \
+                None if the dataset was never synced.'''
+        with self._lock:
+            row = self._db.execute('SELECT synced_until FROM syncs WHERE dataset_id = ?',
+                                   (dataset_id,)).fetchone()
+        return to_iso(row[0]) if row is not None else None
+
+    def granules(self, dataset_id, start_time=None, end_time=None, bbox=None):
+        '''Returns the stored granules of a dataset which overlap a time \
+                range and a bounding box, in start time order. Granules \
+                without a footprint only match queries without a bbox.
+
+        :param dataset_id: dataset persistent ID.
+        :type dataset_id: :mod:`string`
+
+        :param start_time: start of the range, YYYY-MM-DDTHH:mm:ssZ.
+        :type start_time: :mod:`string`
+
+        :param end_time: end of the range, YYYY-MM-DDTHH:mm:ssZ.
+        :type end_time: :mod:`string`
+
+        :param bbox: bounding box in order of west, south, east, north, \
+                as a string like granule_search() accepts or a tuple. A \
+                west value greater than east crosses the antimeridian.
+        :type bbox: :mod:`string`
+
+        :returns: a list of :class:`podaac.records.Granule`.
+        '''
+        query = ('SELECT dataset_id, name, short_name, start_time, end_time, updated, '
+                 'opendap_url, drive_url, preview_url, links, south, west, north, east '
+                 'FROM granules WHERE dataset_id = ?')
+        args = [dataset_id]
+        if start_time:
+            query += ' AND end >= ?'
+            args.append(to_epoch(start_time))
+        if end_time:
+            query += ' AND start <= ?'
+            args.append(to_epoch(end_time))
+        intervals = None
+        if bbox:
+            west, south, east, north = _bbox(bbox)
+            query += ' AND south <= ? AND north >= ?'
+            args.extend([north, south])
+            intervals = _lon_intervals(west, east)
+        with self._lock:
+            rows = self._db.execute(query + ' ORDER BY start, name', args).fetchall()
+        if intervals is not None:
+            # longitudes wrap around, which a range condition in SQL cannot express
+            rows = [row for row in rows if _lon_overlap(_lon_intervals(row[-3], row[-1]),
+                                                        intervals)]
+        return [_granule(row) for row in rows]
+
+    def count(self, dataset_id=None):
+        '''Returns the number of stored granules, of one dataset or of all.'''
+        with self._lock:
+            if dataset_id is None:
+                return self._db.execute('SELECT COUNT(*) FROM granules').fetchone()[0]
+            return self._db.execute('SELECT COUNT(*) FROM granules WHERE dataset_id = ?',
+                                    (dataset_id,)).fetchone()[0]
+
+    def clear(self, dataset_id=None):
+        '''Forgets the granules and sync state of one dataset, or of all.'''
+        with self._lock:
+            with self._db:
+                if dataset_id is None:
+                    self._db.execute('DELETE FROM granules')
+                    self._db.execute('DELETE FROM syncs')
+                else:
+                    self._db.execute('DELETE FROM granules WHERE dataset_id = ?', (dataset_id,))
+                    self._db.execute('DELETE FROM syncs WHERE dataset_id = ?', (dataset_id,))
+
+    def close(self):
+        '''Closes the underlying database.'''
+        with self._lock:
+            self._db.close()
+
+    def _known(self, dataset_id, names):
+        if names is None:
+            return False
+        with self._lock:
+            for name in names:
+                if self._db.execute('SELECT 1 FROM granules WHERE dataset_id = ? AND name = ?',
+                                    (dataset_id, name)).fetchone() is None:
+                    return False
+        return True
+
+    def _synced(self, dataset_id, until, now):
+        with self._lock:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)',
+                                 (dataset_id, until, now))
+
+
+def _datacasting_titles(podaac, dataset_id):
+    # granule names in the Datacasting (RSS) feed, None when it cannot be read
+    try:
+        feed = podaac.last24hours_datacasting_granule_md(dataset_id=dataset_id)
+        root = ET.fromstring(feed.encode('utf-8'))
+    except Exception:
+        return None
+    return [item.findtext('title').strip() for item in root.iter('item')
+            if item.findtext('title')]
+
+
+def _bbox(bbox):
+    if not isinstance(bbox, (tuple, list)):
+        bbox = bbox.split(',')
+    return [float(value) for value in bbox]
+
+
+def _lon_intervals(west, east):
+    # the one or two intervals of [-180, 180] covered by the longitudes from
+    # west to east, which cross the antimeridian when west is greater than east
+    if east - west >= 360:
+        return [(-180.0, 180.0)]
+    width = (east - west) % 360
+    west = (west + 180) % 360 - 180
+    east = west + width
+    if east <= 180:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east - 360)]
+
+
+def _lon_overlap(intervals, others):
+    return any(west <= other_east and east >= other_west
+               for west, east in intervals for other_west, other_east in others)
+
+
+def _row(granule):
+    south, west, north, east = granule.box or (None, None, None, None)
+    start = to_epoch(granule.start_time)
+    end = to_epoch(granule.end_time)
+    return (granule.dataset_id, granule.name, granule.short_name, granule.start_time,
+            granule.end_time, granule.updated, granule.opendap_url, granule.drive_url,
+            granule.preview_url, json.dumps(granule.links), start,
+            end if end is not None else start, south, west, north, east)
+
+
+def _granule(row):
+    (dataset_id, name, short_name, start_time, end_time, updated, opendap_url, drive_url,
+     preview_url, links, south, west, north, east) = row
+    box = (south, west, north, east) if south is not None else None
+    return Granule(name, dataset_id, short_name, start_time, end_time, updated, opendap_url,
+                   drive_url, preview_url, box, tuple(tuple(link) for link in json.loads(links)))
@@ -13,17 +13,25 @@
 import requests
 import os
 import json
-import time
-import zipfile
-from future.moves.urllib.request import urlopen, urlretrieve
-from future.moves.urllib.parse import urlencode
-from future.moves.http.client import HTTPSConnection
+from concurrent.futures import ThreadPoolExecutor
+from . import extract, paging
+from ._compat import urlencode
+from .polling import PollingStrategy
+from .transport import Client
 
 
-class L2SS:
+class L2SS(Client):
 
-    def __init__(self):
+    def __init__(self, transport=None):
+        ''' Sets the base L2SS URL to https://podaac-tools.jpl.nasa.gov/l2ss-services/l2ss/
+
+            :param transport: a shared :class:`podaac.transport.Transport` whose \
+                pooled connections are reused by every call. A private \
+                transport is created when none is given.
+            :type transport: :class:`podaac.transport.Transport`
+        '''
         self.URL = 'https://podaac-tools.jpl.nasa.gov/l2ss-services/l2ss/'
+        self._use_transport(transport)
 
     def dataset_search(self, dataset_id='', variable=None, sensor=None, provider=None,
                        start_time='', end_time='', start_index='', items_per_page='50'):
@@ -61,38 +69,10 @@ class L2SS:
             :returns: a json response containing the datasets.
         '''
 
-        if variable is None:
-            variable = []
-
-        if sensor is None:
-            sensor = []
-
-        if provider is None:
-            provider = []
-
         try:
-            url = self.URL + 'dataset/search?'
-            if dataset_id:
-                url = url + 'datasetId=' + dataset_id
-            if variable:
-                for var in variable:
-                    url = url + '&variable=' + var
-            if sensor:
-                for item in sensor:
-                    url = url + '&sensor=' + item
-            if provider:
-                for item in provider:
-                    url = url + '&provider=' + item
-            if start_time:
-                url = url + '&startTime=' + start_time
-            if end_time:
-                url = url + '&endTime=' + end_time
-            if start_index:
-                url = url + '&startIndex=' + start_index
-            if items_per_page:
-                url = url + '&itemsPerPage=' + items_per_page
-
-            datasets = requests.get(url)
+            url = self._dataset_search_url(dataset_id, variable, sensor, provider,
+                                           start_time, end_time, start_index, items_per_page)
+            datasets = self.transport.get(url)
             status_codes = [404, 400, 503, 408]
             if datasets.status_code in status_codes:
                 datasets.raise_for_status()
@@ -103,6 +83,27 @@ class L2SS:
 
         return datasets.text
 
+    def _dataset_search_url(self, dataset_id, variable, sensor, provider, start_time, end_time,
+                            start_index, items_per_page):
+        url = self.URL + 'dataset/search?'
+        if dataset_id:
+            url = url + 'datasetId=' + dataset_id
+        for var in variable or []:
+            url = url + '&variable=' + var
+        for item in sensor or []:
+            url = url + '&sensor=' + item
+        for item in provider or []:
+            url = url + '&provider=' + item
+        if start_time:
+            url = url + '&startTime=' + start_time
+        if end_time:
+            url = url + '&endTime=' + end_time
+        if start_index:
+            url = url + '&startIndex=' + start_index
+        if items_per_page:
+            url = url + '&itemsPerPage=' + items_per_page
+        return url
+
     def dataset_variables(self, dataset_id):
         ''' Dataset Variable retrieves dataset configuration information including variables.
 
@@ -113,7 +114,7 @@ class L2SS:
         '''
         try:
             url = self.URL + '/dataset/variable?datasetId=' + dataset_id
-            variables = requests.get(url)
+            variables = self.transport.get(url, endpoint='l2ss_dataset_variables')
             status_codes = [404, 400, 503, 408]
             if variables.status_code in status_codes:
                 variables.raise_for_status()
@@ -163,25 +164,9 @@ class L2SS:
             :returns: a json response containing the dataset granules.
         '''
         try:
-            url = self.URL + 'granule/search?'
-            if dataset_id:
-                url = url + 'datasetId=' + dataset_id
-            if bbox:
-                url = url + '&bbox=' + bbox
-            if start_time:
-                url = url + '&startTime=' + start_time
-            if end_time:
-                url = url + '&endTime=' + end_time
-            if start_index:
-                url = url + '&startIndex=' + start_index
-            if items_per_page:
-                url = url + '&itemsPerPage=' + items_per_page
-            if name:
-                url = url + '&name=' + name
-            if sort:
-                url = url + '&sort=' + sort
-
-            granules = requests.get(url)
+            url = self._granule_search_url(dataset_id, bbox, start_time, end_time,
+                                           name, sort, start_index, items_per_page)
+            granules = self.transport.get(url)
             status_codes = [404, 400, 503, 408]
             if granules.status_code in status_codes:
                 granules.raise_for_status()
@@ -192,6 +177,65 @@ class L2SS:
 
         return granules.text
 
+    def _granule_search_url(self, dataset_id, bbox, start_time, end_time, name, sort,
+                            start_index, items_per_page):
+        url = self.URL + 'granule/search?'
+        if dataset_id:
+            url = url + 'datasetId=' + dataset_id
+        if bbox:
+            url = url + '&bbox=' + bbox
+        if start_time:
+            url = url + '&startTime=' + start_time
+        if end_time:
+            url = url + '&endTime=' + end_time
+        if start_index:
+            url = url + '&startIndex=' + start_index
+        if items_per_page:
+            url = url + '&itemsPerPage=' + items_per_page
+        if name:
+            url = url + '&name=' + name
+        if sort:
+            url = url + '&sort=' + sort
+        return url
+
+    def granule_search_all(self, dataset_id='', bbox='', start_time='', end_time='',
+                           name='', sort='', items_per_page='400', max_workers=4):
+        ''' Bulk variant of granule_search() which returns every matching granule \
+            rather than a single page. The first page is read to learn the total \
+            number of results, then all remaining pages are fetched concurrently \
+            and their documents appended, in order, to the first page. The search \
+            parameters are those of granule_search().
+
+            :param items_per_page: number of results per page.
+            :type items_per_page: :mod:`string`
+
+            :param max_workers: maximum number of pages fetched at once.
+            :type max_workers: :mod:`int`
+
+            :returns: the parsed json response holding every granule document.
+        '''
+        def fetch_page(start_index):
+            url = self._granule_search_url(dataset_id, bbox, start_time, end_time,
+                                           name, sort, str(start_index), items_per_page)
+            try:
+                granules = self.transport.get(url)
+                status_codes = [404, 400, 503, 408]
+                if granules.status_code in status_codes:
+                    granules.raise_for_status()
+
+            except requests.exceptions.HTTPError as error:
+                print(error)
+                raise
+
+            return self._parse('l2ss_granule_search', granules.json)
+
+        result = fetch_page(0)
+        total_results = int(result['response']['numFound'])
+        for page in paging.fetch_remaining_pages(fetch_page, total_results, 0,
+                                                 int(items_per_page), max_workers):
+            result['response']['docs'].extend(page['response']['docs'])
+        return result
+
     def granules_availability(self, dataset_id='', start_time='', end_time='', gap='', bbox=''):
         ''' Granules Availability calculates granule counts per day or month from given date range.
 
@@ -216,13 +260,8 @@ class L2SS:
             :returns: a json response containing the granule count and other relevant information.
         '''
         try:
-            url = self.URL + 'granule/availability?'
-            url = url + 'datasetId=' + dataset_id + '&startTime=' + \
-                start_time + '&endTime=' + end_time + '&gap=' + gap
-            if bbox:
-                url = url + '&bbox=' + bbox
-
-            granule_availability = requests.get(url)
+            url = self._granules_availability_url(dataset_id, start_time, end_time, gap, bbox)
+            granule_availability = self.transport.get(url)
             status_codes = [404, 400, 503, 408]
             if granule_availability.status_code in status_codes:
                 granule_availability.raise_for_status()
@@ -233,6 +272,106 @@ class L2SS:
 
         return granule_availability.text
 
+    def granules_availability_timeline(self, dataset_id='', start_time='', end_time='', gap='DAY',
+                                       bbox='', chunk_bins=None, max_workers=4):
+        ''' Granule counts per day, month or year as NumPy arrays. Long ranges \
+            are split into chunks of whole bins which are requested in parallel. \
+            Requires NumPy.
+
+            :param dataset_id: Search granules belong to given PODAAC Dataset persistent ID.
+            :type dataset_id: :mod:`string`
+
+            :param start_time: Lower time bound, YYYY-MM-DDTHH:mm:ssZ. Ranges \
+                without both bounds are requested in one call.
+            :type start_time: :mod:`string`
+
+            :param end_time: Upper time bound, YYYY-MM-DDTHH:mm:ssZ.
+            :type end_time: :mod:`string`
+
+            :param gap: The size of each bin. Example: 'DAY', 'MONTHS', 'YEARS'
+            :type gap: :mod:`string`
+
+            :param bbox: Search granules with Bounding box Ex: '-180,-90,180,90'
+            :type bbox: :mod:`string`
+
+            :param chunk_bins: number of bins requested per call. Defaults to \
+                :data:`podaac.availability.CHUNK_BINS`.
+            :type chunk_bins: :mod:`int`
+
+            :param max_workers: maximum number of calls in progress at once.
+            :type max_workers: :mod:`int`
+
+            :returns: a :class:`podaac.availability.Timeline` of bin start \
+                times and granule counts.
+        '''
+        from . import availability
+        windows = availability.chunks(start_time, end_time, gap, chunk_bins)
+
+        def fetch(window):
+            return self._parse('granules_availability', availability.parse,
+                               self.granules_availability(
+                                   dataset_id=dataset_id, start_time=window[0],
+                                   end_time=window[1], gap=gap, bbox=bbox))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as executor:
+            return availability.concatenate(executor.map(fetch, windows))
+
+    def granules_availability_matrix(self, queries, start_time='', end_time='', gap='DAY',
+                                     chunk_bins=None, max_workers=4):
+        ''' Granule counts of several datasets, or of one dataset over several \
+            bounding boxes, aligned on one time axis. Every chunk of every \
+            query is requested on one shared thread pool. Requires NumPy.
+
+            :param queries: dataset ids, or (dataset_id, bbox) pairs.
+            :type queries: :mod:`list`
+
+            :param start_time: Lower time bound, YYYY-MM-DDTHH:mm:ssZ.
+            :type start_time: :mod:`string`
+
+            :param end_time: Upper time bound, YYYY-MM-DDTHH:mm:ssZ.
+            :type end_time: :mod:`string`
+
+            :param gap: The size of each bin. Example: 'DAY', 'MONTHS', 'YEARS'
+            :type gap: :mod:`string`
+
+            :param chunk_bins: number of bins requested per call.
+            :type chunk_bins: :mod:`int`
+
+            :param max_workers: maximum number of calls in progress at once.
+            :type max_workers: :mod:`int`
+
+            :returns: a :class:`podaac.availability.AvailabilityMatrix` labelled \
+                with `queries`; gaps can then be found with \
+                :func:`podaac.availability.find_gaps`.
+        '''
+        from . import availability
+        queries = list(queries)
+        windows = availability.chunks(start_time, end_time, gap, chunk_bins)
+        calls = [(row, query if isinstance(query, tuple) else (query, ''), window)
+                 for row, query in enumerate(queries) for window in windows]
+
+        def fetch(call):
+            (dataset_id, bbox), window = call[1], call[2]
+            return self._parse('granules_availability', availability.parse,
+                               self.granules_availability(
+                                   dataset_id=dataset_id, start_time=window[0],
+                                   end_time=window[1], gap=gap, bbox=bbox))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls) or 1))) as executor:
+            parts = list(executor.map(fetch, calls))
+        timelines = [availability.concatenate(part for call, part in zip(calls, parts)
+                                              if call[0] == row)
+                     for row in range(len(queries))]
+        return availability.merge(timelines, queries)
+
+    def _granules_availability_url(self, dataset_id, start_time, end_time, gap, bbox):
+        url = self.URL + 'granule/availability?'
+        url = url + 'datasetId=' + dataset_id + '&startTime=' + \
+            start_time + '&endTime=' + end_time + '&gap=' + gap
+        if bbox:
+            url = url + '&bbox=' + bbox
+        return url
+
     def granule_preview_image(self, dataset_id, granule, year, day, variable, path=''):
         ''' Granule Preview Image Service provides thumbnail image of selected variable for\
             selected granule.
@@ -263,6 +402,7 @@ class L2SS:
                 path = os.path.join(os.path.dirname(
                     __file__), dataset_id + '.png')
             with open(path, 'wb') as image_file:
+                from future.moves.urllib.request import urlopen
                 image = urlopen(url)
                 image_file.write(image.read())
 
@@ -283,7 +423,7 @@ class L2SS:
         '''
         try:
             url = self.URL + 'palettes/' + palette_name + '.json'
-            image_palette = requests.get(url)
+            image_palette = self.transport.get(url)
             status_codes = [404, 400, 503, 408]
             if image_palette.status_code in status_codes:
                 image_palette.raise_for_status()
@@ -294,7 +434,8 @@ class L2SS:
 
         return image_palette.text
 
-    def granule_download(self, query_string, path=''):
+    def granule_download(self, query_string, path='', polling=None, members=None,
+                         spool_size=None):
         ''' Granule Download service submits a job to subset and download. Upon a successful request,\
             token will be returned which can be used to check status.
 
@@ -305,50 +446,51 @@ class L2SS:
                 dataset to be stored.
             :type path: :mod:`string`
 
-            :returns: a zip file downloaded and extracted in the destination\
-                directory path provided.
+            :param polling: decides how often the job status is checked while \
+                the job runs, and reports its state changes (queued, processing, \
+                done, partial error) to an optional callback. Defaults to \
+                exponential backoff from 1 to 60 seconds.
+            :type polling: :class:`podaac.polling.PollingStrategy`
+
+            :param members: names of the files to extract from the result \
+                zip. None extracts every file.
+            :type members: :mod:`list`
+
+            :param spool_size: the result zip is extracted while it downloads \
+                and is never written to disk. When given, the zip is instead \
+                spooled, in memory up to this many bytes, and extracted once \
+                complete. See :func:`podaac.extract.fetch_zip`.
+            :type spool_size: :mod:`int`
+
+            :returns: the paths of the files extracted from the result zip \
+                into the destination directory path provided.
         '''
         params = urlencode({'query': query_string})
         headers = {
             "Content-type": "application/x-www-form-urlencoded", "Accept": "*"}
-        connection = HTTPSConnection("podaac-tools.jpl.nasa.gov")
-        connection.request("POST", "/l2ss-services/l2ss/subset/submit",
-                           params, headers)
-        response = connection.getresponse()
-        data = response.read().decode('utf-8')
-        result = json.loads(data)
+        response = self.transport.post(
+            self.URL + "subset/submit", data=params, headers=headers)
+        result = json.loads(response.text)
         token = result['token']
-        connection.close()
-
-        flag = 0
-        while flag == 0:
-            url = url = self.URL + "subset/status?token=" + token
-            subset_response = requests.get(url).text
-            subset_response_json = json.loads(subset_response)
-            status = subset_response_json['status']
-            if status == "done":
-                flag = 1
-            if status == "error":
-                raise Exception(
-                    "Unexpected error occured for the subset job you have requested")
-            if status == "partial error":
-                raise Exception(
-                    "The job was done but with some errors, please submit the job again")
-            time.sleep(1)
+
+        def fetch_job():
+            url = self.URL + "subset/status?token=" + token
+            return json.loads(self.transport.get(url).text)
+
+        polling = polling if polling is not None else PollingStrategy()
+        subset_response_json = polling.poll(token, fetch_job)
+        status = subset_response_json['status']
+        if status == "partial error":
+            raise Exception(
+                "The job was done but with some errors, please submit the job again")
+        if status != "done":
+            raise Exception(
+                "Unexpected error occured for the subset job you have requested")
 
         print("Done! downloading the dataset zip .....")
         download_url = subset_response_json['resultURLs'][0]
-        split = download_url.split('/')
-        length = len(split)
-        zip_file_name = split[length - 1]
-        if path == '':
-            path = os.path.join(os.path.dirname(__file__), zip_file_name)
-        else:
-            path = path + zip_file_name
-        response = urlretrieve(download_url, path)
-        zip_content = zipfile.ZipFile(path)
-        zip_content.extractall()
-        os.remove(path)
+        return extract.fetch_zip(self.transport, download_url, path, members=members,
+                                 spool_size=spool_size)
 
     def subset_status(self, token):
         ''' Subset Status service check status on existing download job.
@@ -367,7 +509,7 @@ class L2SS:
         '''
         try:
             url = self.URL + 'subset/status?token=' + token
-            response = requests.get(url)
+            response = self.transport.get(url)
             response_json = json.loads(response.text)
             status = response_json['status']
             if status == "unknown":
@@ -14,12 +14,21 @@
 
 import os
 import requests
+from .transport import Client
 
-class MCC:
+class MCC(Client):
 
     
-    def __init__(self):
+    def __init__(self, transport=None):
+        '''Sets the compliance checker URL to https://podaac-tools.jpl.nasa.gov/mcc/check
+
+        :param transport: a shared :class:`podaac.transport.Transport` whose \
+                pooled connections are reused by every call. A private \
+                transport is created when none is given.
+        :type transport: :class:`podaac.transport.Transport`
+        '''
         self.URL = 'https://podaac-tools.jpl.nasa.gov/mcc/check'
+        self._use_transport(transport)
 
     def check_remote_file(self, checkers, url_upload, response='json'):
         '''GET a remote file e.g. from an OPeNDAP URL and compliance \
@@ -47,7 +56,7 @@ class MCC:
         try:
             url = self.URL + '?checkers=' + checkers + \
                 '&url-upload=' + url_upload + '&response=' + response
-            result = requests.get(url)
+            result = self.transport.get(url)
             if result.status_code == 404 or result.status_code == 400 or result.status_code == 503 or result.status_code == 408:
                 result.raise_for_status()
 
@@ -90,7 +99,7 @@ class MCC:
             files = {'file-upload': open(file_upload, 'rb+')}
             data = {'CF': 'on', 'ACDD': 'on', 'ACDD-version': acdd_version,
                     'GDS2': 'on', 'GDS2-parameters': gds2_parameters, 'response': response}
-            result = requests.post(self.URL, files=files, data=data)
+            result = self.transport.post(self.URL, files=files, data=data)
             if result.status_code == 404 or result.status_code == 400 or result.status_code == 503 or result.status_code == 408:
                 result.raise_for_status()
 
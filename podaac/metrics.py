@@ -0,0 +1,275 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from bisect import bisect_left
+from collections import namedtuple
+from contextlib import contextmanager
+import threading
+import time
+from ._compat import urlparse
+
+# Upper bounds, in seconds, of the latency and parse time histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Event = namedtuple('Event', [
+    'kind', 'endpoint', 'method', 'url', 'status', 'seconds', 'bytes_sent',
+    'bytes_received', 'retries', 'cached', 'error'])
+Event.__doc__ = '''One instrumented operation, passed to the hooks of a \
+        :class:`MetricsRegistry`. `kind` is 'request' or 'parse'. For a \
+        request, `status` is None and `error` holds the exception when no \
+        response was received, `retries` counts the attempts sent again \
+        and `cached` tells whether the cache answered. `bytes_received` is \
+        the body length, or the announced Content-Length of a streamed \
+        response. Fields which do not apply to parse events are None.'''
+
+
+class MetricsRegistry:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, depth=4):
+        '''Collects per endpoint request counts, latency and parse time \
+                histograms, bytes transferred, retries and cache hits. Pass \
+                one registry to any number of transports, blocking or \
+                asyncio, to aggregate their requests; a registry may be \
+                shared between threads. Requests tagged with an endpoint \
+                name, e.g. 'granule_metadata', are recorded under it, and \
+                others under their host and leading path segments.
+
+        :param buckets: upper bounds, in seconds, of the histogram buckets.
+        :type buckets: :mod:`tuple`
+
+        :param depth: number of leading path segments kept in the label of \
+                an untagged request. Segments from the first one holding a \
+                '.', e.g. a file name, are dropped.
+        :type depth: :mod:`int`
+        '''
+        self.buckets = tuple(sorted(buckets))
+        self.depth = depth
+        self._hooks = []
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        '''Registers a callable invoked with every :class:`Event`, on the \
+                thread which made the request. A hook must not raise.'''
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        '''Unregisters a hook added with :meth:`add_hook`.'''
+        self._hooks.remove(hook)
+
+    def label(self, url, endpoint=None):
+        '''Returns the endpoint label metrics of a request are recorded under.'''
+        if endpoint:
+            return endpoint
+        parts = urlparse(url)
+        segments = []
+        for segment in parts.path.split('/'):
+            if '.' in segment or len(segments) == self.depth:
+                break
+            if segment:
+                segments.append(segment)
+        return '/'.join([parts.netloc.lower()] + segments)
+
+    def observe_request(self, method, url, endpoint=None, response=None, seconds=0.0,
+                        bytes_sent=0, error=None):
+        '''Records one request, once its response, or error, is known.
+
+        :param method: HTTP method.
+        :type method: :mod:`string`
+
+        :param url: the URL requested.
+        :type url: :mod:`string`
+
+        :param endpoint: the endpoint name the request was tagged with.
+        :type endpoint: :mod:`string`
+
+        :param response: the response, or None if the request failed.
+        :type response: :class:`requests.Response`
+
+        :param seconds: time until the response was received.
+        :type seconds: :mod:`float`
+
+        :param bytes_sent: length of the request body.
+        :type bytes_sent: :mod:`int`
+
+        :param error: the exception raised instead of a response.
+        :type error: :class:`Exception`
+        '''
+        label = self.label(url, endpoint)
+        status = received = None
+        retries = 0
+        cached = False
+        if response is not None:
+            status = response.status_code
+            retries = getattr(response, 'retries', 0)
+            cached = getattr(response, 'from_cache', False)
+            received = _received(response)
+        with self._lock:
+            stats = self._stats(label)
+            stats['requests'] += 1
+            if status is None:
+                stats['errors'] += 1
+            else:
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['retries'] += retries
+            stats['cache_hits'] += 1 if cached else 0
+            stats['bytes_sent'] += bytes_sent or 0
+            stats['bytes_received'] += received or 0
+            if not cached:
+                self._add(stats['latency'], seconds)
+        self._emit(Event('request', label, method, url, status, seconds, bytes_sent, received,
+                         retries, cached, error))
+
+    def observe_parse(self, endpoint, seconds):
+        '''Records the time spent parsing a response of an endpoint.'''
+        with self._lock:
+            self._add(self._stats(endpoint)['parse'], seconds)
+        self._emit(Event('parse', endpoint, None, None, None, seconds, None, None, None, None,
+                         None))
+
+    @contextmanager
+    def timer(self, endpoint):
+        '''Context manager recording the time its block takes as parse \
+                time of `endpoint`.'''
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.observe_parse(endpoint, time.time() - started)
+
+    def as_dict(self):
+        '''Returns a snapshot of every metric, as a dict mapping each \
+                endpoint label to a dict of: `requests`, `statuses` (a \
+                dict of counts by status code), `errors` without a \
+                response, `retries`, `cache_hits`, `bytes_sent`, \
+                `bytes_received`, and the `latency` and `parse` \
+                histograms, each a dict of `count`, `sum` and cumulative \
+                `buckets` counts keyed by upper bound. Cache hits are \
+                left out of the latency histogram.'''
+        with self._lock:
+            return dict((label, _copy(stats, self.buckets))
+                        for label, stats in self._endpoints.items())
+
+    def to_prometheus(self, prefix='podaac'):
+        '''Returns every metric in the Prometheus text exposition format.'''
+        snapshot = self.as_dict()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+        def sample(name, labels, value):
+            text = ','.join('%s="%s"' % (key, _escape(labels[key])) for key in sorted(labels))
+            lines.append('%s_%s{%s} %s' % (prefix, name, text, _number(value)))
+
+        family('requests_total', 'counter', 'Requests completed, by endpoint and status.')
+        for label in sorted(snapshot):
+            stats = snapshot[label]
+            for status in sorted(stats['statuses']):
+                sample('requests_total', {'endpoint': label, 'status': str(status)},
+                       stats['statuses'][status])
+            if stats['errors']:
+                sample('requests_total', {'endpoint': label, 'status': 'error'}, stats['errors'])
+        for name, key, help_text in [
+                ('retries_total', 'retries', 'Request attempts sent again.'),
+                ('cache_hits_total', 'cache_hits', 'Requests answered by the cache.'),
+                ('sent_bytes_total', 'bytes_sent', 'Request body bytes sent.'),
+                ('received_bytes_total', 'bytes_received', 'Response body bytes received.')]:
+            family(name, 'counter', help_text)
+            for label in sorted(snapshot):
+                if snapshot[label]['requests']:
+                    sample(name, {'endpoint': label}, snapshot[label][key])
+        for name, key, help_text in [
+                ('request_duration_seconds', 'latency', 'Time until a response was received.'),
+                ('parse_duration_seconds', 'parse', 'Time spent parsing responses.')]:
+            family(name, 'histogram', help_text)
+            for label in sorted(snapshot):
+                histogram = snapshot[label][key]
+                if not histogram['count']:
+                    continue
+                for bound in self.buckets:
+                    sample(name + '_bucket', {'endpoint': label, 'le': _number(bound)},
+                           histogram['buckets'][bound])
+                sample(name + '_bucket', {'endpoint': label, 'le': '+Inf'}, histogram['count'])
+                sample(name + '_sum', {'endpoint': label}, histogram['sum'])
+                sample(name + '_count', {'endpoint': label}, histogram['count'])
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        '''Forgets every metric recorded so far.'''
+        with self._lock:
+            self._endpoints = {}
+
+    def _stats(self, label):
+        # callers hold self._lock
+        if label not in self._endpoints:
+            self._endpoints[label] = {
+                'requests': 0, 'statuses': {}, 'errors': 0, 'retries': 0, 'cache_hits': 0,
+                'bytes_sent': 0, 'bytes_received': 0,
+                'latency': {'count': 0, 'sum': 0.0, 'counts': [0] * len(self.buckets)},
+                'parse': {'count': 0, 'sum': 0.0, 'counts': [0] * len(self.buckets)}}
+        return self._endpoints[label]
+
+    def _add(self, histogram, seconds):
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+        index = bisect_left(self.buckets, seconds)
+        if index < len(self.buckets):
+            histogram['counts'][index] += 1
+
+    def _emit(self, event):
+        for hook in list(self._hooks):
+            hook(event)
+
+
+def request_size(kwargs):
+    '''Returns the length of the body of a request, given its keyword \
+            arguments, or 0 when it is unknown or empty.'''
+    data = kwargs.get('data')
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, type(u'')):
+        return len(data.encode('utf-8'))
+    return 0
+
+
+def _received(response):
+    if response._content is False:
+        # a streamed body has not been read yet
+        length = response.headers.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+    return len(response.content or b'')
+
+
+def _copy(stats, bounds):
+    snapshot = dict(stats)
+    snapshot['statuses'] = dict(stats['statuses'])
+    for key in ('latency', 'parse'):
+        histogram = stats[key]
+        buckets = {}
+        total = 0
+        for bound, count in zip(bounds, histogram['counts']):
+            total += count
+            buckets[bound] = total
+        snapshot[key] = {'count': histogram['count'], 'sum': histogram['sum'], 'buckets': buckets}
+    return snapshot
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -13,9 +13,10 @@
 # limitations under the License.
 
 import requests
-from future.moves.urllib.request import urlretrieve
-from future.moves.urllib.parse import urlparse
 import os
+from . import download
+from ._compat import urlparse
+from .transport import Client
 
 SEARCH_URL = 'https://oceandata.sci.gsfc.nasa.gov/api/file_search?'
 # GET_URL = 'https://oceandata.sci.gsfc.nasa.gov/cgi/getfile/'
@@ -23,11 +24,19 @@ HEADERS = {
     'User-Agent': 'Podaacpy Python Library'
 }
 
-class OceanColor:
+class OceanColor(Client):
 
     
-    def __init__(self):
+    def __init__(self, transport=None):
+        '''Sets the OBPG file search URL to https://oceandata.sci.gsfc.nasa.gov/api/file_search
+
+        :param transport: a shared :class:`podaac.transport.Transport` whose \
+                pooled connections are reused by every call. A private \
+                transport is created when none is given.
+        :type transport: :class:`podaac.transport.Transport`
+        '''
         self.SEARCH_URL = 'https://oceandata.sci.gsfc.nasa.gov/api/file_search?'
+        self._use_transport(transport)
         # self.GET_URL = 'https://oceandata.sci.gsfc.nasa.gov/cgi/getfile/'
 
     def file_search(self, sensor='', sdate='', edate='', dtype='', add_url='1', results_as_file='1',
@@ -81,31 +90,12 @@ class OceanColor:
 
         '''
         try:
-            url = SEARCH_URL
-            if sensor:
-                url = url + 'sensor=' + sensor
-            else:
-                raise Exception("'sensor' parameter is required!")
-            if sdate:
-                url = url + '&sdate=' + sdate
-            if edate:
-                url = url + '&edate=' + edate
-            if dtype:
-                url = url + '&dtype=' + dtype
-            url = url + '&addurl=' + str(add_url)
-            url = url + '&results_as_file=' + str(results_as_file)
-            if search:
-                url = url + '&search=' + search
-            elif sub_id:
-                url = url + '&subID=' + sub_id
-            else:
-                raise Exception("Either 'search' or 'sub_id' parameter is required!")
-            url = url + '&std_only=' + str(std_only)
-            if cksum:
-                url = url + '&cksum=' + cksum
-            url = url + '&format=' + output_format
+            url = self._file_search_url(sensor, sdate, edate, dtype, add_url, results_as_file,
+                                        search, sub_id, std_only, cksum, output_format)
 
-            response = requests.post(url, headers=HEADERS)
+            # the search only reads, so it is retried like a GET
+            response = self.transport.post(url, headers=HEADERS,
+                                           retry=self.transport.retry.allowing('POST'))
             status_codes = [404, 400, 503, 408]
             if response.status_code in status_codes:
                 response.raise_for_status()
@@ -116,7 +106,34 @@ class OceanColor:
 
         return str(response.text)
 
-    def get_file(self, url='', path=''):
+    def _file_search_url(self, sensor, sdate, edate, dtype, add_url, results_as_file, search,
+                         sub_id, std_only, cksum, output_format):
+        url = SEARCH_URL
+        if sensor:
+            url = url + 'sensor=' + sensor
+        else:
+            raise Exception("'sensor' parameter is required!")
+        if sdate:
+            url = url + '&sdate=' + sdate
+        if edate:
+            url = url + '&edate=' + edate
+        if dtype:
+            url = url + '&dtype=' + dtype
+        url = url + '&addurl=' + str(add_url)
+        url = url + '&results_as_file=' + str(results_as_file)
+        if search:
+            url = url + '&search=' + search
+        elif sub_id:
+            url = url + '&subID=' + sub_id
+        else:
+            raise Exception("Either 'search' or 'sub_id' parameter is required!")
+        url = url + '&std_only=' + str(std_only)
+        if cksum:
+            url = url + '&cksum=' + cksum
+        url = url + '&format=' + output_format
+        return url
+
+    def get_file(self, url='', path='', segments=1):
         '''It is possible to mimic FTP bulk data downloads using the \
                 HTTP-based data distribution server at https://oceandata.sci.gsfc.nasa.gov.
 
@@ -129,6 +146,11 @@ class OceanColor:
                 needs to be downloaded.
         :type path: :mod:`string`
 
+        :param segments: number of byte ranges fetched in parallel for files \
+                of at least 64 MB. An interrupted download is resumed from its \
+                `.part` file on the next call.
+        :type segments: :mod:`int`
+
         :returns: a file object downloaded from the \
                 HTTP-based data distribution server at https://oceandata.sci.gsfc.nasa.gov.
 
@@ -144,7 +166,7 @@ class OceanColor:
                 path = os.path.join(os.path.dirname(__file__), file)
             else:
                 path = path + '/' + file
-            urlretrieve(url, path)
+            download.fetch(self.transport, url, path, segments=segments, headers=HEADERS)
             print("Downloaded '%s' to '%s'" % (file, path))
             return file
 
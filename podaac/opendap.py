@@ -0,0 +1,698 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''A native OPeNDAP DAP2 reader. Requests select variables and index \
+hyperslabs on the server with a constraint expression, so only the bytes \
+of the selected values are sent, and the XDR encoded `.dods` response is \
+decoded into NumPy arrays which are views of the response body. This \
+module requires NumPy.'''
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
+import time
+import numpy as np
+
+# DAP2 base types, as the big-endian NumPy types they are sent as
+XDR_TYPES = {
+    'Byte': np.dtype('u1'),
+    'Int16': np.dtype('>i4'),
+    'UInt16': np.dtype('>u4'),
+    'Int32': np.dtype('>i4'),
+    'UInt32': np.dtype('>u4'),
+    'Float32': np.dtype('>f4'),
+    'Float64': np.dtype('>f8'),
+}
+# the types 16 bit integers are narrowed to once they are received
+NARROW_TYPES = {'Int16': np.dtype('>i2'), 'UInt16': np.dtype('>u2')}
+STRING_TYPES = ('String', 'Url')
+SUFFIXES = ('.html', '.dds', '.das', '.dods', '.ddx', '.dmr', '.info', '.ascii')
+DATA_MARKER = b'\nData:\n'
+
+Declaration = namedtuple('Declaration', ['name', 'type', 'dimensions', 'members'])
+Declaration.__doc__ = '''A variable declared by a DDS. `type` is the DAP \
+        type name, e.g. 'Float32' or 'Grid', `dimensions` a tuple of \
+        (name, size) pairs, where the name may be None, and `members` the \
+        declarations a Structure, Sequence or Grid holds; the array of a \
+        Grid comes first, followed by its maps.'''
+
+Aggregation = namedtuple('Aggregation', ['values', 'coordinates', 'errors', 'seconds'])
+Aggregation.__doc__ = '''One variable read from many granules into a single \
+        array. `values` joins the slabs of the granules along their first \
+        dimension, in the order of the granules, and `coordinates` holds the \
+        map vectors of a Grid variable: the map of the first dimension \
+        joined like `values`, the others as read from the first granule. \
+        The slabs of granules which failed keep the fill value and their \
+        URLs are listed in `errors`, with the exception raised.'''
+
+_TOKEN = re.compile(r'[{}\[\]=;:]|[^\s{}\[\]=;:]+')
+# DDS keywords are case insensitive
+_TYPES = dict((kind.lower(), kind) for kind in
+              list(XDR_TYPES) + list(STRING_TYPES) + ['Structure', 'Sequence', 'Grid'])
+
+
+class DAPError(Exception):
+    '''An error reported by an OPeNDAP server in place of data.'''
+
+
+def dataset_url(url):
+    '''Returns the OPeNDAP dataset URL of a granule, without the `.html` \
+            or other response suffix and query of `url`, e.g. an OPeNDAP \
+            URL mined from a granule search.'''
+    url = url.split('?', 1)[0]
+    for suffix in SUFFIXES:
+        if url.endswith(suffix):
+            return url[:-len(suffix)]
+    return url
+
+
+def constraint(variables=None, index=None, shapes=None):
+    '''Builds a DAP2 constraint expression projecting `variables` onto a \
+            hyperslab of their indices.
+
+    :param variables: names of the variables to read, or a single name. \
+            None reads every variable.
+    :type variables: :mod:`list`
+
+    :param index: selection applied to every variable, a tuple holding \
+            an int or a slice per dimension as in ``numpy.s_[0, 100:200:2]``, \
+            or a dict of such tuples by variable name. Integers select one \
+            index and, as in DAP, keep their dimension. A selection covers \
+            every dimension, unless `shapes` are given: missing trailing \
+            dimensions are then read whole.
+    :type index: :mod:`tuple`
+
+    :param shapes: the shape of each variable by name, needed to resolve \
+            open or negative bounds and missing dimensions. See \
+            :func:`needs_shapes` and :func:`shapes`.
+    :type shapes: :mod:`dict`
+
+    :returns: the constraint expression, without the leading '?'.
+    '''
+    if variables is None:
+        return ''
+    if isinstance(variables, str):
+        variables = [variables]
+    projections = []
+    for name in variables:
+        selection = index.get(name) if isinstance(index, dict) else index
+        shape = (shapes or {}).get(name)
+        projections.append(name + hyperslab(selection, shape))
+    return ','.join(projections)
+
+
+def hyperslab(selection, shape=None):
+    '''Returns the DAP2 hyperslab, e.g. '[0:1:0][100:2:198]', selecting \
+            `selection` from a variable of `shape`. See :func:`constraint`.'''
+    return ''.join('[%d]' % start if single else '[%d:%d:%d]' % (start, stride, last)
+                   for start, stride, last, single in _bounds(selection, shape))
+
+
+def _bounds(selection, shape):
+    # (start, stride, last index, single index) of every selected dimension
+    if selection is None:
+        return []
+    if not isinstance(selection, tuple):
+        selection = (selection,)
+    if shape is not None:
+        if len(selection) > len(shape):
+            raise IndexError('%d indices given for %d dimensions' % (len(selection), len(shape)))
+        selection = selection + (slice(None),) * (len(shape) - len(selection))
+    bounds = []
+    for axis, item in enumerate(selection):
+        size = shape[axis] if shape is not None else None
+        if isinstance(item, slice):
+            if size is not None:
+                start, stop, step = item.indices(size)
+            elif _open(item):
+                raise ValueError('the shape is needed to resolve %r' % (item,))
+            else:
+                start, stop, step = item.start or 0, item.stop, item.step or 1
+            if step < 1:
+                raise ValueError('hyperslab strides must be positive')
+            if stop <= start:
+                raise IndexError('empty selection %r' % (item,))
+            bounds.append((start, step, start + (stop - start - 1) // step * step, False))
+        else:
+            item = int(item)
+            if item < 0:
+                if size is None:
+                    raise ValueError('the shape is needed to resolve index %d' % item)
+                item += size
+            if size is not None and not 0 <= item < size:
+                raise IndexError('index %d is out of bounds for size %d' % (item, size))
+            bounds.append((item, 1, item, True))
+    return bounds
+
+
+def needs_shapes(variables, index):
+    '''Returns True when :func:`constraint` needs the shapes of the \
+            variables to resolve `index`: when it holds open slices or \
+            negative bounds.'''
+    if variables is None or index is None:
+        return False
+    if isinstance(variables, str):
+        variables = [variables]
+    selections = [index.get(name) for name in variables] if isinstance(index, dict) else [index]
+    for selection in selections:
+        if selection is None:
+            continue
+        for item in selection if isinstance(selection, tuple) else (selection,):
+            if _open(item) if isinstance(item, slice) else int(item) < 0:
+                return True
+    return False
+
+
+def _open(item):
+    return item.stop is None or (item.start or 0) < 0 or item.stop < 0
+
+
+def parse_dds(text):
+    '''Parses a DDS document into a list of :class:`Declaration`.'''
+    tokens = _TOKEN.findall(text)
+    position = _expect(tokens, 0, 'Dataset')
+    position = _expect(tokens, position, '{')
+    declarations, position = _declarations(tokens, position)
+    return declarations
+
+
+def shapes(declarations):
+    '''Returns the shape of every array in `declarations` by name. \
+            Members of a Structure are named 'structure.member', and \
+            the array and maps of a Grid by their own names.'''
+    found = {}
+    for declaration in declarations:
+        if declaration.type == 'Grid':
+            for member in declaration.members:
+                found.setdefault(member.name, _shape(member))
+            found[declaration.name] = _shape(declaration.members[0])
+        elif declaration.members:
+            for name, shape in shapes(declaration.members).items():
+                found[declaration.name + '.' + name] = shape
+        else:
+            found[declaration.name] = _shape(declaration)
+    return found
+
+
+def _shape(declaration):
+    return tuple(size for _, size in declaration.dimensions)
+
+
+def _declarations(tokens, position):
+    declarations = []
+    while tokens[position] != '}':
+        declaration, position = _declaration(tokens, position)
+        declarations.append(declaration)
+    return declarations, position + 1
+
+
+def _declaration(tokens, position):
+    kind = _TYPES.get(tokens[position].lower())
+    if kind in ('Structure', 'Sequence'):
+        members, position = _declarations(tokens, _expect(tokens, position + 1, '{'))
+        return _named(tokens, position, kind, members)
+    if kind == 'Grid':
+        position = _expect(tokens, position + 1, '{')
+        position = _expect(tokens, _expect(tokens, position, 'Array'), ':')
+        array, position = _declaration(tokens, position)
+        position = _expect(tokens, _expect(tokens, position, 'Maps'), ':')
+        maps, position = _declarations(tokens, position)
+        return _named(tokens, position, kind, [array] + maps)
+    if kind is None:
+        raise ValueError('unsupported DDS type %r' % tokens[position])
+    return _named(tokens, position + 1, kind, ())
+
+
+def _named(tokens, position, kind, members):
+    name = tokens[position]
+    position += 1
+    dimensions = []
+    while tokens[position] == '[':
+        if tokens[position + 2] == '=':
+            dimension, size = tokens[position + 1], tokens[position + 3]
+            position = _expect(tokens, position + 4, ']')
+        else:
+            dimension, size = None, tokens[position + 1]
+            position = _expect(tokens, position + 2, ']')
+        dimensions.append((dimension, int(size)))
+    return Declaration(name, kind, tuple(dimensions), tuple(members)), \
+        _expect(tokens, position, ';')
+
+
+def _expect(tokens, position, token):
+    if position >= len(tokens) or tokens[position].lower() != token.lower():
+        raise ValueError('malformed DDS: expected %r at token %d' % (token, position))
+    return position + 1
+
+
+def decode(content):
+    '''Decodes a `.dods` response.
+
+    :param content: the response body, its DDS followed by the XDR data.
+    :type content: :mod:`bytes`
+
+    :returns: a dict of NumPy arrays by variable name, in the order of \
+            the DDS, named as by :func:`shapes`. Arrays are read-only \
+            views of `content`, except 16 bit integers which are sent \
+            as 32 bit and narrowed. Scalars are 0-d arrays.
+
+    :raises DAPError: when the server answered with an error.
+    '''
+    marker = content.find(DATA_MARKER)
+    if marker < 0:
+        raise DAPError(_error_message(content))
+    declarations = parse_dds(content[:marker].decode('utf-8', 'replace'))
+    arrays = {}
+    position = _decode(declarations, content, marker + len(DATA_MARKER), arrays, '')
+    if position != len(content):
+        raise ValueError('%d unexpected bytes after the data' % (len(content) - position))
+    return arrays
+
+
+def _decode(declarations, content, position, arrays, prefix):
+    for declaration in declarations:
+        if declaration.type == 'Grid':
+            array = declaration.members[0]
+            value, position = _array(array, content, position)
+            arrays[prefix + declaration.name] = value
+            for member in declaration.members[1:]:
+                value, position = _array(member, content, position)
+                arrays.setdefault(prefix + member.name, value)
+        elif declaration.type == 'Structure':
+            position = _decode(declaration.members, content, position, arrays,
+                               prefix + declaration.name + '.')
+        elif declaration.type == 'Sequence':
+            raise ValueError('Sequence %r cannot be decoded into arrays' % declaration.name)
+        else:
+            value, position = _array(declaration, content, position)
+            arrays[prefix + declaration.name] = value
+    return position
+
+
+def _array(declaration, content, position):
+    shape = _shape(declaration)
+    if shape:
+        # arrays start with their length, sent twice for all but strings
+        count = int(np.frombuffer(content, XDR_TYPES['UInt32'], 1, position)[0])
+        position += 4 if declaration.type in STRING_TYPES else 8
+        if count != int(np.prod(shape)):
+            raise ValueError('%s holds %d values, not %d' % (declaration.name, count,
+                                                             int(np.prod(shape))))
+    else:
+        count = 1
+    if declaration.type in STRING_TYPES:
+        values = []
+        for _ in range(count):
+            length = int(np.frombuffer(content, XDR_TYPES['UInt32'], 1, position)[0])
+            position += 4
+            values.append(content[position:position + length].decode('utf-8', 'replace'))
+            position += _padded(length)
+        return np.array(values, dtype=object).reshape(shape), position
+    dtype = XDR_TYPES[declaration.type]
+    if declaration.type == 'Byte' and not shape:
+        # a scalar byte takes a whole XDR word
+        dtype, narrow = XDR_TYPES['UInt32'], np.dtype('u1')
+    else:
+        narrow = NARROW_TYPES.get(declaration.type)
+    size = count * dtype.itemsize
+    if position + size > len(content):
+        raise ValueError('the data of %s is truncated' % declaration.name)
+    value = np.frombuffer(content, dtype, count, position).reshape(shape)
+    if narrow is not None:
+        value = value.astype(narrow)
+    return value, position + _padded(size)
+
+
+def _padded(size):
+    # XDR pads every item to a multiple of 4 bytes
+    return (size + 3) & ~3
+
+
+def _error_message(content):
+    text = content[:4096].decode('utf-8', 'replace')
+    match = re.search(r'message\s*=\s*"((?:[^"\\]|\\.)*)"', text)
+    if match:
+        return match.group(1)
+    return text.strip() or 'the response holds no data'
+
+
+def fetch(transport, url, variables=None, index=None, endpoint='opendap', headers=None):
+    '''Reads variables of an OPeNDAP dataset through a \
+            :class:`podaac.transport.Transport`, slicing them on the server.
+
+    :param url: the OPeNDAP URL of the granule, with or without its \
+            `.html` suffix.
+    :type url: :mod:`string`
+
+    :param variables: names of the variables to read, or a single name. \
+            None reads every variable.
+    :type variables: :mod:`list`
+
+    :param index: the hyperslab to read. See :func:`constraint`. When \
+            bounds must be resolved against the shapes of the variables, \
+            i.e. for open slices or negative bounds, the `.dds` of the \
+            projection is fetched first.
+    :type index: :mod:`tuple`
+
+    :returns: a dict of NumPy arrays by variable name. See :func:`decode`.
+
+    :raises DAPError: when the server answered with an error.
+    '''
+    url = dataset_url(url)
+    found = None
+    if needs_shapes(variables, index):
+        response = check(transport.get(dds_url(url, variables), endpoint=endpoint,
+                                       headers=headers))
+        found = shapes(parse_dds(response.text))
+    response = check(transport.get(request_url(url, variables, index, found),
+                                   endpoint=endpoint, headers=headers))
+    return decode(response.content)
+
+
+def request_url(url, variables=None, index=None, shapes=None):
+    '''Returns the `.dods` URL reading `variables` over `index`. See \
+            :func:`constraint`.'''
+    return dataset_url(url) + '.dods?' + _quote(constraint(variables, index, shapes))
+
+
+def dds_url(url, variables=None):
+    '''Returns the `.dds` URL describing `variables`, whole.'''
+    return dataset_url(url) + '.dds?' + _quote(constraint(variables))
+
+
+def check(response):
+    '''Returns `response`, or raises the error it reports.
+
+    :raises DAPError: when the server answered with a DAP error.
+    :raises requests.exceptions.HTTPError: for other failed responses.
+    '''
+    if response.status_code >= 400:
+        if response.content[:5] == b'Error':
+            raise DAPError(_error_message(response.content))
+        response.raise_for_status()
+    return response
+
+
+def _quote(expression):
+    # servers behind Tomcat reject raw brackets in a query
+    return expression.replace('[', '%5B').replace(']', '%5D')
+
+
+def aggregate(transport, urls, variable, index=None, bbox=None, max_workers=8, out=None,
+              fill_value=None, callback=None, endpoint='opendap', headers=None):
+    '''Reads the same slab of one variable from many granules, e.g. the \
+            daily files of a level 3 or 4 time series, concurrently, \
+            writing every slab in place into one preallocated array.
+
+    :param urls: the OPeNDAP URLs of the granules, in the order of the \
+            result. The granules are expected to share one grid.
+    :type urls: :mod:`list`
+
+    :param variable: name of the variable to read.
+    :type variable: :mod:`string`
+
+    :param index: the hyperslab read from every granule. See \
+            :func:`constraint`. With a `bbox` it only selects the leading \
+            dimensions, e.g. time.
+    :type index: :mod:`tuple`
+
+    :param bbox: bounding box in order of west, south, east, north, as a \
+            string like granule_search() accepts or a tuple, selecting \
+            the cells of the last two dimensions, latitude and longitude, \
+            whose centres it holds. See :func:`bbox_window`.
+    :type bbox: :mod:`string`
+
+    :param max_workers: maximum number of granules read at once.
+    :type max_workers: :mod:`int`
+
+    :param out: array to write the values into, of the shape of the \
+            result, e.g. a :class:`numpy.memmap`. By default one is \
+            allocated with the native type of the variable.
+    :type out: :class:`numpy.ndarray`
+
+    :param fill_value: value of the slabs of failed granules. Defaults \
+            to NaN for floating point variables and 0 otherwise.
+    :type fill_value: :mod:`float`
+
+    :param callback: optional callable invoked as callback(url, error) \
+            as soon as each granule is done; error is None on success.
+    :type callback: :mod:`callable`
+
+    :returns: an :class:`Aggregation`.
+
+    :raises ValueError: when the selection is invalid for the variable.
+    '''
+    aggregator = Aggregator(urls, variable, index, bbox, out, fill_value, callback)
+
+    def get(url):
+        return check(transport.get(url, endpoint=endpoint, headers=headers))
+
+    for url in aggregator.urls:
+        try:
+            located = aggregator.describe(url, get(dds_url(url)).text)
+            if located is not None:
+                aggregator.locate(get(located).content)
+            break
+        except (EnvironmentError, DAPError) as error:
+            aggregator.failed(url, error)
+
+    slabs = aggregator.slabs()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(slabs)))) as executor:
+        futures = dict((executor.submit(get, slab), (position, url))
+                       for position, url, slab in slabs)
+        for future in as_completed(futures):
+            position, url = futures[future]
+            try:
+                aggregator.store(position, url, future.result().content)
+            except Exception as error:
+                aggregator.failed(url, error)
+    return aggregator.result()
+
+
+class Aggregator(object):
+    '''The state of one aggregation, shared by :func:`aggregate` and its \
+            asyncio twin, which only differ in how they send requests.
+
+    The first granule which answers describes the grid of all of them: \
+    pass its DDS to :meth:`describe`, and with a bbox the coordinates at \
+    the URL it returns to :meth:`locate`. Then read every URL of \
+    :meth:`slabs`, passing each body to :meth:`store`, and every error \
+    to :meth:`failed`. :meth:`result` returns the :class:`Aggregation`.
+
+    See :func:`aggregate` for the parameters.
+    '''
+
+    def __init__(self, urls, variable, index=None, bbox=None, out=None, fill_value=None,
+                 callback=None):
+        self.urls = list(urls)
+        self.variable = variable
+        self.index = index
+        self.bbox = bbox
+        self.out = out
+        self.fill_value = fill_value
+        self.callback = callback
+        self.errors = {}
+        self.started = time.time()
+        self._declarations = None
+        self._result = None
+
+    def describe(self, url, dds):
+        '''Plans the slab read from every granule from the DDS of `url`.
+
+        Its whole DDS is read, so that a variable it lacks fails before \
+        any data is.
+
+        :returns: the URL of the coordinates the bbox is resolved \
+                against, to pass to :meth:`locate`, or None when there \
+                is no bbox.
+        '''
+        declarations = parse_dds(dds)
+        if self.bbox is None:
+            self._start(_Plan(declarations, self.variable, self.index, None, None))
+            return None
+        self._declarations = declarations
+        return request_url(url, _grid_axes(declarations, self.variable))
+
+    def locate(self, content):
+        '''Resolves the bbox against the .dods body of the coordinates \
+                URL :meth:`describe` returned.
+        '''
+        self._start(_Plan(self._declarations, self.variable, self.index, self.bbox,
+                          decode(content)))
+
+    def _start(self, plan):
+        self._result = _Aggregation(plan, len(self.urls), self.out, self.fill_value)
+
+    def slabs(self):
+        '''Returns the (position, url, slab URL) of every granule which \
+                has not failed yet.
+
+        :raises ValueError: when there are no granules.
+        :raises: the error of the last granule when none described the grid.
+        '''
+        if self._result is None:
+            if not self.urls:
+                raise ValueError('no granules to aggregate')
+            raise self.errors[self.urls[-1]]
+        suffix = '.dods?' + self._result.plan.constraint
+        return [(position, url, dataset_url(url) + suffix)
+                for position, url in enumerate(self.urls) if url not in self.errors]
+
+    def store(self, position, url, content):
+        '''Writes the .dods body of the slab of `url` at `position` in \
+                place. Call it from one thread or task at a time.
+        '''
+        self._result.store(position, content)
+        if self.callback is not None:
+            self.callback(url, None)
+
+    def failed(self, url, error):
+        '''Records the error of `url`; its slab keeps the fill value.'''
+        self.errors[url] = error
+        if self.callback is not None:
+            self.callback(url, error)
+
+    def result(self):
+        '''Returns the :class:`Aggregation`.'''
+        return self._result.finish(self.errors, time.time() - self.started)
+
+
+def bbox_window(lat, lon, bbox):
+    '''Returns the (latitude slice, longitude slice) selecting the cells \
+            of a regular grid whose centres are inside `bbox`.
+
+    :param lat: latitudes of the grid rows, ascending or descending.
+    :type lat: :class:`numpy.ndarray`
+
+    :param lon: longitudes of the grid columns, ascending, from -180 to \
+            180 or from 0 to 360.
+    :type lon: :class:`numpy.ndarray`
+
+    :param bbox: bounding box in order of west, south, east, north, as a \
+            string or a tuple.
+    :type bbox: :mod:`string`
+
+    :raises ValueError: when no cell is inside `bbox`, or when it crosses \
+            the seam of the longitudes and needs two windows.
+    '''
+    if not isinstance(bbox, (tuple, list)):
+        bbox = bbox.split(',')
+    west, south, east, north = [float(value) for value in bbox]
+    lat, lon = np.asarray(lat), np.asarray(lon)
+    if lon.max() > 180:
+        west, east = west % 360, east % 360
+    if west > east:
+        raise ValueError('bbox %r crosses the seam of the grid longitudes' % (bbox,))
+    rows = np.flatnonzero((lat >= south) & (lat <= north))
+    columns = np.flatnonzero((lon >= west) & (lon <= east))
+    if not len(rows) or not len(columns):
+        raise ValueError('bbox %r holds no cell of the grid' % (bbox,))
+    return slice(int(rows[0]), int(rows[-1]) + 1), slice(int(columns[0]), int(columns[-1]) + 1)
+
+
+def _grid_axes(declarations, variable):
+    # names of the latitude and longitude dimensions of a variable
+    array, _ = _find(declarations, variable)
+    names = [name for name, _ in array.dimensions[-2:]]
+    if len(names) < 2 or None in names:
+        raise ValueError('%s has no named latitude and longitude dimensions' % variable)
+    return names
+
+
+def _find(declarations, variable):
+    # the array declaration of a variable, and the maps of its grid
+    for declaration in declarations:
+        if declaration.name == variable:
+            if declaration.type == 'Grid':
+                return declaration.members[0], declaration.members[1:]
+            if declaration.type in XDR_TYPES:
+                return declaration, ()
+            raise ValueError('%s is a %s, not a numeric array' % (variable, declaration.type))
+    raise ValueError('%s is not a variable of the granules' % variable)
+
+
+def _native(kind):
+    return NARROW_TYPES.get(kind, XDR_TYPES[kind]).newbyteorder('=')
+
+
+def _fill(dtype, fill_value):
+    if fill_value is not None:
+        return fill_value
+    return np.nan if dtype.kind == 'f' else 0
+
+
+class _Plan(object):
+    # the constraint read from every granule, and the shape of its slab
+
+    def __init__(self, declarations, variable, index, bbox, coordinates):
+        self.variable = variable
+        self.array, self.maps = _find(declarations, variable)
+        shape = _shape(self.array)
+        selection = index
+        if bbox is not None:
+            latitude, longitude = _grid_axes(declarations, variable)
+            window = bbox_window(coordinates[latitude], coordinates[longitude], bbox)
+            leading = () if index is None else index if isinstance(index, tuple) else (index,)
+            if len(leading) > len(shape) - 2:
+                raise IndexError('%d indices given for %d leading dimensions' % (
+                    len(leading), len(shape) - 2))
+            selection = leading + (slice(None),) * (len(shape) - 2 - len(leading)) + window
+        bounds = _bounds(selection, shape) or [(0, 1, size - 1, False) for size in shape]
+        self.constraint = _quote(variable + ''.join(
+            '[%d:%d:%d]' % (start, stride, last) for start, stride, last, _ in bounds))
+        self.shape = tuple((last - start) // stride + 1 for start, stride, last, _ in bounds)
+
+
+class _Aggregation(object):
+    # the preallocated arrays the slab of each granule is written into
+
+    def __init__(self, plan, count, out, fill_value):
+        self.plan = plan
+        self.rows = plan.shape[0] if plan.shape else 1
+        shape = (count * self.rows,) + plan.shape[1:]
+        if out is None:
+            dtype = _native(plan.array.type)
+            out = np.full(shape, _fill(dtype, fill_value), dtype)
+        elif out.shape != shape:
+            raise ValueError('out has shape %r, not %r' % (out.shape, shape))
+        else:
+            out[...] = _fill(out.dtype, fill_value)
+        self.values = out
+        self.coordinates = {}
+        if plan.maps:
+            first = plan.maps[0]
+            dtype = _native(first.type)
+            self.coordinates[first.name] = np.full(shape[0], _fill(dtype, fill_value), dtype)
+
+    def store(self, position, content):
+        # runs in the calling thread, so the arrays are never written concurrently
+        arrays = decode(content)
+        value = arrays[self.plan.variable]
+        if value.shape != self.plan.shape:
+            raise ValueError('%s has shape %r in this granule, not %r' % (
+                self.plan.variable, value.shape, self.plan.shape))
+        rows = slice(position * self.rows, (position + 1) * self.rows)
+        self.values[rows] = value.reshape(self.values[rows].shape)
+        for number, member in enumerate(self.plan.maps):
+            if number == 0:
+                self.coordinates[member.name][rows] = arrays[member.name]
+            elif member.name not in self.coordinates:
+                # a copy, so that the response body is not kept alive
+                self.coordinates[member.name] = np.array(arrays[member.name])
+
+    def finish(self, errors, seconds):
+        coordinates = dict((member.name, self.coordinates[member.name])
+                           for member in self.plan.maps if member.name in self.coordinates)
+        return Aggregation(self.values, coordinates, errors, seconds)
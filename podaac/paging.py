@@ -0,0 +1,61 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+from .records import Results
+
+
+def fetch_remaining_pages(fetch_page, total_results, start_index, items_per_page, max_workers=4):
+    '''Fetches every page that follows the first one of a paged search \
+            concurrently on a bounded thread pool.
+
+    :param fetch_page: a callable which takes a start index and returns \
+            the parsed page at that index.
+    :type fetch_page: :mod:`callable`
+
+    :param total_results: total number of results reported by the first page.
+    :type total_results: :mod:`int`
+
+    :param start_index: start index of the first page.
+    :type start_index: :mod:`int`
+
+    :param items_per_page: number of results per page.
+    :type items_per_page: :mod:`int`
+
+    :param max_workers: maximum number of pages fetched at once.
+    :type max_workers: :mod:`int`
+
+    :returns: a list of the remaining pages, in start index order.
+    '''
+    start_indices = list(range(start_index + items_per_page, total_results, items_per_page))
+    if not start_indices:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(start_indices))) as executor:
+        return list(executor.map(fetch_page, start_indices))
+
+
+def merge_pages(pages):
+    '''Joins the pages of a paged search into one result.
+
+    :param pages: the parsed pages, each a :class:`podaac.records.Results`, \
+            in start index order.
+    :type pages: :mod:`list`
+
+    :returns: a :class:`podaac.records.Results` holding the records of \
+            every page, with the paging values of the first. It keeps no \
+            raw response body.
+    '''
+    first = pages[0]
+    return Results([record for page in pages for record in page], None, None,
+                   first.total_results, first.start_index, first.items_per_page)
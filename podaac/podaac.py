@@ -12,30 +12,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from future.moves.urllib.parse import urlencode
-from future.moves.urllib.request import urlopen, urlretrieve
-from future.moves.http.client import HTTPSConnection
-import gzip
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
 import json
 import ntpath
 import os
 import requests
 import time
 import defusedxml.ElementTree as ET
-import zipfile
+from . import atom, download, extract, paging, subset
+from ._compat import urlencode
+from .polling import PollingStrategy
+from .records import BatchResults, Variable
+from .throttle import HostThrottle
+from .transport import Client
 
 URL = 'https://podaac.jpl.nasa.gov/ws/'
 IMAGE_URL = 'https://podaac-tools.jpl.nasa.gov/l2ss-services/l2ss/preview/'
+DAP = '{http://xml.opendap.org/ns/DAP/3.2#}'
 HEADERS = {
     'User-Agent': 'Podaacpy Python Library v2.4.0'
 }
 
 
-class Podaac:
+class Podaac(Client):
 
-    def __init__(self):
-        """Sets the base WebServices URL to https://podaac.jpl.nasa.gov/ws/"""
+    def __init__(self, transport=None):
+        """Sets the base WebServices URL to https://podaac.jpl.nasa.gov/ws/
+
+        :param transport: a shared :class:`podaac.transport.Transport` whose \
+                pooled connections are reused by every call. A private \
+                transport is created when none is given.
+        :type transport: :class:`podaac.transport.Transport`
+        """
         self.URL = 'https://podaac.jpl.nasa.gov/ws/'
+        self._use_transport(transport)
 
     def dataset_metadata(self, dataset_id='', short_name='', _format='iso'):
         '''Dataset metadata service retrieves the metadata of a \
@@ -58,13 +69,8 @@ class Podaac:
 
         '''
         try:
-            url = self.URL + 'metadata/dataset/?'
-            if dataset_id:
-                url = url + 'datasetId=' + dataset_id
-            if short_name:
-                url = url + '&shortName=' + short_name
-            url = url + '&format=' + _format
-            metadata = requests.get(url, headers=HEADERS)
+            url = self._dataset_metadata_url(dataset_id, short_name, _format)
+            metadata = self.transport.get(url, headers=HEADERS, endpoint='dataset_metadata')
             status_codes = [404, 400, 503, 408]
             if metadata.status_code in status_codes:
                 metadata.raise_for_status()
@@ -75,9 +81,18 @@ class Podaac:
 
         return metadata.text
 
-    def dataset_search(self, keyword='', start_time='', end_time='', start_index='', dataset_id='', short_name='',
-                       instrument='', satellite='', file_format='', status='', process_level='', sort_by='',
-                       bbox='', items_per_page='50', _format='atom', full='False'):
+    def _dataset_metadata_url(self, dataset_id, short_name, _format):
+        url = self.URL + 'metadata/dataset/?'
+        if dataset_id:
+            url = url + 'datasetId=' + dataset_id
+        if short_name:
+            url = url + '&shortName=' + short_name
+        return url + '&format=' + _format
+
+    def dataset_search(self, keyword='', start_time='', end_time='', start_index='', dataset_id='',
+                       short_name='', instrument='', satellite='', file_format='', status='',
+                       process_level='', sort_by='', bbox='', items_per_page='50', _format='atom',
+                       full='False', parse=False):
         '''Dataset Search service searches PO.DAAC's dataset catalog, over \
                 Level 2, Level 3, and Level 4 datasets, using the following parameters: \
                 dataset_id, short_name, start_time, end_time, bbox, and others.
@@ -151,44 +166,23 @@ class Podaac:
                 Possible values: true, false
         :type full: :mod:`string`
 
+        :param parse: True to return a :class:`podaac.records.Results` of \
+                :class:`podaac.records.Dataset` records instead of the raw \
+                response. Requires the atom format.
+        :type parse: :mod:`bool`
+
         :returns: the specified response format. If format is not specified, \
                 format is set to atom. Possible values: atom, html
 
         '''
+        if parse and _format != 'atom':
+            raise ValueError("parse=True requires the 'atom' format.")
         try:
-            url = self.URL + 'search/dataset/?'
-            url = url + 'itemsPerPage=' + items_per_page + '&format=' + \
-                _format + '&full=' + full
-
-            if keyword:
-                url = url + '&keyword=' + keyword
-            if start_time:
-                url = url + '&startTime=' + start_time
-            if end_time:
-                url = url + '&endTime=' + end_time
-            if bbox:
-                url = url + '&bbox=' + bbox
-            if start_index:
-                url = url + '&startIndex=' + start_index
-            if dataset_id:
-                url = url + '&datasetId=' + dataset_id
-            if short_name:
-                url = url + '&shortName=' + short_name
-            if instrument:
-                url = url + '&instrument=' + instrument
-            if satellite:
-                url = url + '&satellite=' + satellite
-            if file_format:
-                url = url + '&fileFormat=' + file_format
-            if status:
-                url = url + '&status=' + status
-            if process_level:
-                url = url + '&processLevel=' + process_level
-            if sort_by:
-                url = url + '&sortBy=' + sort_by
-            if bbox:
-                url = url + '&bbox=' + bbox
-            datasets = requests.get(url, headers=HEADERS)
+            url = self._dataset_search_url(keyword, start_time, end_time, start_index, dataset_id,
+                                           short_name, instrument, satellite, file_format, status,
+                                           process_level, sort_by, bbox, items_per_page, _format,
+                                           full)
+            datasets = self.transport.get(url, headers=HEADERS)
             status_codes = [404, 400, 503, 408]
             if datasets.status_code in status_codes:
                 datasets.raise_for_status()
@@ -197,47 +191,207 @@ class Podaac:
             print(error)
             raise
 
+        if parse:
+            return self._parse('dataset_search', atom.parse_results, datasets.content,
+                               datasets.encoding, atom.dataset_from_entry)
         return datasets.text
 
-    def dataset_variables(self, dataset_id):
+    def _dataset_search_url(self, keyword, start_time, end_time, start_index, dataset_id,
+                            short_name, instrument, satellite, file_format, status, process_level,
+                            sort_by, bbox, items_per_page, _format, full):
+        url = self.URL + 'search/dataset/?'
+        url = url + 'itemsPerPage=' + items_per_page + '&format=' + \
+            _format + '&full=' + full
+
+        if keyword:
+            url = url + '&keyword=' + keyword
+        if start_time:
+            url = url + '&startTime=' + start_time
+        if end_time:
+            url = url + '&endTime=' + end_time
+        if bbox:
+            url = url + '&bbox=' + bbox
+        if start_index:
+            url = url + '&startIndex=' + start_index
+        if dataset_id:
+            url = url + '&datasetId=' + dataset_id
+        if short_name:
+            url = url + '&shortName=' + short_name
+        if instrument:
+            url = url + '&instrument=' + instrument
+        if satellite:
+            url = url + '&satellite=' + satellite
+        if file_format:
+            url = url + '&fileFormat=' + file_format
+        if status:
+            url = url + '&status=' + status
+        if process_level:
+            url = url + '&processLevel=' + process_level
+        if sort_by:
+            url = url + '&sortBy=' + sort_by
+        if bbox:
+            url = url + '&bbox=' + bbox
+
+        return url
+
+    def dataset_search_all(self, keyword='', start_time='', end_time='', dataset_id='',
+                           short_name='', instrument='', satellite='', file_format='', status='',
+                           process_level='', sort_by='', bbox='', items_per_page='400',
+                           full='False', max_workers=4):
+        '''Bulk variant of dataset_search() which returns every matching \
+                dataset rather than a single page. The first page is read to \
+                learn the OpenSearch totalResults, then all remaining pages \
+                are fetched concurrently and parsed into one list, in \
+                order. The search parameters are those of dataset_search().
+
+        :param items_per_page: number of results per page. The value range \
+                is from 1 to 400.
+        :type items_per_page: :mod:`string`
+
+        :param max_workers: maximum number of pages fetched at once.
+        :type max_workers: :mod:`int`
+
+        :returns: a :class:`podaac.records.Results` of \
+                :class:`podaac.records.Dataset`, one per matching dataset.
+
+        '''
+        def fetch_page(start_index):
+            return self._get_results('dataset_search', self._dataset_search_url(
+                keyword, start_time, end_time, str(start_index), dataset_id, short_name, instrument,
+                satellite, file_format, status, process_level, sort_by, bbox, items_per_page,
+                'atom', full), atom.dataset_from_entry)
+
+        return self._fetch_all_pages(fetch_page, int(items_per_page), max_workers)
+
+    def dataset_variables(self, dataset_id, parse=False):
         '''Given a PO.DAAC dataset identifier this function will return list of dataset variables.
 
         :param dataset_id: dataset persistent ID. dataset_id \
                 is required for this metadata service.
         :type dataset_id: :mod:`string`
 
+        :param parse: True to return :class:`podaac.records.Variable` \
+                records, with type, dimensions and units, instead of names.
+        :type parse: :mod:`bool`
+
         :returns: a list of dataset variables for the dataset.
 
         '''
 
         dataset_url = ""
-        dataset_variables = []
-        dataset = self.granule_search(dataset_id=dataset_id)
-        root = ET.fromstring(dataset.encode('utf-8'))
-        dataset_entry = root.findall("./{http://www.w3.org/2005/Atom}entry")[0]
-        dataset_links = dataset_entry.findall("{http://www.w3.org/2005/Atom}link")
-        for link in dataset_links:
-            if link.attrib['title'] == "OPeNDAP URL":
-                dataset_url = link.attrib['href'].replace('html', 'ddx')
-                break
+        # only the first granule is needed to locate the OPeNDAP DDX
+        url = self._granule_search_url(dataset_id, '', '', '', '', 'timeAsc', '1', 'atom')
+        dataset = self._get_page(url, stream=False, endpoint='dataset_variables')
+        granule = next(atom.Feed(BytesIO(dataset.content)).granules(), None)
+        if granule is not None and granule.opendap_url:
+            dataset_url = granule.opendap_url.replace('html', 'ddx')
         try:
-            dataset_ddx_response = requests.get(dataset_url, headers=HEADERS)
+            dataset_ddx_response = self.transport.get(dataset_url, headers=HEADERS,
+                                                      endpoint='dataset_variables')
             status_codes = [404, 400, 503, 408]
             if dataset_ddx_response.status_code in status_codes:
                 dataset_ddx_response.raise_for_status()
 
-            root = ET.fromstring(dataset_ddx_response.text.encode('utf-8'))
-            dataset_vars = root.findall("{http://xml.opendap.org/ns/DAP/3.2#}Array")
-            dataset_vars.extend(root.findall("{http://xml.opendap.org/ns/DAP/3.2#}Grid"))
-            for variable in dataset_vars:
-                dataset_variables.append(variable.attrib['name'])
+            root = self._parse('dataset_variables', ET.fromstring, dataset_ddx_response.content)
+            dataset_variables = _ddx_variables(root)
 
         except requests.exceptions.HTTPError as error:
             print("It's likely that variable search is not available for your dataset. " +
                   "Please see https://github.com/nasa/podaacpy/issues/128")
             print(error)
             raise
-        return dataset_variables
+        if parse:
+            return dataset_variables
+        return [variable.name for variable in dataset_variables]
+
+    def granule_opendap(self, opendap_url, variables=None, index=None):
+        '''Reads variables of a granule from its OPeNDAP server, e.g. \
+                an URL returned by \
+                :meth:`podaac.podaac_utils.PodaacUtils.mine_opendap_urls_from_granule_search`. \
+                Only the selected values are transferred: the server \
+                slices the variables with a constraint expression. \
+                Requires NumPy.
+
+        :param opendap_url: OPeNDAP URL of the granule, with or without \
+                its '.html' suffix.
+        :type opendap_url: :mod:`string`
+
+        :param variables: names of the variables to read, or a single \
+                name. None reads every variable.
+        :type variables: :mod:`list`
+
+        :param index: the hyperslab to read, a tuple holding an int or a \
+                slice per dimension as in ``numpy.s_[0, 100:200:2, 300:400]``, \
+                or a dict of such tuples by variable name. See \
+                :func:`podaac.opendap.constraint`.
+        :type index: :mod:`tuple`
+
+        :returns: a dict of NumPy arrays by variable name. See \
+                :func:`podaac.opendap.decode`.
+
+        :raises podaac.opendap.DAPError: when the server answered with an error.
+
+        '''
+        from . import opendap
+        shapes = None
+        if opendap.needs_shapes(variables, index):
+            dds = opendap.check(self.transport.get(opendap.dds_url(opendap_url, variables),
+                                                   headers=HEADERS, endpoint='granule_opendap'))
+            shapes = opendap.shapes(self._parse('granule_opendap', opendap.parse_dds, dds.text))
+        url = opendap.request_url(opendap_url, variables, index, shapes)
+        response = opendap.check(self.transport.get(url, headers=HEADERS,
+                                                    endpoint='granule_opendap'))
+        return self._parse('granule_opendap', opendap.decode, response.content)
+
+    def granule_opendap_all(self, opendap_urls, variable, index=None, bbox=None, max_workers=8,
+                            out=None, fill_value=None, callback=None):
+        '''Reads the same slab of one variable from many granules, e.g. \
+                the OPeNDAP URLs of a level 3 or 4 time series returned by \
+                granule_search(). The slabs are fetched concurrently and \
+                written in place into one preallocated array, joined along \
+                their first dimension, e.g. time x lat x lon. A granule \
+                which cannot be read is reported instead of failing the \
+                whole series. Requires NumPy.
+
+        :param opendap_urls: OPeNDAP URLs of the granules, in the order \
+                of the result. The granules are expected to share one grid.
+        :type opendap_urls: :mod:`list`
+
+        :param variable: name of the variable to read.
+        :type variable: :mod:`string`
+
+        :param index: the hyperslab read from every granule, see \
+                :meth:`granule_opendap`. With a `bbox` it only selects the \
+                dimensions before latitude and longitude.
+        :type index: :mod:`tuple`
+
+        :param bbox: bounding box in order of west, south, east, north, \
+                selecting the grid cells whose centres it holds.
+        :type bbox: :mod:`string`
+
+        :param max_workers: maximum number of granules read at once.
+        :type max_workers: :mod:`int`
+
+        :param out: array to write the values into, e.g. a \
+                :class:`numpy.memmap`. By default one is allocated.
+        :type out: :class:`numpy.ndarray`
+
+        :param fill_value: value of the slabs of failed granules. \
+                Defaults to NaN for floating point variables and 0 otherwise.
+        :type fill_value: :mod:`float`
+
+        :param callback: optional callable invoked as callback(url, error) \
+                as soon as each granule is done; error is None on success.
+        :type callback: :mod:`callable`
+
+        :returns: a :class:`podaac.opendap.Aggregation` holding the \
+                values, the coordinates of the grid and the failed granules.
+
+        '''
+        from . import opendap
+        return opendap.aggregate(self.transport, opendap_urls, variable, index=index, bbox=bbox,
+                                 max_workers=max_workers, out=out, fill_value=fill_value,
+                                 callback=callback, endpoint='granule_opendap', headers=HEADERS)
 
     def granule_metadata(self, dataset_id='', short_name='', granule_name='', _format='iso'):
         '''Granule metadata service retrieves the metadata of a granule \
@@ -263,18 +417,8 @@ class Podaac:
         '''
 
         try:
-            url = self.URL + 'metadata/granule/?'
-            if dataset_id:
-                url = url + 'datasetId=' + dataset_id
-            else:
-                raise Exception("Dataset Id is required")
-            if short_name:
-                url = url + '&shortName=' + short_name
-            if granule_name:
-                url = url + '&granuleName=' + granule_name
-
-            url = url + '&format=' + _format
-            granule_md = requests.get(url, headers=HEADERS)
+            url = self._granule_metadata_url(dataset_id, short_name, granule_name, _format)
+            granule_md = self.transport.get(url, headers=HEADERS, endpoint='granule_metadata')
             status_codes = [404, 400, 503, 408]
             if granule_md.status_code in status_codes:
                 granule_md.raise_for_status()
@@ -285,6 +429,100 @@ class Podaac:
 
         return granule_md.text
 
+    def _granule_metadata_url(self, dataset_id, short_name, granule_name, _format):
+        url = self.URL + 'metadata/granule/?'
+        if dataset_id:
+            url = url + 'datasetId=' + dataset_id
+        else:
+            raise Exception("Dataset Id is required")
+        if short_name:
+            url = url + '&shortName=' + short_name
+        if granule_name:
+            url = url + '&granuleName=' + granule_name
+        return url + '&format=' + _format
+
+    def granule_metadata_all(self, granule_names, dataset_id='', short_name='', _format='iso',
+                             max_workers=8, throttle=None, parse=True, callback=None):
+        '''Retrieves the metadata of many granules of one dataset at once. \
+                Requests run concurrently on a bounded thread pool and are \
+                throttled per host, and a granule whose metadata cannot be \
+                retrieved is reported instead of failing the whole batch.
+
+        :param granule_names: names of the granules.
+        :type granule_names: :mod:`list`
+
+        :param dataset_id: dataset persistent ID. dataset_id is required.
+        :type dataset_id: :mod:`string`
+
+        :param short_name: dataset short_name.
+        :type short_name: :mod:`string`
+
+        :param _format: metadata format. Default format is iso.
+        :type _format: :mod:`string`
+
+        :param max_workers: maximum number of requests in progress at once.
+        :type max_workers: :mod:`int`
+
+        :param throttle: limits concurrent requests and request rate per \
+                host. Defaults to the throttle of the transport, if any, \
+                or else to at most 4 requests in flight per host.
+        :type throttle: :class:`podaac.throttle.HostThrottle`
+
+        :param parse: if True, each metadata document is parsed into an \
+                :class:`xml.etree.ElementTree.Element`; if False the xml \
+                text is returned.
+        :type parse: :mod:`bool`
+
+        :param callback: optional callable invoked as callback(granule_name, \
+                metadata, error) as soon as each granule is done; one of \
+                metadata and error is None.
+        :type callback: :mod:`callable`
+
+        :returns: a :class:`podaac.records.BatchResults` mapping each granule \
+                name to its metadata, with failed granules and their \
+                exception in its `errors`.
+        '''
+        granule_names = list(granule_names)
+        urls = [self._granule_metadata_url(dataset_id, short_name, name, _format)
+                for name in granule_names]
+        shared = getattr(self.transport, 'throttle', None)
+        if throttle is None and shared is None:
+            throttle = HostThrottle()
+        elif throttle is shared:
+            # the transport already throttles every request
+            throttle = None
+
+        def fetch(url):
+            if throttle is None:
+                response = self.transport.get(url, headers=HEADERS, endpoint='granule_metadata')
+            else:
+                with throttle.slot(url) as record:
+                    response = self.transport.get(url, headers=HEADERS,
+                                                  endpoint='granule_metadata')
+                    record(response)
+            response.raise_for_status()
+            if parse:
+                return self._parse('granule_metadata', ET.fromstring, response.content)
+            return response.text
+
+        started = time.time()
+        results = BatchResults()
+        if not granule_names:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+            futures = dict((executor.submit(fetch, url), name)
+                           for url, name in zip(urls, granule_names))
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as error:
+                    results.errors[name] = error
+                if callback is not None:
+                    callback(name, results.get(name), results.errors.get(name))
+        results.seconds = time.time() - started
+        return results
+
     def last24hours_datacasting_granule_md(self, dataset_id='',
                                            short_name='', _format='datacasting', items_per_page=50):
         '''Granule metadata service retrieves metadata for a list \
@@ -312,17 +550,9 @@ class Podaac:
         '''
 
         try:
-            url = self.URL + 'metadata/granule/?'
-            if dataset_id:
-                url = url + 'datasetId=' + dataset_id
-            else:
-                raise Exception("Dataset Id is required")
-            if short_name:
-                url = url + '&shortName=' + short_name
-
-            url = url + '&itemsPerPage=' + \
-                str(items_per_page) + '&format=' + _format
-            granule_md = requests.get(url, headers=HEADERS)
+            url = self._granule_metadata_url(dataset_id, short_name, '', _format) + \
+                '&itemsPerPage=' + str(items_per_page)
+            granule_md = self.transport.get(url, headers=HEADERS)
             status_codes = [404, 400, 503, 408]
             if granule_md.status_code in status_codes:
                 granule_md.raise_for_status()
@@ -333,8 +563,8 @@ class Podaac:
 
         return granule_md.text
 
-    def granule_search(self, dataset_id='', start_time='', end_time='', bbox='', start_index='', sort_by='timeAsc',
-                       items_per_page='50', _format='atom'):
+    def granule_search(self, dataset_id='', start_time='', end_time='', bbox='', start_index='',
+                       sort_by='timeAsc', items_per_page='50', _format='atom', parse=False):
         '''Search Granule does granule searching on PO.DAAC level 2 swath \
                 datasets (individual orbits of a satellite), and level 3 & 4 \
                 gridded datasets (time averaged to span the globe). Coverage \
@@ -387,29 +617,21 @@ class Podaac:
                 format is set to atom. Possible values: atom, html.
         :type _format: :mod:`string`
 
+        :param parse: True to return a :class:`podaac.records.Results` of \
+                :class:`podaac.records.Granule` records instead of the raw \
+                response. Requires the atom format.
+        :type parse: :mod:`bool`
+
         :returns: an xml response based on the requested 'format'. Options \
                 are 'atom' and 'html'.
 
         '''
-
+        if parse and _format != 'atom':
+            raise ValueError("parse=True requires the 'atom' format.")
         try:
-            url = self.URL + 'search/granule/?'
-            if dataset_id:
-                url = url + 'datasetId=' + dataset_id
-            else:
-                raise Exception("Dataset Id is required")
-            if start_time:
-                url = url + '&startTime=' + start_time
-            if end_time:
-                url = url + '&endTime=' + end_time
-            if bbox:
-                url = url + '&bbox=' + bbox
-            if start_index:
-                url = url + '&startIndex=' + start_index
-
-            url = url + '&sortBy=' + sort_by + \
-                '&itemsPerPage=' + items_per_page + '&format=' + _format
-            granules = requests.get(url, headers=HEADERS)
+            url = self._granule_search_url(dataset_id, start_time, end_time, bbox,
+                                           start_index, sort_by, items_per_page, _format)
+            granules = self.transport.get(url, headers=HEADERS)
             status_codes = [404, 400, 503, 408]
             if granules.status_code in status_codes:
                 granules.raise_for_status()
@@ -418,8 +640,158 @@ class Podaac:
             print(error)
             raise
 
+        if parse:
+            return self._parse('granule_search', atom.parse_results, granules.content,
+                               granules.encoding)
         return granules.text
 
+    def _granule_search_url(self, dataset_id, start_time, end_time, bbox, start_index,
+                            sort_by, items_per_page, _format):
+        url = self.URL + 'search/granule/?'
+        if dataset_id:
+            url = url + 'datasetId=' + dataset_id
+        else:
+            raise Exception("Dataset Id is required")
+        if start_time:
+            url = url + '&startTime=' + start_time
+        if end_time:
+            url = url + '&endTime=' + end_time
+        if bbox:
+            url = url + '&bbox=' + bbox
+        if start_index:
+            url = url + '&startIndex=' + start_index
+
+        return url + '&sortBy=' + sort_by + \
+            '&itemsPerPage=' + items_per_page + '&format=' + _format
+
+    def granule_search_all(self, dataset_id='', start_time='', end_time='', bbox='',
+                           sort_by='timeAsc', items_per_page='400', max_workers=4):
+        '''Bulk variant of granule_search() which returns every matching \
+                granule rather than a single page. The first page is read to \
+                learn the OpenSearch totalResults, then all remaining pages \
+                are fetched concurrently and parsed into one list, in \
+                order. The search parameters are those of granule_search().
+
+        :param items_per_page: number of results per page. The value range \
+                is from 1 to 400.
+        :type items_per_page: :mod:`string`
+
+        :param max_workers: maximum number of pages fetched at once.
+        :type max_workers: :mod:`int`
+
+        :returns: a :class:`podaac.records.Results` of \
+                :class:`podaac.records.Granule`, one per matching granule.
+
+        '''
+        def fetch_page(start_index):
+            return self._get_results('granule_search', self._granule_search_url(
+                dataset_id, start_time, end_time, bbox, str(start_index), sort_by,
+                items_per_page, 'atom'), atom.granule_from_entry)
+
+        return self._fetch_all_pages(fetch_page, int(items_per_page), max_workers)
+
+    def _fetch_all_pages(self, fetch_page, items_per_page, max_workers):
+        first = fetch_page(0)
+        return paging.merge_pages([first] + paging.fetch_remaining_pages(
+            fetch_page, first.total_results or 0, 0, items_per_page, max_workers))
+
+    def _get_results(self, endpoint, url, record):
+        response = self._get_page(url, stream=False)
+        return self._parse(endpoint, atom.parse_results, response.content, response.encoding,
+                           record)
+
+    def iter_granules(self, dataset_id='', start_time='', end_time='', bbox='',
+                      sort_by='timeAsc', items_per_page='400', prefetch=False):
+        '''Walks every page of a granule search and lazily yields one \
+                compact :class:`podaac.records.Granule` per granule. Pages \
+                are requested only when the previous one has been consumed \
+                and are parsed incrementally as they stream in, so memory \
+                stays flat for inventories of any size. The parameters are \
+                those of granule_search().
+
+        :param dataset_id: dataset persistent ID. Example: PODAAC-ASOP2-25X01
+        :type dataset_id: :mod:`string`
+
+        :param start_time: start time in the format of YYYY-MM-DDTHH:mm:ssZ.
+        :type start_time: :mod:`time`
+
+        :param end_time: stop time in the format of YYYY-MM-DDTHH:mm:ssZ.
+        :type end_time: :mod:`time`
+
+        :param bbox: bounding box for spatial search in order of west, \
+                south, east, north. Example: 0,0,180,90
+        :type bbox: :mod:`string`
+
+        :param sort_by: determines ordering of response. Possible \
+                values: timeAsc, timeDesc.
+        :type sort_by: :mod:`string`
+
+        :param items_per_page: number of results per page. The value \
+                range is from 1 to 400.
+        :type items_per_page: :mod:`string`
+
+        :param prefetch: when True the next page is downloaded on a \
+                background thread while the caller handles the current one.
+        :type prefetch: :mod:`bool`
+
+        :returns: a generator of :class:`podaac.records.Granule`.
+
+        '''
+        page_size = int(items_per_page)
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        start_index = 0
+        pending = None
+        try:
+            while True:
+                if pending is not None:
+                    response = pending.result()
+                else:
+                    url = self._granule_search_url(dataset_id, start_time, end_time, bbox,
+                                                   str(start_index), sort_by, items_per_page,
+                                                   'atom')
+                    response = self._get_page(url, stream=executor is None)
+                source = response.raw if executor is None else BytesIO(response.content)
+                next_index = start_index + page_size
+                pending = None
+                count = 0
+                try:
+                    feed = atom.Feed(source)
+                    for granule in feed.granules():
+                        if executor is not None and pending is None and \
+                                (feed.total_results is None or feed.total_results > next_index):
+                            next_url = self._granule_search_url(
+                                dataset_id, start_time, end_time, bbox, str(next_index),
+                                sort_by, items_per_page, 'atom')
+                            pending = executor.submit(self._get_page, next_url, False)
+                        count += 1
+                        yield granule
+                finally:
+                    response.close()
+                if count < page_size or \
+                        (feed.total_results is not None and next_index >= feed.total_results):
+                    break
+                start_index = next_index
+        finally:
+            if executor is not None:
+                if pending is not None:
+                    pending.cancel()
+                executor.shutdown(wait=False)
+
+    def _get_page(self, url, stream, endpoint=None):
+        try:
+            response = self.transport.get(url, headers=HEADERS, stream=stream, endpoint=endpoint)
+            status_codes = [404, 400, 503, 408]
+            if response.status_code in status_codes:
+                response.raise_for_status()
+
+        except requests.exceptions.HTTPError as error:
+            print(error)
+            raise
+
+        if stream:
+            response.raw.decode_content = True
+        return response
+
     def granule_preview(self, dataset_id='', image_variable='', path=''):
         '''The PODAAC Image service renders granules in the \
                 PO.DAACs catalog to images such as jpeg and/or png. \
@@ -481,6 +853,7 @@ class Podaac:
             else:
                 path = path + '/' + dataset_id + '.png'
             with open(path, 'wb') as image:
+                from future.moves.urllib.request import urlopen
                 image.write(urlopen(url).read())
 
         except Exception as e:
@@ -489,7 +862,8 @@ class Podaac:
 
         return image
 
-    def granule_subset(self, input_file_path, path=''):
+    def granule_subset(self, input_file_path, path='', polling=None, members=None,
+                       spool_size=None):
         '''Subset Granule service allows users to Submit subset jobs. \
         Use of this service should be preceded by a Granule Search in \
         order to identify and generate a list of granules to be subsetted. \
@@ -504,56 +878,97 @@ class Podaac:
         dataset to be stored.
         :type path: :mod:`string`
 
+        :param polling: decides how often the job status is checked while \
+        the job runs. Defaults to exponential backoff from 1 to 60 seconds.
+        :type polling: :class:`podaac.polling.PollingStrategy`
+
+        :param members: names of the files to extract from the result zip. \
+        None extracts every file.
+        :type members: :mod:`list`
+
+        :param spool_size: the result zip is extracted while it downloads \
+        and is never written to disk. When given, the zip is instead \
+        spooled, in memory up to this many bytes, and extracted once \
+        complete. See :func:`podaac.extract.fetch_zip`.
+        :type spool_size: :mod:`int`
+
         :returns: a string token which can be used to determine the status\
         of a subset task.
 
         '''
-        data = open(input_file_path, 'r+')
-        input_data = json.load(data)
-        input_string = json.dumps(input_data)
+        with open(input_file_path) as data:
+            input_data = json.load(data)
+        token = self._submit_subset(input_data)
+
+        polling = polling if polling is not None else PollingStrategy()
+        subset_response_json = polling.poll(token, lambda: self._subset_job(token))
+        if subset_response_json['status'] != "done":
+            raise Exception("Unexpected error during subset job, post your issue to the "
+                            "PO.DAAC forum https://podaac.jpl.nasa.gov/forum/")
+
+        download_url = subset_response_json['resultURLs'][0]
+        granule_paths = self._fetch_subset_result(download_url, path, members=members,
+                                                  spool_size=spool_size)
+        granule_name = _subset_granule_name(granule_paths, download_url, path, members)
+        print("Podaacpy completed granule subset task for granule '%s'. "
+              "Granule available at '%s'." % (granule_name, path))
+        return granule_name
+
+    def granule_subset_all(self, subset_requests, path='', max_jobs=4, download_workers=4,
+                           callback=None, polling=None):
+        '''Runs many granule subset jobs at once. Up to `max_jobs` jobs \
+        are kept running on the PO.DAAC server, every running job is \
+        polled in one status loop, each job backing off exponentially \
+        while it is unchanged, and finished results are downloaded and \
+        extracted while the remaining jobs are still running. A failed \
+        job is recorded in its result and does not stop the others.
+
+        :param subset_requests: the subset requests, each either a path \
+        to a json file as accepted by granule_subset() or the request itself \
+        as a :mod:`dict`.
+        :type subset_requests: :mod:`list`
+
+        :param path: path to a directory where the subsetted datasets are stored.
+        :type path: :mod:`string`
+
+        :param max_jobs: maximum number of jobs running on the server at once.
+        :type max_jobs: :mod:`int`
+
+        :param download_workers: number of results downloaded at once.
+        :type download_workers: :mod:`int`
+
+        :param callback: optional callable invoked with each \
+        :class:`podaac.subset.SubsetResult` as soon as its job is over.
+        :type callback: :mod:`callable`
+
+        :param polling: decides how often each job is checked, and when \
+        a job is given up.
+        :type polling: :class:`podaac.polling.PollingStrategy`
+
+        :returns: a list of :class:`podaac.subset.SubsetResult`, in the \
+        order of `subset_requests`.
+
+        '''
+        manager = subset.SubsetJobManager(self, max_jobs=max_jobs,
+                                          download_workers=download_workers, polling=polling)
+        return manager.run(subset_requests, path=path, callback=callback)
 
+    def _submit_subset(self, subset_request):
         # submit subset request
-        params = urlencode({'query': input_string})
+        params = urlencode({'query': json.dumps(subset_request)})
         headers = {
             "Content-type": "application/x-www-form-urlencoded", "Accept": "*"}
-        conn = HTTPSConnection("podaac.jpl.nasa.gov")
-        conn.request("POST", "/ws/subset/granule?request=submit",
-                     params, headers)
-        response = conn.getresponse()
-
-        data = response.read().decode('utf-8')
-        result = json.loads(data)
-        token = result['token']
-        conn.close()
-
-        flag = 0
-        while flag == 0:
-            url = url = self.URL + "subset/status?token=" + token
-            subset_response = requests.get(url, headers=HEADERS).text
-            subset_response_json = json.loads(subset_response)
-            status = subset_response_json['status']
-            if status == "done":
-                flag = 1
-            if status == "error":
-                raise Exception("Unexpected error during subset job, post your issue to the PO.DAAC forum https://podaac.jpl.nasa.gov/forum/")
-            time.sleep(1)
+        response = self.transport.post(
+            self.URL + "subset/granule?request=submit", data=params, headers=headers)
+        return json.loads(response.text)['token']
 
-        download_url = subset_response_json['resultURLs'][0]
-        split = download_url.split('/')
-        length = len(split)
-        zip_file_name = split[length - 1]
-        if path == '':
-            zip_path = os.path.join(os.path.dirname(__file__), zip_file_name)
-        else:
-            zip_path = path + '/' + zip_file_name
-        response = urlretrieve(download_url, zip_path)
-        zip_content = zipfile.ZipFile(zip_path)
-        for i in zip_content.infolist():
-            granule_name = i.filename
-        zip_content.extractall(path=path)
-        print("Podaacpy completed granule subset task for granule '%s'. Granule available at '%s'." % (granule_name, path))
-        os.remove(zip_path)
-        return granule_name
+    def _subset_job(self, token):
+        url = self.URL + "subset/status?token=" + token
+        return json.loads(self.transport.get(url, headers=HEADERS).text)
+
+    def _fetch_subset_result(self, download_url, path, members=None, spool_size=None):
+        return extract.fetch_zip(self.transport, download_url, path, members=members,
+                                 spool_size=spool_size, headers=HEADERS)
 
     def subset_status(self, token=''):
         '''Subset Granule Status service allows users to check the status \
@@ -572,14 +987,9 @@ class Podaac:
         :returns: the a status string of the subset request.
 
         '''
-        url = self.URL + "subset/status?token=" + token
-        subset_data = requests.get(url, headers=HEADERS).text
-        subset_data_json = json.loads(subset_data)
-        status = subset_data_json['status']
-
-        return status
+        return self._subset_job(token)['status']
 
-    def extract_l4_granule(self, dataset_id='', path=''):
+    def extract_l4_granule(self, dataset_id='', path='', segments=1):
         '''This is an additional function that we have provided apart \
         from the available webservices. The extract_l4_granule helps \
         retrieve the level 4 datasets from OPeNDAP server directly, \
@@ -595,6 +1005,11 @@ class Podaac:
                 needs to be downloaded.
         :type format: :mod:`string`
 
+        :param segments: number of byte ranges fetched in parallel for \
+                granules of at least 64 MB. An interrupted download is \
+                resumed from its `.part` file on the next call.
+        :type segments: :mod:`int`
+
         :returns: string representation of granule name.
         '''
         try:
@@ -609,15 +1024,42 @@ class Podaac:
                 compressed_path = os.path.join(os.path.dirname(__file__), compressed_granule)
             else:
                 compressed_path = path + '/' + compressed_granule
-            urlretrieve(url, compressed_path)
+            download.fetch(self.transport, url, compressed_path, segments=segments, headers=HEADERS)
             if compressed_granule.endswith('.gz'):
-                compressed_granule = gzip.open(compressed_path, 'rb')
-                with open(path + '/' + granule_name, 'wb') as uncompressed_granule:
-                    uncompressed_granule.write(compressed_granule.read())
-                    compressed_granule.close()
-                    uncompressed_granule.close()
+                download.gunzip_file(compressed_path, path + '/' + granule_name)
         except Exception as e:
             print(e)
             raise
 
         return granule_name
+
+
+def _ddx_variables(root):
+    variables = []
+    for kind in ('Array', 'Grid'):
+        for element in root.findall(DAP + kind):
+            # a Grid holds its data Array followed by the coordinate Maps
+            array = element.find(DAP + 'Array') if kind == 'Grid' else element
+            if array is None:
+                array = element
+            attributes = {}
+            for attribute in element.findall(DAP + 'Attribute') + array.findall(DAP + 'Attribute'):
+                attributes[attribute.get('name')] = attribute.findtext(DAP + 'value')
+            data_type = None
+            for child in array:
+                tag = child.tag[len(DAP):]
+                if tag not in ('Attribute', 'dimension', 'Array', 'Map'):
+                    data_type = tag
+                    break
+            dimensions = tuple((dimension.get('name'), int(dimension.get('size')))
+                               for dimension in array.findall(DAP + 'dimension'))
+            variables.append(Variable(element.get('name'), data_type, dimensions,
+                                      attributes.get('units'), attributes.get('long_name')))
+    return variables
+
+
+def _subset_granule_name(granule_paths, download_url, path, members):
+    if not granule_paths:
+        raise ValueError("The subset result '%s' holds no granule matching members %r."
+                         % (download_url, members))
+    return os.path.relpath(granule_paths[-1], path or os.curdir)
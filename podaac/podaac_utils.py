@@ -12,63 +12,166 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from bs4 import BeautifulSoup
-import requests
 import defusedxml.ElementTree as ET
+import threading
+import time
 try:
-    from . import podaac as p
-except:
-    import podaac as p
-
-class PodaacUtils:
-    
-    def __init__(self):
-        """Sets the base WebServices URL to https://podaac.jpl.nasa.gov/ws/"""
-        self.URL = 'https://podaac.jpl.nasa.gov/ws/'
+    from . import atom
+    from .transport import Client
+except ImportError:
+    import atom
+    from transport import Client
 
-    def list_all_available_extract_granule_dataset_ids(self):
-        '''Convenience function which returns an up-to-date \
-                list of all available granule dataset id's which can be \
-                used in the granule extraction service.
+L2SS_DATASETS_URL = 'https://podaac.jpl.nasa.gov/l2ssIngest/datasets'
 
-        :returns: a comma-seperated list of granule dataset id's.
 
-        '''
-        dataset_ids = []
-        html = requests.get(self.URL + 'extract/granule/index.html')
+class CatalogSnapshot:
+
+    def __init__(self, podaac, max_age=3600):
+        """A snapshot of the PO.DAAC dataset catalog shared by the \
+                PodaacUtils listing functions. Each part of the catalog \
+                (all datasets, level 2, level 4 and extractable datasets) is \
+                downloaded and parsed once into (dataset id, short name) \
+                pairs, then served from memory until it is older than \
+                `max_age` seconds or refresh() is called. A snapshot may be \
+                shared between threads.
+
+        :param podaac: the :class:`podaac.podaac.Podaac` client used to fetch the catalog.
+        :type podaac: :class:`podaac.podaac.Podaac`
+
+        :param max_age: seconds a fetched part stays valid. None never expires.
+        :type max_age: :mod:`int`
+        """
+        self.podaac = podaac
+        self.max_age = max_age
+        self._parts = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Discards every cached part so that the next listing fetches it again."""
+        with self._lock:
+            self._parts.clear()
+
+    def datasets(self):
+        """Returns (dataset id, short name) pairs for every dataset in the catalog."""
+        return self._part('datasets', self._fetch_datasets)
+
+    def level2_datasets(self):
+        """Returns (dataset id, short name) pairs for the level 2 datasets \
+                available to granule search."""
+        return self._part('level2', self._fetch_level2_datasets)
+
+    def level4_datasets(self):
+        """Returns (dataset id, short name) pairs for the level 4 datasets."""
+        return self._part('level4', self._fetch_level4_datasets)
+
+    def extract_datasets(self):
+        """Returns (dataset id, short name) pairs for the datasets \
+                available to the granule extraction service."""
+        return self._part('extract', self._fetch_extract_datasets)
+
+    def _part(self, name, fetch):
+        # one lock per part, so that a slow listing does not hold up the others
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            with self._lock:
+                fetched = self._parts.get(name)
+            if fetched is None or (self.max_age is not None and
+                                   time.time() - fetched[0] > self.max_age):
+                fetched = (time.time(), fetch())
+                with self._lock:
+                    self._parts[name] = fetched
+            return fetched[1]
+
+    def _fetch_datasets(self):
+        return [(dataset.dataset_id, dataset.short_name)
+                for dataset in self.podaac.dataset_search_all(items_per_page='400')]
+
+    def _fetch_level4_datasets(self):
+        data = self.podaac.dataset_search(process_level='4', items_per_page='400')
+        return _atom_datasets(ET.fromstring(data.encode('utf-8')))
+
+    def _fetch_level2_datasets(self):
+        response = self.podaac.transport.get(L2SS_DATASETS_URL)
+        data = response.json()
+        return [(item["persistentId"], item["shortName"]) for item in data["datasets"]]
+
+    def _fetch_extract_datasets(self):
+        from bs4 import BeautifulSoup
+        html = self.podaac.transport.get(self.podaac.URL + 'extract/granule/index.html')
         soup = BeautifulSoup(html.text, 'html.parser')
 
         table = soup.find("table", {"id": "tblDataset"})
         rows = table.find_all('tr')
         rows.remove(rows[0])
 
+        datasets = []
         for row in rows:
             x = row.find_all('td')
-            dataset_ids.append(x[0].text.encode('utf-8'))
+            datasets.append((x[0].text, x[1].text))
+        return datasets
 
-        return dataset_ids
 
-    def list_all_available_extract_granule_dataset_short_names(self):
+def _atom_datasets(root):
+    datasets = []
+    for entry in root.findall('{http://www.w3.org/2005/Atom}entry'):
+        datasets.append((
+            entry.find('{https://podaac.jpl.nasa.gov/opensearch/}datasetId').text,
+            entry.find('{https://podaac.jpl.nasa.gov/opensearch/}shortName').text))
+    return datasets
+
+
+class PodaacUtils(Client):
+
+    def __init__(self, transport=None, catalog_max_age=3600):
+        """Sets the base WebServices URL to https://podaac.jpl.nasa.gov/ws/
+
+        :param transport: a shared :class:`podaac.transport.Transport` whose \
+                pooled connections are reused by every call. A private \
+                transport is created when none is given.
+        :type transport: :class:`podaac.transport.Transport`
+
+        :param catalog_max_age: seconds the catalog listings are served \
+                from memory before they are fetched again. None never expires.
+        :type catalog_max_age: :mod:`int`
+        """
+        self.URL = 'https://podaac.jpl.nasa.gov/ws/'
+        # imported here, so that importing the utilities stays cheap
+        try:
+            from .podaac import Podaac
+        except ImportError:
+            from podaac import Podaac
+        self._use_transport(transport)
+        self.podaac = Podaac(transport=self.transport)
+        self.catalog = CatalogSnapshot(self.podaac, max_age=catalog_max_age)
+
+    def refresh_catalog(self):
+        '''Discards the cached catalog so that the next listing \
+                function fetches an up-to-date copy from PO.DAAC.
+        '''
+        self.catalog.refresh()
+
+    def list_all_available_extract_granule_dataset_ids(self):
         '''Convenience function which returns an up-to-date \
-                list of all available granule dataset short names which can be \
+                list of all available granule dataset id's which can be \
                 used in the granule extraction service.
 
-        :returns: a comma-seperated list of granule dataset short names.
+        :returns: a comma-seperated list of granule dataset id's.
 
         '''
-        dataset_short_names = []
-        html = requests.get(self.URL + 'extract/granule/index.html')
-        soup = BeautifulSoup(html.text, 'html.parser')
+        return [dataset_id.encode('utf-8') for dataset_id, _ in self.catalog.extract_datasets()]
 
-        table = soup.find("table", {"id": "tblDataset"})
-        rows = table.find_all('tr')
-        rows.remove(rows[0])
+    def list_all_available_extract_granule_dataset_short_names(self):
+        '''Convenience function which returns an up-to-date \
+                list of all available granule dataset short names which can be \
+                used in the granule extraction service.
 
-        for row in rows:
-            x = row.find_all('td')
-            dataset_short_names.append(x[1].text.encode('utf-8'))
+        :returns: a comma-seperated list of granule dataset short names.
 
-        return dataset_short_names
+        '''
+        return [short_name.encode('utf-8') for _, short_name in self.catalog.extract_datasets()]
 
     def list_all_available_granule_search_dataset_ids(self):
         '''Convenience function which returns an up-to-date \
@@ -77,29 +180,9 @@ class PodaacUtils:
         :returns: a comma-seperated list of granule dataset id's
 
         '''
-        data_part1 = requests.get(
-            self.URL + 'search/dataset/?format=atom&itemsPerPage=400').text
-        data_part2 = requests.get(
-            self.URL + 'search/dataset?startIndex=400&itemsPerPage=400&format=atom').text
-        root1 = ET.fromstring(data_part1.encode('utf-8'))
-        root2 = ET.fromstring(data_part2.encode('utf-8'))
-
-        dataset_ids = []
-        for entry in root1.findall('{http://www.w3.org/2005/Atom}entry'):
-            dataset_id = entry.find(
-                '{https://podaac.jpl.nasa.gov/opensearch/}datasetId').text
-            dataset_ids.append(dataset_id)
-
-        for entry in root2.findall('{http://www.w3.org/2005/Atom}entry'):
-            dataset_id = entry.find(
-                '{https://podaac.jpl.nasa.gov/opensearch/}datasetId').text
-            dataset_ids.append(dataset_id)
-
-        dataset_ids_level1 = []
-        dataset_ids_level2 = self.list_available_granule_search_level2_dataset_ids()
-        dataset_ids_level1 = list(set(dataset_ids) - set(dataset_ids_level2))
-
-        return dataset_ids_level1
+        dataset_ids_level2 = set(self.list_available_granule_search_level2_dataset_ids())
+        return _unique(dataset_id for dataset_id, _ in self.catalog.datasets()
+                       if dataset_id not in dataset_ids_level2)
 
     def list_all_available_granule_search_dataset_short_names(self):
         '''Convenience function which returns an up-to-date \
@@ -108,31 +191,10 @@ class PodaacUtils:
         :returns: a comma-seperated list of granule dataset short names.
 
         '''
-        data_part1 = requests.get(
-            self.URL + 'search/dataset/?format=atom&itemsPerPage=400').text
-        data_part2 = requests.get(
-            self.URL + 'search/dataset?startIndex=400&itemsPerPage=400&format=atom').text
-        root1 = ET.fromstring(data_part1.encode('utf-8'))
-        root2 = ET.fromstring(data_part2.encode('utf-8'))
-
-        dataset_short_names = []
-        for entry in root1.findall('{http://www.w3.org/2005/Atom}entry'):
-            name = entry.find(
-                '{https://podaac.jpl.nasa.gov/opensearch/}shortName').text
-            dataset_short_names.append(name)
-
-        for entry in root2.findall('{http://www.w3.org/2005/Atom}entry'):
-            name = entry.find(
-                '{https://podaac.jpl.nasa.gov/opensearch/}shortName').text
-            dataset_short_names.append(name)
-
-        # dataset_short_names_level1 = []
         dataset_short_names_level2 = \
-            self.list_available_granule_search_level2_dataset_short_names()
-        dataset_short_names_level1 = list(
-            set(dataset_short_names) - set(dataset_short_names_level2))
-
-        return dataset_short_names_level1
+            set(self.list_available_granule_search_level2_dataset_short_names())
+        return _unique(short_name for _, short_name in self.catalog.datasets()
+                       if short_name not in dataset_short_names_level2)
 
     def list_available_granule_search_level2_dataset_ids(self):
         '''Convenience function which returns an up-to-date \
@@ -141,15 +203,7 @@ class PodaacUtils:
         :returns: a comma-seperated list of granule dataset id's
 
         '''
-        dataset_ids = []
-        url = 'https://podaac.jpl.nasa.gov/l2ssIngest/datasets'
-        response = requests.get(url)
-        data = response.json()
-
-        for item in data["datasets"]:
-            dataset_ids.append(item["persistentId"])
-
-        return dataset_ids
+        return [dataset_id for dataset_id, _ in self.catalog.level2_datasets()]
 
     def list_available_granule_search_level2_dataset_short_names(self):
         '''Convenience function which returns an up-to-date \
@@ -158,15 +212,7 @@ class PodaacUtils:
         :returns: a comma-seperated list of granule dataset short names.
 
         '''
-        dataset_ids = []
-        url = 'https://podaac.jpl.nasa.gov/l2ssIngest/datasets'
-        response = requests.get(url)
-        data = response.json()
-
-        for item in data["datasets"]:
-            dataset_ids.append(item["shortName"])
-
-        return dataset_ids
+        return [short_name for _, short_name in self.catalog.level2_datasets()]
 
     def list_level4_dataset_ids(self):
         '''Convenience function which returns an up-to-date \
@@ -175,17 +221,7 @@ class PodaacUtils:
         :returns: a comma-seperated list of level4 dataset id's
 
         '''
-        podaac = p.Podaac()
-        data = podaac.dataset_search(process_level='4', items_per_page='400')
-        root = ET.fromstring(data.encode('utf-8'))
-
-        dataset_ids = []
-        for entry in root.findall('{http://www.w3.org/2005/Atom}entry'):
-            dataset_id = entry.find(
-                '{https://podaac.jpl.nasa.gov/opensearch/}datasetId').text
-            dataset_ids.append(dataset_id)
-
-        return dataset_ids
+        return [dataset_id for dataset_id, _ in self.catalog.level4_datasets()]
 
     def list_level4_dataset_short_names(self):
         '''Convenience function which returns an up-to-date \
@@ -194,17 +230,7 @@ class PodaacUtils:
         :returns: a comma-seperated list of level4 dataset short names.
 
         '''
-        podaac = p.Podaac()
-        data = podaac.dataset_search(process_level='4', items_per_page='400')
-        l4_dataset_short_names = []
-        root = ET.fromstring(data.encode('utf-8'))
-
-        for entry in root.findall('{http://www.w3.org/2005/Atom}entry'):
-            l4_dataset_short_name = entry.find(
-                '{https://podaac.jpl.nasa.gov/opensearch/}shortName').text
-            l4_dataset_short_names.append(l4_dataset_short_name)
-
-        return l4_dataset_short_names
+        return [short_name for _, short_name in self.catalog.level4_datasets()]
 
     def mine_granules_from_granule_search(self, granule_search_response=''):
         '''Convenience function which extracts the granule names for \
@@ -218,13 +244,7 @@ class PodaacUtils:
         :returns: prints an array of granule names.
 
         '''
-        search_str = '<title>'
-        granule_list = \
-            [str(i) for i in granule_search_response.strip().split() 
-                if search_str in i and 'PO.DAAC' not in i]
-        strp_granule_list = \
-            [i.replace('<title>','').replace('</title>','') for i in granule_list]
-        return strp_granule_list
+        return atom.mine_titles(granule_search_response)
 
     @staticmethod
     def mine_opendap_urls_from_granule_search(granule_search_response=''):
@@ -238,10 +258,9 @@ class PodaacUtils:
 
         :returns: prints an array of PO.DAAC OPeNDAP URLs.
         """
-        soup = BeautifulSoup(granule_search_response, 'html.parser')
-        opendap_list = []
-        for opendap_link in soup.find_all('link'):
-            href = opendap_link.get('href')
-            if 'opendap.jpl.nasa.gov/opendap/' in href:
-                opendap_list.append(href)
-        return opendap_list
+        return atom.mine_links(granule_search_response, 'opendap.jpl.nasa.gov/opendap/')
+
+
+def _unique(values):
+    seen = set()
+    return [value for value in values if not (value in seen or seen.add(value))]
@@ -0,0 +1,140 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import time
+
+# Job states after which PO.DAAC and L2SS stop changing a job.
+TERMINAL_STATES = frozenset(['done', 'error', 'partial error', 'unknown'])
+
+
+class PollingTimeout(Exception):
+    '''Raised when a job has not finished before the polling deadline.'''
+
+
+class PollingStrategy:
+
+    def __init__(self, initial_interval=1, max_interval=60, backoff=2, jitter=0.1,
+                 deadline=None, callback=None):
+        '''Decides how often the status of a long running job is checked. \
+                The first check follows `initial_interval` seconds after a \
+                job changes state, and every check which finds the job \
+                unchanged multiplies the wait by `backoff`, up to \
+                `max_interval`. A strategy holds no per-job state and may be \
+                shared between jobs and threads.
+
+        :param initial_interval: seconds to wait after a job changed state.
+        :type initial_interval: :mod:`float`
+
+        :param max_interval: longest wait, in seconds, between two checks.
+        :type max_interval: :mod:`float`
+
+        :param backoff: factor by which the wait grows while the job is unchanged.
+        :type backoff: :mod:`float`
+
+        :param jitter: fraction of each wait which is randomized, so that \
+                many jobs submitted together do not poll in lockstep.
+        :type jitter: :mod:`float`
+
+        :param deadline: seconds after which a job still running is given \
+                up with :class:`PollingTimeout`. None waits forever.
+        :type deadline: :mod:`float`
+
+        :param callback: optional callable invoked as callback(token, \
+                previous_status, status) each time a job changes state, e.g. \
+                from 'queued' to 'processing'. previous_status is None on \
+                the first check.
+        :type callback: :mod:`callable`
+        '''
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.callback = callback
+
+    def delay(self, attempt):
+        '''Returns the seconds to wait before check number `attempt` \
+                since the job last changed state, counting from 0.'''
+        delay = min(self.max_interval, self.initial_interval * self.backoff ** attempt)
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return delay
+
+    def start(self, token):
+        '''Returns the :class:`PollingState` tracking a newly submitted job.'''
+        return PollingState(self, token)
+
+    def poll(self, token, fetch_job, sleep=time.sleep):
+        '''Checks a job until it reaches a terminal state.
+
+        :param token: the job token.
+        :type token: :mod:`string`
+
+        :param fetch_job: a callable returning the job status document, \
+                a :mod:`dict` holding at least 'status'.
+        :type fetch_job: :mod:`callable`
+
+        :returns: the last job status document.
+        '''
+        state = self.start(token)
+        while True:
+            job = fetch_job()
+            if state.update(job['status']):
+                return job
+            sleep(state.next_delay())
+
+
+class PollingState:
+
+    def __init__(self, strategy, token):
+        '''The polling progress of one job. Use \
+                :meth:`PollingStrategy.start` to create one.'''
+        self.strategy = strategy
+        self.token = token
+        self.status = None
+        self.attempt = 0
+        self.started = time.time()
+        self.due = self.started
+
+    def update(self, status):
+        '''Records the status found by a check.
+
+        :returns: True if the job reached a terminal state.
+        '''
+        if status != self.status:
+            previous, self.status = self.status, status
+            self.attempt = 0
+            if self.strategy.callback is not None:
+                self.strategy.callback(self.token, previous, status)
+        else:
+            self.attempt += 1
+        return status in TERMINAL_STATES
+
+    def next_delay(self):
+        '''Returns the seconds to wait before the next check and records \
+                when it is due in `due`.
+
+        :raises PollingTimeout: when the deadline has passed.
+        '''
+        now = time.time()
+        delay = self.strategy.delay(self.attempt)
+        if self.strategy.deadline is not None:
+            remaining = self.started + self.strategy.deadline - now
+            if remaining <= 0:
+                raise PollingTimeout("Job '%s' did not finish within %s seconds; last status '%s'."
+                                     % (self.token, self.strategy.deadline, self.status))
+            delay = min(delay, remaining)
+        self.due = now + delay
+        return delay
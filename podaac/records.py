@@ -0,0 +1,81 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+
+Granule = namedtuple('Granule', [
+    'name', 'dataset_id', 'short_name', 'start_time', 'end_time', 'updated',
+    'opendap_url', 'drive_url', 'preview_url', 'box', 'links', 'footprint'])
+Granule.__new__.__defaults__ = (None,)
+Granule.__doc__ = '''A compact granule record parsed from a granule search entry. \
+        Times are the ISO 8601 strings published by PO.DAAC, `box` is a \
+        (south, west, north, east) tuple of floats or None, and `links` is a \
+        tuple of (title, href) pairs holding every link of the entry. \
+        `footprint` holds the footprint polygons of the entry, or None: a \
+        tuple of polygons, each a tuple of rings, each a tuple of \
+        (longitude, latitude) pairs. Later rings of a polygon are its gaps.'''
+
+Dataset = namedtuple('Dataset', [
+    'dataset_id', 'short_name', 'title', 'start_time', 'end_time', 'updated',
+    'box', 'links'])
+Dataset.__doc__ = '''A compact dataset record parsed from a dataset search entry. \
+        Fields follow the conventions of :class:`Granule`.'''
+
+Variable = namedtuple('Variable', ['name', 'type', 'dimensions', 'units', 'long_name'])
+Variable.__doc__ = '''A dataset variable parsed from an OPeNDAP DDX document. \
+        `type` is the DAP type name, e.g. 'Float32', and `dimensions` a \
+        tuple of (name, size) pairs.'''
+
+
+class Results(list):
+    '''A list of records parsed from one search response, together with \
+            the OpenSearch paging values of the response. The raw response \
+            body is kept as bytes and only decoded when `text` is read.'''
+
+    __slots__ = ('total_results', 'start_index', 'items_per_page', '_content', '_encoding')
+
+    def __init__(self, records=(), content=None, encoding=None, total_results=None,
+                 start_index=None, items_per_page=None):
+        super(Results, self).__init__(records)
+        self.total_results = total_results
+        self.start_index = start_index
+        self.items_per_page = items_per_page
+        self._content = content
+        self._encoding = encoding
+
+    @property
+    def text(self):
+        '''The raw response body the records were parsed from.'''
+        if self._content is None:
+            return None
+        return self._content.decode(self._encoding or 'utf-8', 'replace')
+
+
+class BatchResults(dict):
+    '''The outcome of a batch of requests, mapping each key which \
+            succeeded to its result. Keys which failed are left out of the \
+            mapping and listed in `errors` with their exception, so that \
+            one bad item never hides the rest of the batch.'''
+
+    __slots__ = ('errors', 'seconds')
+
+    def __init__(self, results=(), errors=None, seconds=0.0):
+        super(BatchResults, self).__init__(results)
+        self.errors = errors if errors is not None else {}
+        self.seconds = seconds
+
+    @property
+    def complete(self):
+        '''True if every key of the batch succeeded.'''
+        return not self.errors
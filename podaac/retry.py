@@ -0,0 +1,153 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import random
+import threading
+from .throttle import retry_after
+
+# Statuses worth retrying: timeouts, rate limiting and server errors.
+RETRY_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'])
+
+
+class RetryPolicy:
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=60.0, jitter=0.5,
+                 status_codes=None, methods=IDEMPOTENT_METHODS, respect_retry_after=True):
+        '''Decides which failed requests a transport sends again, and how \
+                long it waits first. Idempotent requests are retried on \
+                connection errors and timeouts, and on the transient \
+                statuses in `status_codes`; any other response, including \
+                404, 400 and every other 4xx, is returned at once. The \
+                wait before retry n (counting from 0) is backoff_factor * \
+                2 ** n seconds, at most `max_backoff`, of which a random \
+                fraction up to `jitter` is taken off so that clients do not \
+                retry in lockstep. A policy counts the retries it spends \
+                and may be shared between transports and threads.
+
+        :param max_retries: number of times a request is retried.
+        :type max_retries: :mod:`int`
+
+        :param backoff_factor: wait, in seconds, before the first retry.
+        :type backoff_factor: :mod:`float`
+
+        :param max_backoff: longest wait, in seconds, between two attempts.
+        :type max_backoff: :mod:`float`
+
+        :param jitter: largest fraction of each wait removed at random, \
+                from 0 (no jitter) to 1.
+        :type jitter: :mod:`float`
+
+        :param status_codes: statuses retried. Defaults to RETRY_STATUS_CODES.
+        :type status_codes: :mod:`list`
+
+        :param methods: HTTP methods retried. POST is left out as PO.DAAC \
+                uses it to start subset jobs.
+        :type methods: :mod:`frozenset`
+
+        :param respect_retry_after: wait at least as long as the \
+                Retry-After header of a response asks, up to `max_backoff`.
+        :type respect_retry_after: :mod:`bool`
+        '''
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = frozenset(RETRY_STATUS_CODES if status_codes is None else status_codes)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.respect_retry_after = respect_retry_after
+        self._lock = threading.Lock()
+        self._counters = {'retries': 0, 'recovered': 0, 'exhausted': 0}
+        self._reasons = {}
+
+    def retries(self, method):
+        '''Returns the number of retries allowed for a request method.'''
+        return self.max_retries if method.upper() in self.methods else 0
+
+    def allowing(self, *methods):
+        '''Returns a policy which also retries `methods`, e.g. 'POST' \
+                for a read-only search, and otherwise behaves and counts \
+                like this one.'''
+        policy = copy.copy(self)
+        policy.methods = self.methods | frozenset(method.upper() for method in methods)
+        return policy
+
+    def retryable(self, response=None, error=None):
+        '''Tells whether a response, or an exception raised instead of \
+                one, is a transient failure.'''
+        if error is not None:
+            return _transient(error)
+        return response is not None and response.status_code in self.status_codes
+
+    def backoff(self, attempt, response=None):
+        '''Returns the seconds to wait before retry number `attempt`, \
+                counting from 0, after `response` (None after an error).'''
+        wait = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        wait -= wait * self.jitter * random.random()
+        if self.respect_retry_after and response is not None:
+            wait = max(wait, min(self.max_backoff, retry_after(response.headers) or 0))
+        return wait
+
+    def record(self, attempts, response=None, error=None):
+        '''Counts a request once it is done.
+
+        :param attempts: the failed attempts which were retried, as \
+                (response, error) pairs.
+        :type attempts: :mod:`list`
+
+        :param response: the final response, if any.
+        :type response: :class:`requests.Response`
+
+        :param error: the exception the request finally raised, if any.
+        :type error: :class:`Exception`
+        '''
+        if not attempts:
+            return
+        with self._lock:
+            self._counters['retries'] += len(attempts)
+            for failed, failure in attempts:
+                reason = failed.status_code if failed is not None else type(failure).__name__
+                self._reasons[reason] = self._reasons.get(reason, 0) + 1
+            if error is None and not self.retryable(response):
+                self._counters['recovered'] += 1
+            else:
+                self._counters['exhausted'] += 1
+
+    def metrics(self):
+        '''Returns the counters of the policy as a dict: `retries` spent, \
+                requests `recovered` by a retry, requests `exhausted` \
+                after their last retry, and `reasons`, mapping each status \
+                code or exception name which caused a retry to its count.'''
+        with self._lock:
+            metrics = dict(self._counters)
+            metrics['reasons'] = dict(self._reasons)
+        return metrics
+
+    def reset(self):
+        '''Sets every counter back to 0.'''
+        with self._lock:
+            # cleared in place, as policies made by allowing() share them
+            for key in self._counters:
+                self._counters[key] = 0
+            self._reasons.clear()
+
+
+def _transient(error):
+    # connection failures and timeouts; other request errors are permanent
+    import requests
+    if isinstance(error, requests.exceptions.RequestException):
+        return isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout))
+    return isinstance(error, EnvironmentError)
@@ -0,0 +1,291 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+def bbox_polygon(bbox):
+    '''Returns the polygon of a bounding box.
+
+    :param bbox: bounding box in order of west, south, east, north, as a \
+            string like granule_search() accepts or a tuple. A west value \
+            greater than east crosses the antimeridian.
+    :type bbox: :mod:`string`
+
+    :returns: a polygon, a tuple holding one ring of (longitude, latitude) pairs.
+    '''
+    if not isinstance(bbox, (tuple, list)):
+        bbox = bbox.split(',')
+    west, south, east, north = [float(value) for value in bbox]
+    if east < west:
+        east += 360
+    return (((west, south), (east, south), (east, north), (west, north)),)
+
+
+def granule_footprint(granule):
+    '''Returns the footprint polygons of a :class:`podaac.records.Granule`, \
+            falling back to its bounding box, or None if it has neither.'''
+    if granule.footprint:
+        return granule.footprint
+    if granule.box:
+        south, west, north, east = granule.box
+        return (bbox_polygon((west, south, east, north)),)
+    return None
+
+
+def intersects(footprint, polygon):
+    '''Tests exactly whether a footprint and a polygon share any point. \
+            Gaps in the footprint are honoured: a polygon lying wholly \
+            inside a gap does not intersect it. Longitudes may use either \
+            the -180 to 180 or the 0 to 360 convention.
+
+    :param footprint: the footprint polygons, as in \
+            :attr:`podaac.records.Granule.footprint`.
+    :type footprint: :mod:`tuple`
+
+    :param polygon: a polygon, a tuple of rings of (longitude, latitude) pairs.
+    :type polygon: :mod:`tuple`
+
+    :returns: True if they intersect.
+    '''
+    query = [_unwrap(ring) for ring in polygon]
+    for rings in footprint:
+        rings = [_unwrap(ring) for ring in rings]
+        west, east = _lon_range(rings)
+        query_west, query_east = _lon_range(query)
+        for shift in _shifts(west, east, query_west, query_east):
+            shifted = [_shift(ring, shift) for ring in query]
+            if _polygons_intersect(rings, shifted):
+                return True
+    return False
+
+
+class SpatialIndex:
+
+    def __init__(self, granules=(), cell_size=10.0):
+        '''An in-memory grid index of granule footprints. Each footprint \
+                is registered in the cells of a regular longitude/latitude \
+                grid covered by its bounding box; a query only tests the \
+                granules of the cells it overlaps, and then checks each \
+                candidate footprint exactly, so granules whose bounding box \
+                intersects a region but whose swath misses it are left out. \
+                Edge tests are vectorized with NumPy when it is installed.
+
+        :param granules: :class:`podaac.records.Granule` records to index, \
+                e.g. the results of granule_search(parse=True). Granules \
+                with neither footprint nor box are skipped.
+        :type granules: :mod:`iterable`
+
+        :param cell_size: size of the grid cells, in degrees, rounded \
+                down to divide 360 evenly.
+        :type cell_size: :mod:`float`
+        '''
+        # cells must tile the globe exactly for longitudes to wrap around
+        self._columns = int(math.ceil(360.0 / cell_size))
+        self.cell_size = 360.0 / self._columns
+        self._rows = int(math.ceil(180 / self.cell_size))
+        self._granules = []
+        self._footprints = []
+        self._cells = {}
+        self.extend(granules)
+
+    def __len__(self):
+        return len(self._granules)
+
+    def add(self, granule, footprint=None):
+        '''Indexes one granule.
+
+        :param granule: the granule record, or any value to return from queries.
+        :type granule: :class:`podaac.records.Granule`
+
+        :param footprint: the footprint polygons. Defaults to the footprint, \
+                or else the box, of the granule record.
+        :type footprint: :mod:`tuple`
+
+        :returns: True if the granule has a footprint and was indexed.
+        '''
+        if footprint is None:
+            footprint = granule_footprint(granule)
+        if not footprint:
+            return False
+        position = len(self._granules)
+        self._granules.append(granule)
+        self._footprints.append(footprint)
+        for polygon in footprint:
+            for cell in self._cells_of([_unwrap(ring) for ring in polygon]):
+                self._cells.setdefault(cell, []).append(position)
+        return True
+
+    def extend(self, granules):
+        '''Indexes several granules.'''
+        for granule in granules:
+            self.add(granule)
+
+    def candidates(self, bbox=None, polygon=None):
+        '''Returns the granules whose grid cells overlap a bbox or polygon, \
+                without checking their footprints exactly.'''
+        return [self._granules[position] for position in self._positions(_region(bbox, polygon))]
+
+    def query(self, bbox=None, polygon=None):
+        '''Returns the granules whose footprint intersects a region, in the \
+                order they were indexed.
+
+        :param bbox: bounding box in order of west, south, east, north.
+        :type bbox: :mod:`string`
+
+        :param polygon: a polygon, a tuple of rings of (longitude, \
+                latitude) pairs, used instead of `bbox`.
+        :type polygon: :mod:`tuple`
+
+        :returns: a list of the matching granules.
+        '''
+        region = _region(bbox, polygon)
+        return [self._granules[position] for position in self._positions(region)
+                if intersects(self._footprints[position], region)]
+
+    def _positions(self, region):
+        positions = set()
+        for cell in self._cells_of([_unwrap(ring) for ring in region]):
+            positions.update(self._cells.get(cell, ()))
+        return sorted(positions)
+
+    def _cells_of(self, rings):
+        west, east = _lon_range(rings)
+        lats = [lat for ring in rings for _, lat in ring]
+        first_row = self._row(min(lats))
+        last_row = self._row(max(lats))
+        if east - west >= 360:
+            columns = range(self._columns)
+        else:
+            first = int(math.floor(west / self.cell_size))
+            last = int(math.floor(east / self.cell_size))
+            columns = set(column % self._columns for column in range(first, last + 1))
+        return [(column, row) for column in columns for row in range(first_row, last_row + 1)]
+
+    def _row(self, lat):
+        return min(self._rows - 1, max(0, int(math.floor((lat + 90) / self.cell_size))))
+
+
+def _region(bbox, polygon):
+    if polygon is not None:
+        return polygon
+    if bbox is None:
+        raise ValueError("A bbox or a polygon is required.")
+    return bbox_polygon(bbox)
+
+
+def _unwrap(ring):
+    # make longitudes continuous so that rings crossing the antimeridian
+    # do not wrap around the globe
+    if not ring:
+        return ring
+    unwrapped = [tuple(ring[0])]
+    for lon, lat in ring[1:]:
+        previous = unwrapped[-1][0]
+        lon += 360 * round((previous - lon) / 360.0)
+        unwrapped.append((lon, lat))
+    return unwrapped
+
+
+def _shift(ring, shift):
+    return [(lon + shift, lat) for lon, lat in ring] if shift else ring
+
+
+def _lon_range(rings):
+    lons = [lon for ring in rings for lon, _ in ring]
+    return min(lons), max(lons)
+
+
+def _shifts(west, east, query_west, query_east):
+    # multiples of 360 degrees which bring the query over the footprint
+    first = int(math.floor((west - query_east) / 360.0))
+    last = int(math.ceil((east - query_west) / 360.0))
+    return [360 * k for k in range(first, last + 1)
+            if query_west + 360 * k <= east and query_east + 360 * k >= west]
+
+
+def _polygons_intersect(a, b):
+    if any(_contains(a, ring[0]) for ring in b if ring) or \
+            any(_contains(b, ring[0]) for ring in a if ring):
+        return True
+    return _edges_cross(_edges(a), _edges(b))
+
+
+def _edges(rings):
+    edges = []
+    for ring in rings:
+        for index in range(len(ring)):
+            edges.append(ring[index] + ring[(index + 1) % len(ring)])
+    return edges
+
+
+def _contains(rings, point):
+    # even-odd rule over every ring, so gaps are outside the polygon
+    x, y = point
+    if np is not None:
+        edges = np.asarray(_edges(rings), dtype=float).reshape(-1, 4)
+        x1, y1, x2, y2 = edges.T
+        straddles = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        return bool(np.count_nonzero(straddles & (x < crossing)) % 2)
+    inside = False
+    for x1, y1, x2, y2 in _edges(rings):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _edges_cross(a, b):
+    if not a or not b:
+        return False
+    if np is not None:
+        a = np.asarray(a, dtype=float).reshape(-1, 1, 4)
+        b = np.asarray(b, dtype=float).reshape(1, -1, 4)
+        d1 = _orientation(b[..., 0:2], b[..., 2:4], a[..., 0:2])
+        d2 = _orientation(b[..., 0:2], b[..., 2:4], a[..., 2:4])
+        d3 = _orientation(a[..., 0:2], a[..., 2:4], b[..., 0:2])
+        d4 = _orientation(a[..., 0:2], a[..., 2:4], b[..., 2:4])
+        return bool(np.any((d1 * d2 <= 0) & (d3 * d4 <= 0) &
+                           _overlap(a[..., 0], a[..., 2], b[..., 0], b[..., 2]) &
+                           _overlap(a[..., 1], a[..., 3], b[..., 1], b[..., 3])))
+    for ax1, ay1, ax2, ay2 in a:
+        for bx1, by1, bx2, by2 in b:
+            d1 = _cross(bx1, by1, bx2, by2, ax1, ay1)
+            d2 = _cross(bx1, by1, bx2, by2, ax2, ay2)
+            d3 = _cross(ax1, ay1, ax2, ay2, bx1, by1)
+            d4 = _cross(ax1, ay1, ax2, ay2, bx2, by2)
+            if d1 * d2 <= 0 and d3 * d4 <= 0 and \
+                    min(ax1, ax2) <= max(bx1, bx2) and min(bx1, bx2) <= max(ax1, ax2) and \
+                    min(ay1, ay2) <= max(by1, by2) and min(by1, by2) <= max(ay1, ay2):
+                return True
+    return False
+
+
+def _orientation(start, end, point):
+    return (end[..., 0] - start[..., 0]) * (point[..., 1] - start[..., 1]) - \
+        (end[..., 1] - start[..., 1]) * (point[..., 0] - start[..., 0])
+
+
+def _overlap(a1, a2, b1, b2):
+    return (np.minimum(a1, a2) <= np.maximum(b1, b2)) & (np.minimum(b1, b2) <= np.maximum(a1, a2))
+
+
+def _cross(x1, y1, x2, y2, x, y):
+    return (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)
@@ -0,0 +1,146 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+from .polling import PollingStrategy
+
+SubsetResult = namedtuple('SubsetResult', [
+    'request', 'token', 'status', 'granules', 'error', 'seconds'])
+SubsetResult.__doc__ = '''Outcome of one subset job. `status` is the last \
+        status reported by the server, or 'failed' when the job could not \
+        be submitted or its result could not be downloaded; `granules` \
+        lists the paths of the files extracted from the result zip and `error` holds \
+        the exception of a failed job, or None.'''
+
+
+class SubsetJobManager:
+
+    def __init__(self, podaac, max_jobs=4, download_workers=4, polling=None):
+        '''Runs many PO.DAAC granule subset jobs concurrently. At most \
+                `max_jobs` jobs are running on the server at any time; \
+                every running job is polled in a single status loop, and \
+                each finished result is downloaded and extracted on a \
+                worker thread while the other jobs keep running.
+
+        :param podaac: the client used to submit, poll and download jobs.
+        :type podaac: :class:`podaac.podaac.Podaac`
+
+        :param max_jobs: maximum number of jobs running on the server at once.
+        :type max_jobs: :mod:`int`
+
+        :param download_workers: number of results downloaded at once.
+        :type download_workers: :mod:`int`
+
+        :param polling: decides how often each job is checked, and when \
+                a job is given up. A job is only checked when its own \
+                backoff interval has elapsed.
+        :type polling: :class:`podaac.polling.PollingStrategy`
+        '''
+        self.podaac = podaac
+        self.max_jobs = max(1, max_jobs)
+        self.download_workers = max(1, download_workers)
+        self.polling = polling if polling is not None else PollingStrategy()
+
+    def run(self, subset_requests, path='', callback=None):
+        '''Runs every subset request to completion.
+
+        :param subset_requests: the subset requests, each either a path \
+                to a json file or the request itself as a :mod:`dict`.
+        :type subset_requests: :mod:`list`
+
+        :param path: path to a directory where the results are extracted.
+        :type path: :mod:`string`
+
+        :param callback: optional callable invoked with each \
+                :class:`SubsetResult` as soon as its job is over.
+        :type callback: :mod:`callable`
+
+        :returns: a list of :class:`SubsetResult`, in the order of `subset_requests`.
+        '''
+        subset_requests = list(subset_requests)
+        results = [None] * len(subset_requests)
+        pending = list(range(len(subset_requests)))
+        pending.reverse()
+        running = {}
+        downloads = []
+
+        def finish(index, result):
+            results[index] = result
+            if callback is not None:
+                callback(result)
+
+        def fetch(index, token, status, download_url, started):
+            try:
+                granules = self.podaac._fetch_subset_result(download_url, path)
+            except Exception as error:
+                finish(index, SubsetResult(subset_requests[index], token, 'failed', [], error,
+                                           time.time() - started))
+            else:
+                finish(index, SubsetResult(subset_requests[index], token, status, granules, None,
+                                           time.time() - started))
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            while pending or running:
+                while pending and len(running) < self.max_jobs:
+                    index = pending.pop()
+                    started = time.time()
+                    try:
+                        token = self.podaac._submit_subset(load_request(subset_requests[index]))
+                    except Exception as error:
+                        finish(index, SubsetResult(subset_requests[index], None, 'failed', [],
+                                                   error, time.time() - started))
+                        continue
+                    running[token] = (index, self.polling.start(token))
+
+                for token, (index, state) in list(running.items()):
+                    if state.due > time.time():
+                        continue
+                    try:
+                        job = self.podaac._subset_job(token)
+                        if not state.update(job['status']):
+                            state.next_delay()
+                            continue
+                    except Exception as error:
+                        del running[token]
+                        finish(index, SubsetResult(subset_requests[index], token, 'failed', [],
+                                                   error, time.time() - state.started))
+                        continue
+                    del running[token]
+                    if state.status == 'done':
+                        downloads.append(executor.submit(fetch, index, token, state.status,
+                                                         job['resultURLs'][0], state.started))
+                    else:
+                        error = Exception("Subset job '%s' ended with status '%s'."
+                                          % (token, state.status))
+                        finish(index, SubsetResult(subset_requests[index], token, state.status,
+                                                   [], error, time.time() - state.started))
+
+                if running and not (pending and len(running) < self.max_jobs):
+                    time.sleep(max(0, min(state.due for _, state in running.values()) -
+                                   time.time()))
+            for future in downloads:
+                future.result()
+        return results
+
+
+def load_request(subset_request):
+    '''Returns a subset request given either as a :mod:`dict` or as the \
+            path to a json file holding it.'''
+    if isinstance(subset_request, dict):
+        return subset_request
+    with open(subset_request) as data:
+        return json.load(data)
@@ -0,0 +1,373 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..aio import AsyncL2SS, AsyncOceanColor, AsyncPodaac, AsyncTransport
+from ..cache import ResponseCache
+from ..throttle import HostThrottle
+from .stub import granule_feed, query_value
+from nose.tools import assert_raises
+import asyncio
+import json
+import os
+import requests
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+class AsyncStubSession:
+    '''The asyncio counterpart of StubSession, standing in for an \
+    aiohttp.ClientSession. `delay` seconds are awaited before each \
+    response is returned, and the peak number of requests in flight is \
+    recorded in `max_in_flight`.'''
+
+    def __init__(self, handler=None, delay=0):
+        self.handler = handler or (lambda method, url, kwargs: b'')
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return AsyncStubResponse(self, self.handler(method, url, kwargs), url)
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncStubResponse:
+
+    def __init__(self, session, result, url):
+        self.session = session
+        self.url = url
+        self.reason = 'OK'
+        self.status, self.headers = 200, {}
+        if isinstance(result, tuple):
+            if len(result) == 3:
+                self.status, result, self.headers = result
+            else:
+                self.status, result = result
+        self.body = result if isinstance(result, bytes) else result.encode('utf-8')
+        self.content = self
+
+    async def __aenter__(self):
+        self.session.in_flight += 1
+        self.session.max_in_flight = max(self.session.max_in_flight, self.session.in_flight)
+        await asyncio.sleep(self.session.delay)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.session.in_flight -= 1
+
+    async def read(self):
+        return self.body
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def paged_search(total_results, delay=0):
+    def handler(method, url, kwargs):
+        start_index = int(query_value(url, 'startIndex', '0'))
+        items_per_page = int(query_value(url, 'itemsPerPage'))
+        return granule_feed(total_results, start_index, items_per_page)
+    return AsyncStubSession(handler, delay)
+
+
+class TestAio(unittest.TestCase):
+
+    def test_granule_search(self):
+        session = paged_search(5)
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session))
+        text = run(podaac.granule_search(dataset_id='PODAAC-TEST'))
+        granules = run(podaac.granule_search(dataset_id='PODAAC-TEST', parse=True))
+
+        assert text == granule_feed(5, 0, 50)
+        assert [g.name for g in granules] == ['granule_%05d.nc' % i for i in range(5)]
+        assert session.calls[0][1] == podaac._granule_search_url(
+            'PODAAC-TEST', '', '', '', '', 'timeAsc', '50', 'atom')
+
+    def test_concurrent_searches_share_the_loop(self):
+        session = paged_search(5, delay=0.05)
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session))
+
+        async def search_many():
+            return await asyncio.gather(*[podaac.granule_search(dataset_id='PODAAC-%d' % i)
+                                          for i in range(50)])
+        results = run(search_many())
+
+        assert len(results) == 50
+        assert session.max_in_flight == 50
+
+    def test_granule_search_all_and_iter_granules(self):
+        session = paged_search(23)
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session))
+        granules = run(podaac.granule_search_all(dataset_id='PODAAC-TEST', items_per_page='10'))
+        assert [g.name for g in granules] == ['granule_%05d.nc' % i for i in range(23)]
+
+        async def collect():
+            return [g.name async for g in podaac.iter_granules(dataset_id='PODAAC-TEST',
+                                                               items_per_page='10',
+                                                               prefetch=True)]
+        assert run(collect()) == ['granule_%05d.nc' % i for i in range(23)]
+
+    def test_errors_and_retries(self):
+        responses = [(503, ''), (503, ''), (404, 'missing')]
+        session = AsyncStubSession(lambda method, url, kwargs: responses.pop(0))
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session, backoff_factor=0))
+
+        assert_raises(requests.exceptions.HTTPError, run,
+                      podaac.dataset_metadata(dataset_id='PODAAC-TEST'))
+        assert len(session.calls) == 3
+
+    def test_download_is_throttled_retried_and_measured(self):
+        from ..metrics import MetricsRegistry
+        responses = [(503, ''), b'granule' * 1000]
+        session = AsyncStubSession(lambda method, url, kwargs: responses.pop(0))
+        throttle = HostThrottle(max_in_flight=1)
+        transport = AsyncTransport(session=session, backoff_factor=0, throttle=throttle,
+                                   metrics=MetricsRegistry())
+        path = tempfile.mkdtemp()
+        try:
+            target = os.path.join(path, 'granule.nc')
+            url = 'https://podaac-tools.jpl.nasa.gov/drive/files/granule.nc'
+            assert run(transport.download(url, target, chunk_size=100)) == 7000
+            with open(target, 'rb') as f:
+                assert f.read() == b'granule' * 1000
+            assert not os.path.exists(target + '.part')
+        finally:
+            shutil.rmtree(path)
+
+        assert len(session.calls) == 2
+        assert '_consume' not in session.calls[0][2]
+        assert transport.retry.metrics()['recovered'] == 1
+        assert throttle.metrics()['podaac-tools.jpl.nasa.gov']['requests'] == 2
+        assert sum(stats['requests'] for stats in transport.metrics.as_dict().values()) == 1
+
+    def test_metadata_cache(self):
+        session = AsyncStubSession(lambda method, url, kwargs: '<metadata/>')
+        transport = AsyncTransport(session=session, cache=ResponseCache(':memory:'))
+        podaac = AsyncPodaac(transport=transport)
+        for _ in range(3):
+            assert run(podaac.granule_metadata(dataset_id='PODAAC-TEST',
+                                               granule_name='g.nc')) == '<metadata/>'
+
+        assert len(session.calls) == 1
+        run(transport.close())
+        assert session.closed
+
+    def test_transport_throttle(self):
+        answers = {'count': 0}
+
+        def handler(method, url, kwargs):
+            answers['count'] += 1
+            if answers['count'] == 1:
+                return 503, 'Busy', {'Retry-After': '0'}
+            return '<metadata/>'
+        session = AsyncStubSession(handler, delay=0.01)
+        throttle = HostThrottle(max_in_flight=2)
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session, backoff_factor=0,
+                                                      throttle=throttle))
+
+        async def fetch_all():
+            return await asyncio.gather(*[podaac.dataset_metadata(dataset_id='PODAAC-%d' % i)
+                                          for i in range(6)])
+        assert run(fetch_all()) == ['<metadata/>'] * 6
+        assert session.max_in_flight == 2
+        metrics = throttle.metrics()['podaac.jpl.nasa.gov']
+        assert metrics['requests'] == 7 and metrics['throttled'] == 1
+        assert metrics['in_flight'] == 0
+
+    def test_client_lifecycle(self):
+        async def use(podaac):
+            async with podaac:
+                pass
+        shared = AsyncTransport(session=AsyncStubSession())
+        run(use(AsyncPodaac(transport=shared)))
+        assert not shared.session.closed
+
+        owned = AsyncPodaac(transport=None)
+        owned.transport.session = AsyncStubSession()
+        run(use(owned))
+        assert owned.transport.session.closed
+        assert_raises(TypeError, owned.__enter__)
+
+    def test_granule_metadata_all(self):
+        def handler(method, url, kwargs):
+            name = query_value(url, 'granuleName')
+            if name == 'g_2.nc':
+                return 404, 'Not Found'
+            return '<metadata>%s</metadata>' % name
+        session = AsyncStubSession(handler, delay=0.01)
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session))
+        names = ['g_%d.nc' % i for i in range(10)]
+        results = run(podaac.granule_metadata_all(names, dataset_id='PODAAC-TEST',
+                                                  throttle=HostThrottle(max_in_flight=2)))
+
+        assert session.max_in_flight == 2
+        assert sorted(results) == [n for n in names if n != 'g_2.nc']
+        assert results['g_5.nc'].text == 'g_5.nc'
+        assert list(results.errors) == ['g_2.nc']
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_granules_availability_timeline(self):
+        from .availability_test import availability_server
+        session = AsyncStubSession(availability_server)
+        l2ss = AsyncL2SS(transport=AsyncTransport(session=session))
+        timeline = run(l2ss.granules_availability_timeline(
+            dataset_id='PODAAC-A', start_time='2014-01-01T00:00:00Z',
+            end_time='2015-01-01T00:00:00Z', chunk_bins=100))
+
+        assert len(session.calls) == 4
+        assert len(timeline.times) == len(timeline.counts) == 365
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_granule_opendap(self):
+        from .emulator import Emulator
+        from .opendap_test import URL, dap_server
+        session = AsyncStubSession(dap_server(Emulator()))
+        podaac = AsyncPodaac(transport=AsyncTransport(session=session))
+        arrays = run(podaac.granule_opendap(URL, 'analysed_sst', np.s_[0, 1:3, -2:]))
+
+        assert len(session.calls) == 2
+        assert arrays['analysed_sst'].tolist() == [[[7001178, 7001179], [7002178, 7002179]]]
+
+        urls = [URL.replace('00007', '%05d' % index) for index in range(6)] + \
+            [URL.replace('granule_00007', 'missing')]
+        result = run(podaac.granule_opendap_all(urls, 'analysed_sst', np.s_[0, 0:2, 0:2],
+                                                max_workers=3))
+        assert result.values[:, 0, 1].tolist()[:6] == [index * 1e6 + 1 for index in range(6)]
+        assert np.isnan(result.values[6]).all() and list(result.errors) == [urls[6]]
+
+        result = run(podaac.granule_opendap_all(urls[:2], 'analysed_sst', bbox='-10,-20,10,20'))
+        assert result.values.shape == (2, 20, 10) and not result.errors
+        assert result.coordinates['lon'].tolist() == list(range(-9, 10, 2))
+
+    def test_granule_subset_all(self):
+        from ..polling import PollingStrategy
+        from .subset_test import SubsetServer, subset_request
+        server = SubsetServer(polls=2, failing=('ascat_3.l2.nc',))
+        podaac = AsyncPodaac(transport=AsyncTransport(session=AsyncStubSession(server)))
+        granules = ['ascat_%d.l2.nc' % i for i in range(6)]
+        finished = []
+        path = tempfile.mkdtemp()
+        try:
+            results = run(podaac.granule_subset_all(
+                [subset_request(g) for g in granules], path=path, max_jobs=2,
+                callback=finished.append, polling=PollingStrategy(initial_interval=0)))
+
+            assert server.max_running == 2 and len(finished) == 6
+            assert [r.granules for r in results if r.error is None] == \
+                [[os.path.join(path, 'subsetted-' + g)] for g in granules if g != 'ascat_3.l2.nc']
+            assert results[3].status == 'error' and results[3].granules == []
+            assert sorted(os.listdir(path)) == \
+                sorted('subsetted-' + g for g in granules if g != 'ascat_3.l2.nc')
+        finally:
+            shutil.rmtree(path)
+
+    def test_fetch_zip_streams_into_the_extractor(self):
+        from .extract_test import MEMBERS, archive
+        data = archive()
+        responses = [(503, ''), data, b'PK\x03\x04' + b'\0' * 2000000]
+        session = AsyncStubSession(lambda method, url, kwargs: responses.pop(0))
+        transport = AsyncTransport(session=session, backoff_factor=0)
+        url = 'https://podaac.jpl.nasa.gov/ws/results/job.zip'
+        path = tempfile.mkdtemp()
+        try:
+            paths = run(transport.fetch_zip(url, path, chunk_size=100))
+            assert paths == [os.path.join(path, name) for name, _ in MEMBERS]
+            for target, (_, payload) in zip(paths, MEMBERS):
+                with open(target, 'rb') as f:
+                    assert f.read() == payload
+            # a corrupt archive fails without waiting for the rest of the body
+            assert_raises(IOError, run, transport.fetch_zip(url, path, chunk_size=100))
+            assert sorted(os.listdir(path)) == ['granule_1.nc', 'granule_3.nc', 'nested']
+
+            shutil.rmtree(path)
+            session.handler = lambda method, url, kwargs: data
+            paths = run(transport.fetch_zip(url, path, members=['nested/granule_2.nc'],
+                                            spool_size=1024))
+            assert paths == [os.path.join(path, 'nested', 'granule_2.nc')]
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_granule_subset_and_download(self):
+        from .subset_test import SubsetServer, subset_request
+        server = SubsetServer(polls=0)
+        podaac = AsyncPodaac(transport=AsyncTransport(session=AsyncStubSession(server)))
+        path = tempfile.mkdtemp()
+        try:
+            request_path = os.path.join(path, 'request.json')
+            with open(request_path, 'w') as f:
+                json.dump(subset_request('ascat_1.l2.nc'), f)
+            assert run(podaac.granule_subset(request_path, path=path, spool_size=0)) == \
+                'subsetted-ascat_1.l2.nc'
+            with self.assertRaises(ValueError) as raised:
+                run(podaac.granule_subset(request_path, path=path, members=['missing.nc']))
+            assert 'ascat_1.l2.nc.zip' in str(raised.exception)
+            assert 'missing.nc' in str(raised.exception)
+
+            l2ss = AsyncL2SS(transport=AsyncTransport(session=AsyncStubSession(server)))
+            query = json.dumps(subset_request('ascat_2.l2.nc'))
+            assert run(l2ss.granule_download(query, path=path)) == \
+                [os.path.join(path, 'subsetted-ascat_2.l2.nc')]
+            assert sorted(os.listdir(path)) == \
+                ['request.json', 'subsetted-ascat_1.l2.nc', 'subsetted-ascat_2.l2.nc']
+        finally:
+            shutil.rmtree(path)
+
+    def test_l2ss_and_oceancolor(self):
+        def handler(method, url, kwargs):
+            if 'granule/search' in url:
+                start_index = int(query_value(url, 'startIndex', '0'))
+                docs = [{'Granule-Name': ['g%d' % i]}
+                        for i in range(start_index, min(start_index + 2, 5))]
+                return json.dumps({'response': {'numFound': 5, 'docs': docs}})
+            if 'getfile' in url:
+                return b'x' * 1000
+            return '{"files": []}'
+        session = AsyncStubSession(handler)
+        transport = AsyncTransport(session=session)
+        result = run(AsyncL2SS(transport=transport).granule_search_all(
+            dataset_id='PODAAC-TEST', items_per_page='2'))
+        assert [doc['Granule-Name'][0] for doc in result['response']['docs']] == \
+            ['g0', 'g1', 'g2', 'g3', 'g4']
+
+        ocean_color = AsyncOceanColor(transport=transport)
+        assert run(ocean_color.file_search(sensor='aqua', search='*DAY_CHL*')) == '{"files": []}'
+        assert session.calls[-1][0] == 'POST'
+        path = tempfile.mkdtemp()
+        try:
+            run(ocean_color.get_file(
+                'https://oceandata.sci.gsfc.nasa.gov/cgi/getfile/O1997001.L3b_DAY_CHL.nc', path))
+            assert os.listdir(path) == ['O1997001.L3b_DAY_CHL.nc']
+            assert os.path.getsize(os.path.join(path, 'O1997001.L3b_DAY_CHL.nc')) == 1000
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,139 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..atom import Feed
+from ..podaac import Podaac
+from ..records import Dataset, Variable
+from ..transport import Transport
+from .stub import FEED, StubSession, fixture, granule_feed, query_value
+from io import BytesIO
+import requests
+from nose.tools import assert_raises
+import unittest
+
+DDX = ('<Dataset xmlns="http://xml.opendap.org/ns/DAP/3.2#" name="granule.nc">'
+       '<Array name="time"><Attribute name="units" type="String">'
+       '<value>seconds since 1981-01-01</value></Attribute>'
+       '<Int32/><dimension name="time" size="1"/></Array>'
+       '<Grid name="sst"><Array name="sst">'
+       '<Attribute name="long_name" type="String">'
+       '<value>sea surface temperature</value></Attribute>'
+       '<Attribute name="units" type="String"><value>kelvin</value></Attribute>'
+       '<Int16/><dimension name="time" size="1"/><dimension name="lat" size="2"/></Array>'
+       '<Map name="time"><Int32/><dimension name="time" size="1"/></Map></Grid></Dataset>')
+
+
+def paged_search(total_results):
+    def handler(method, url, kwargs):
+        start_index = int(query_value(url, 'startIndex', '0'))
+        items_per_page = int(query_value(url, 'itemsPerPage'))
+        return granule_feed(total_results, start_index, items_per_page)
+    return StubSession(handler)
+
+
+class TestAtom(unittest.TestCase):
+
+    def test_feed_granules(self):
+        feed = Feed(BytesIO(fixture('granule_search.xml')))
+        granules = list(feed.granules())
+
+        assert feed.total_results == 6
+        assert feed.items_per_page == 400
+        assert len(granules) == 6
+        granule = granules[1]
+        assert granule.name == 'ascat_20180912_003900_metopa_61734_eps_o_coa_2401_ovw.l2.nc'
+        assert granule.dataset_id == 'PODAAC-ASOP2-12C01'
+        assert granule.short_name == 'ASCATA-L2-Coastal'
+        assert granule.start_time == '2018-09-12T00:39:00Z'
+        assert granule.end_time == '2018-09-12T02:20:58Z'
+        assert granule.opendap_url.endswith('ovw.l2.nc.gz.html')
+        assert granule.drive_url.startswith('https://podaac-tools.jpl.nasa.gov/drive/files/')
+        assert granule.preview_url.startswith(
+            'https://ops-podaac-tools.jpl.nasa.gov/l2ss-services/')
+        assert granule.box == (-89.41189000000001, 0.0015600000000000002, 89.30624, 359.98615)
+        assert len(granule.links) == 6
+        assert granules[0].preview_url is None
+
+    def test_iter_granules_walks_every_page(self):
+        session = paged_search(23)
+        podaac = Podaac(transport=Transport(session=session))
+        granules = list(podaac.iter_granules(dataset_id='PODAAC-TEST', items_per_page='10'))
+
+        assert [g.name for g in granules] == ['granule_%05d.nc' % i for i in range(23)]
+        assert [query_value(url, 'startIndex') for _, url, _ in session.calls] == ['0', '10', '20']
+
+    def test_iter_granules_is_lazy(self):
+        session = paged_search(50)
+        podaac = Podaac(transport=Transport(session=session))
+        granules = podaac.iter_granules(dataset_id='PODAAC-TEST', items_per_page='10')
+        for _ in range(10):
+            next(granules)
+
+        assert len(session.calls) == 1
+        granules.close()
+
+    def test_iter_granules_prefetch(self):
+        session = paged_search(20)
+        podaac = Podaac(transport=Transport(session=session))
+        granules = list(podaac.iter_granules(dataset_id='PODAAC-TEST', items_per_page='10',
+                                             prefetch=True))
+
+        assert len(granules) == 20
+        assert len(session.calls) == 2
+
+    def test_iter_granules_errors(self):
+        podaac = Podaac(transport=Transport(session=StubSession(lambda m, u, k: (400, ''))))
+        assert_raises(requests.exceptions.HTTPError, list,
+                      podaac.iter_granules(dataset_id='PODAAC'))
+        assert_raises(Exception, list, podaac.iter_granules())
+
+    def test_granule_search_parse(self):
+        session = paged_search(23)
+        podaac = Podaac(transport=Transport(session=session))
+        granules = podaac.granule_search(dataset_id='PODAAC-TEST', items_per_page='10', parse=True)
+
+        assert [g.name for g in granules] == ['granule_%05d.nc' % i for i in range(10)]
+        assert granules.total_results == 23
+        assert granules.text == granule_feed(23, 0, 10)
+        assert not hasattr(granules[0], '__dict__')
+        assert_raises(ValueError, podaac.granule_search, dataset_id='PODAAC-TEST',
+                      _format='html', parse=True)
+
+    def test_dataset_search_parse(self):
+        entry = ('<entry><title>ASCAT Coastal</title>'
+                 '<podaac:datasetId>PODAAC-ASOP2-12C01</podaac:datasetId>'
+                 '<podaac:shortName>ASCATA-L2-Coastal</podaac:shortName>'
+                 '<link href="https://podaac.jpl.nasa.gov/dataset/ASCATA-L2-Coastal" '
+                 'title="Dataset Information"/></entry>')
+        podaac = Podaac(transport=Transport(session=StubSession(
+            lambda m, u, k: FEED % (1, 0, 50, entry))))
+        datasets = podaac.dataset_search(keyword='ascat', parse=True)
+
+        assert datasets == [Dataset('PODAAC-ASOP2-12C01', 'ASCATA-L2-Coastal', 'ASCAT Coastal',
+                                    None, None, None, None,
+                                    (('Dataset Information',
+                                      'https://podaac.jpl.nasa.gov/dataset/ASCATA-L2-Coastal'),))]
+
+    def test_dataset_variables_parse(self):
+        def handler(method, url, kwargs):
+            if url.endswith('.ddx'):
+                return DDX
+            return granule_feed(1, 0, 1)
+        podaac = Podaac(transport=Transport(session=StubSession(handler)))
+
+        assert podaac.dataset_variables('PODAAC-TEST') == ['time', 'sst']
+        assert podaac.dataset_variables('PODAAC-TEST', parse=True) == [
+            Variable('time', 'Int32', (('time', 1),), 'seconds since 1981-01-01', None),
+            Variable('sst', 'Int16', (('time', 1), ('lat', 2)), 'kelvin',
+                     'sea surface temperature')]
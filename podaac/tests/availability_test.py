@@ -0,0 +1,109 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..l2ss import L2SS
+from ..transport import Transport
+from .stub import StubSession, query_value
+from datetime import datetime, timedelta
+import json
+import unittest
+
+try:
+    import numpy as np
+    from ..availability import chunks, find_gaps, merge, parse, Timeline
+except ImportError:  # optional dependency
+    np = None
+
+DAY = timedelta(days=1)
+
+
+def daily_count(dataset_id, day):
+    '''Granules of a dataset on a day: none on every 10th day, nor in \
+    March 2015 for 'PODAAC-B'.'''
+    ordinal = day.toordinal()
+    if ordinal % 10 == 0 or (dataset_id == 'PODAAC-B' and (day.year, day.month) == (2015, 3)):
+        return 0
+    return ordinal % 7 + 1
+
+
+def availability_server(method, url, kwargs):
+    start = datetime.strptime(query_value(url, 'startTime'), '%Y-%m-%dT%H:%M:%SZ')
+    end = datetime.strptime(query_value(url, 'endTime'), '%Y-%m-%dT%H:%M:%SZ')
+    facets = {'gap': '+1DAY', 'start': query_value(url, 'startTime'),
+              'end': query_value(url, 'endTime')}
+    day = start
+    while day < end:
+        facets[day.strftime('%Y-%m-%dT%H:%M:%SZ')] = daily_count(query_value(url, 'datasetId'), day)
+        day += DAY
+    return json.dumps({'responseHeader': {'status': 0},
+                       'facet_counts': {'facet_dates': {'Granule-StartTime': facets}}})
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestAvailability(unittest.TestCase):
+
+    def test_chunks(self):
+        assert chunks('2014-01-01T00:00:00Z', '2014-01-11T00:00:00Z', 'DAY', 4) == [
+            ('2014-01-01T00:00:00Z', '2014-01-05T00:00:00Z'),
+            ('2014-01-05T00:00:00Z', '2014-01-09T00:00:00Z'),
+            ('2014-01-09T00:00:00Z', '2014-01-11T00:00:00Z')]
+        assert chunks('2014-01-31T00:00:00Z', '2014-06-01T00:00:00Z', 'MONTHS', 1)[:2] == [
+            ('2014-01-31T00:00:00Z', '2014-02-28T00:00:00Z'),
+            ('2014-02-28T00:00:00Z', '2014-03-31T00:00:00Z')]
+        assert chunks('', '', 'DAY') == [('', '')]
+        assert chunks('2014-01-01T00:00:00Z', '2014-01-02T00:00:00Z', 'HOUR') == \
+            [('2014-01-01T00:00:00Z', '2014-01-02T00:00:00Z')]
+
+    def test_timeline(self):
+        session = StubSession(availability_server)
+        l2ss = L2SS(transport=Transport(session=session))
+        timeline = l2ss.granules_availability_timeline(
+            dataset_id='PODAAC-A', start_time='2010-01-01T00:00:00Z',
+            end_time='2016-01-01T00:00:00Z', gap='DAY', max_workers=4)
+        single = parse(l2ss.granules_availability(
+            dataset_id='PODAAC-A', start_time='2010-01-01T00:00:00Z',
+            end_time='2016-01-01T00:00:00Z', gap='DAY'))
+
+        assert len(session.calls) == 7
+        assert timeline.times.dtype == np.dtype('datetime64[s]')
+        assert len(timeline.times) == (datetime(2016, 1, 1) - datetime(2010, 1, 1)).days
+        assert np.array_equal(timeline.times, single.times)
+        assert np.array_equal(timeline.counts, single.counts)
+
+    def test_matrix_and_gaps(self):
+        l2ss = L2SS(transport=Transport(session=StubSession(availability_server)))
+        matrix = l2ss.granules_availability_matrix(
+            ['PODAAC-A', ('PODAAC-B', '-180,-90,180,90')], start_time='2015-01-01T00:00:00Z',
+            end_time='2015-07-01T00:00:00Z', chunk_bins=30)
+
+        assert matrix.labels == ['PODAAC-A', ('PODAAC-B', '-180,-90,180,90')]
+        assert matrix.counts.shape == (2, 181)
+        gaps = find_gaps(matrix.times, matrix.counts, min_bins=2)
+        assert list(gaps.rows) == [1]
+        assert gaps.starts[0] == np.datetime64('2015-03-01T00:00:00')
+        assert gaps.ends[0] == np.datetime64('2015-03-31T00:00:00') and gaps.bins[0] == 31
+
+        single_days = find_gaps(matrix.times, matrix.counts[0])
+        expected = [day for day in range(181)
+                    if daily_count('PODAAC-A', datetime(2015, 1, 1) + day * DAY) == 0]
+        assert list(single_days.bins) == [1] * len(expected)
+        assert list(single_days.starts) == [matrix.times[day] for day in expected]
+
+    def test_merge_aligns_bins(self):
+        days = np.array(['2015-01-01', '2015-01-02', '2015-01-03'], dtype='datetime64[s]')
+        matrix = merge([Timeline(days[:2], np.array([1, 2])), Timeline(days[1:], np.array([3, 4]))],
+                       labels=['a', 'b'])
+
+        assert matrix.counts.tolist() == [[1, 2, 0], [0, 3, 4]]
+        assert len(merge([]).times) == 0
@@ -0,0 +1,246 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Offline performance benchmarks of podaacpy, run against the local \
+:mod:`podaac.tests.emulator`. Every run is appended to a history file, \
+and compared with the median of the previous runs to catch regressions::
+
+    python -m podaac.tests.benchmark --history benchmarks.jsonl
+'''
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from .. import atom, download
+from ..podaac import Podaac
+from ..polling import PollingStrategy
+from ..transport import Transport
+from .emulator import Emulator
+from .stub import granule_feed
+
+MB = 1024 * 1024
+
+# seconds a cold import of each module may take, its dependencies
+# included; generous, so that only a real regression goes over
+IMPORT_BUDGETS = {
+    'podaac': 0.1,
+    'podaac.podaac_utils': 0.15,
+    'podaac.podaac': 1.0,
+}
+
+Result = namedtuple('Result', ['name', 'value', 'unit', 'higher_is_better'])
+Result.__doc__ = '''The best measure of one benchmark over its repeats.'''
+
+Regression = namedtuple('Regression', ['name', 'value', 'baseline', 'change'])
+Regression.__doc__ = '''A benchmark which did worse than its baseline, \
+        the median of its previous runs; `change` is the relative loss.'''
+
+
+def requests_per_second(quick=False):
+    '''Granule metadata requests per second from 8 threads sharing one client.'''
+    count = 100 if quick else 1000
+    with Emulator() as emulator:
+        podaac = Podaac(transport=Transport(session=emulator.session(), pool_maxsize=8))
+        names = ['granule_%05d.nc' % index for index in range(count)]
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda name: podaac.granule_metadata(
+                dataset_id='PODAAC-TEST', granule_name=name), names))
+        return count / (time.time() - started), 'requests/s', True
+
+
+def parse_throughput(quick=False):
+    '''Granule search entries parsed per second, from one large Atom feed.'''
+    entries = 500 if quick else 5000
+    feed = granule_feed(entries, 0, entries).encode('utf-8')
+    started = time.time()
+    assert len(atom.parse_results(feed, 'utf-8')) == entries
+    return entries / (time.time() - started), 'entries/s', True
+
+
+def download_throughput(quick=False):
+    '''Megabytes per second of a 4 segment granule download.'''
+    size = 8 * MB if quick else 64 * MB
+    path = tempfile.mkdtemp()
+    try:
+        with Emulator(file_size=size) as emulator:
+            transport = Transport(session=emulator.session())
+            started = time.time()
+            download.fetch(transport, 'https://podaac-tools.jpl.nasa.gov/drive/files/allData/'
+                           'granule.nc', os.path.join(path, 'granule.nc'), segments=4,
+                           min_segment_size=MB)
+            return size / MB / (time.time() - started), 'MB/s', True
+    finally:
+        shutil.rmtree(path)
+
+
+def subset_turnaround(quick=False):
+    '''Seconds from submitting 8 subset jobs to extracting all their results.'''
+    jobs = 8
+    path = tempfile.mkdtemp()
+    try:
+        with Emulator(subset_polls=2) as emulator:
+            podaac = Podaac(transport=Transport(session=emulator.session()))
+            requests = [{'email': '', 'query': [{'datasetId': 'PODAAC-ASOP2-25X01',
+                                                 'bbox': '-180,-90,180,90', 'compact': 'true',
+                                                 'variables': ['wvc_index'],
+                                                 'granuleIds': ['granule_%d.nc' % index]}]}
+                        for index in range(jobs)]
+            polling = PollingStrategy(initial_interval=0.01, max_interval=0.05, jitter=0)
+            started = time.time()
+            results = podaac.granule_subset_all(requests, path=path, polling=polling)
+            assert all(result.error is None for result in results)
+            return time.time() - started, 's', False
+    finally:
+        shutil.rmtree(path)
+
+
+def opendap_aggregation(quick=False):
+    '''Granules per second read into one time series by granule_opendap_all.'''
+    count = 50 if quick else 365
+    with Emulator(latency=0.01) as emulator:
+        podaac = Podaac(transport=Transport(session=emulator.session(), pool_maxsize=8))
+        urls = ['https://podaac-opendap.jpl.nasa.gov/opendap/allData/granule_%05d.nc.html'
+                % index for index in range(count)]
+        started = time.time()
+        result = podaac.granule_opendap_all(urls, 'analysed_sst', bbox='-60,-30,60,30')
+        assert not result.errors
+        return count / (time.time() - started), 'granules/s', True
+
+
+def import_time(quick=False):
+    '''Seconds a fresh interpreter takes to import :mod:`podaac.podaac`.'''
+    return measure_import('podaac.podaac'), 's', False
+
+
+def measure_import(module):
+    '''Returns the seconds a fresh interpreter spends importing `module` \
+            and the modules it loads.'''
+    output = subprocess.check_output([sys.executable, '-c',
+                                      'import time\n'
+                                      'started = time.time()\n'
+                                      'import ' + module + '\n'
+                                      'print(time.time() - started)'])
+    return float(output.decode('utf-8').strip())
+
+
+BENCHMARKS = [requests_per_second, parse_throughput, download_throughput, subset_turnaround,
+              opendap_aggregation, import_time]
+
+
+def run(names=None, repeat=3, quick=False):
+    '''Runs the benchmarks and keeps the best measure of each.
+
+    :param names: names of the benchmarks to run. Defaults to all of them.
+    :type names: :mod:`list`
+
+    :param repeat: number of times each benchmark is run.
+    :type repeat: :mod:`int`
+
+    :param quick: run smaller workloads, e.g. to check the suite itself.
+    :type quick: :mod:`bool`
+
+    :returns: a list of :class:`Result`.
+    '''
+    results = []
+    for benchmark in BENCHMARKS:
+        if names and benchmark.__name__ not in names:
+            continue
+        measures = [benchmark(quick) for _ in range(max(1, repeat))]
+        _, unit, higher_is_better = measures[0]
+        values = [value for value, _, _ in measures]
+        best = max(values) if higher_is_better else min(values)
+        results.append(Result(benchmark.__name__, best, unit, higher_is_better))
+    return results
+
+
+def load_history(path):
+    '''Returns the runs recorded in a history file, oldest first.'''
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record(path, results):
+    '''Appends a run to a history file, one json document per line.'''
+    run = {'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+           'python': platform.python_version(), 'machine': platform.machine(),
+           'results': dict((result.name, {'value': result.value, 'unit': result.unit})
+                           for result in results)}
+    with open(path, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + '\n')
+    return run
+
+
+def regressions(results, history, tolerance=0.2, window=5):
+    '''Compares results with the median of the last `window` runs of the \
+            history, and returns a :class:`Regression` for every \
+            benchmark more than `tolerance` worse than that baseline.'''
+    found = []
+    for result in results:
+        previous = sorted(run['results'][result.name]['value'] for run in history[-window:]
+                          if result.name in run.get('results', {}))
+        if not previous:
+            continue
+        baseline = previous[len(previous) // 2]
+        if not baseline:
+            continue
+        change = (baseline - result.value) / baseline
+        if not result.higher_is_better:
+            change = -change
+        if change > tolerance:
+            found.append(Regression(result.name, result.value, baseline, change))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--history', default=os.path.join(
+        os.path.expanduser('~'), '.cache', 'podaacpy', 'benchmarks.jsonl'),
+        help='file the runs are recorded in')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative loss reported as a regression')
+    parser.add_argument('--quick', action='store_true', help='run smaller workloads')
+    parser.add_argument('--no-record', action='store_true', help='do not record this run')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    results = run(args.names, args.repeat, args.quick)
+    for result in results:
+        print('%-22s %12.2f %s' % (result.name, result.value, result.unit))
+    found = regressions(results, history, args.tolerance)
+    for regression in found:
+        print('REGRESSION %s: %.2f against a baseline of %.2f (%d%% worse)' % (
+            regression.name, regression.value, regression.baseline, regression.change * 100))
+    if not args.no_record:
+        directory = os.path.dirname(os.path.abspath(args.history))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        record(args.history, results)
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..cache import ResponseCache, normalize_url
+from ..podaac import Podaac
+from ..l2ss import L2SS
+from ..transport import Transport
+from .stub import StubSession
+import os
+import shutil
+import tempfile
+import unittest
+
+ISO = '<gmi:MI_Metadata xmlns:gmi="http://www.isotc211.org/2005/gmi"/>'
+
+
+def metadata_server(etag='"md-1"'):
+    def handler(method, url, kwargs):
+        if (kwargs.get('headers') or {}).get('If-None-Match') == etag:
+            return 304, b'', {'ETag': etag}
+        return 200, ISO, {'ETag': etag, 'Content-Type': 'text/xml;charset=UTF-8'}
+    return StubSession(handler)
+
+
+class TestCache(unittest.TestCase):
+
+    def test_normalize_url(self):
+        assert normalize_url('HTTPS://PODAAC.jpl.nasa.gov/ws/metadata/granule/'
+                             '?format=iso&datasetId=A#x') == \
+            normalize_url('https://podaac.jpl.nasa.gov/ws/metadata/granule/?datasetId=A&format=iso')
+        assert normalize_url('https://podaac.jpl.nasa.gov/ws/?a=1', {'b': '2'}) == \
+            'https://podaac.jpl.nasa.gov/ws/?a=1&b=2'
+
+    def test_fresh_entries_skip_the_network(self):
+        session = metadata_server()
+        podaac = Podaac(transport=Transport(session=session, cache=ResponseCache(':memory:')))
+        first = podaac.granule_metadata(dataset_id='PODAAC-GHK10-41N01', granule_name='g.nc')
+        second = podaac.granule_metadata(dataset_id='PODAAC-GHK10-41N01', granule_name='g.nc')
+
+        assert first == second == ISO
+        assert len(session.calls) == 1
+        podaac.granule_search(dataset_id='PODAAC-GHK10-41N01')
+        podaac.granule_search(dataset_id='PODAAC-GHK10-41N01')
+        assert len(session.calls) == 3
+
+    def test_stale_entries_are_revalidated(self):
+        session = metadata_server()
+        cache = ResponseCache(':memory:', ttls={'dataset_metadata': 0})
+        podaac = Podaac(transport=Transport(session=session, cache=cache))
+        podaac.dataset_metadata(dataset_id='PODAAC-CCF35-01AD5')
+        metadata = podaac.dataset_metadata(dataset_id='PODAAC-CCF35-01AD5')
+
+        assert metadata == ISO
+        assert len(session.calls) == 2
+        assert session.calls[1][2]['headers']['If-None-Match'] == '"md-1"'
+
+    def test_cache_persists_on_disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'cache', 'responses.sqlite')
+            l2ss = L2SS(transport=Transport(session=metadata_server(), cache=ResponseCache(path)))
+            l2ss.dataset_variables('PODAAC-ASOP2-25X01')
+
+            session = metadata_server()
+            l2ss = L2SS(transport=Transport(session=session, cache=ResponseCache(path)))
+            assert l2ss.dataset_variables('PODAAC-ASOP2-25X01') == ISO
+            assert session.calls == []
+        finally:
+            shutil.rmtree(directory)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        def handler(method, url, kwargs):
+            return os.urandom(1000)
+        session = StubSession(handler)
+        cache = ResponseCache(':memory:', max_size=2500)
+        transport = Transport(session=session, cache=cache)
+        for name in ('a', 'b', 'c'):
+            transport.get('https://example.com/' + name, endpoint='granule_metadata')
+            transport.get('https://example.com/a', endpoint='granule_metadata')
+
+        assert cache.size() <= 2500
+        assert cache.lookup(normalize_url('https://example.com/a')) is not None
+        assert cache.lookup(normalize_url('https://example.com/b')) is None
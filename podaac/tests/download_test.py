@@ -0,0 +1,172 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import download
+from ..transport import Transport
+from .stub import StubSession, gzip_bytes
+from nose.tools import assert_raises
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+PAYLOAD = os.urandom(256 * 1024 + 3)
+
+
+def ranged(payload, etag='"v1"', truncate=None):
+    '''Serves `payload` honouring Range and If-Range like a static file server.'''
+    def handler(method, url, kwargs):
+        headers = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+        request_headers = kwargs.get('headers') or {}
+        byte_range = request_headers.get('Range')
+        if_range = request_headers.get('If-Range')
+        if method == 'HEAD':
+            headers['Content-Length'] = str(len(payload))
+            return 200, b'', headers
+        if byte_range and (if_range is None or if_range == etag):
+            start, _, end = byte_range[len('bytes='):].partition('-')
+            start = int(start)
+            end = int(end) if end else len(payload) - 1
+            if start >= len(payload):
+                return 416, b'', headers
+            headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, len(payload))
+            headers['Content-Length'] = str(end - start + 1)
+            return 206, payload[start:end + 1], headers
+        headers['Content-Length'] = str(len(payload))
+        return 200, payload[:truncate], headers
+    return handler
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.target = os.path.join(self.path, 'granule.nc')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def interrupted(self, size, etag):
+        with open(self.target + '.part', 'wb') as f:
+            f.write(PAYLOAD[:size])
+        with open(self.target + '.part.json', 'w') as f:
+            json.dump({'etag': etag, 'size': len(PAYLOAD)}, f)
+
+    def read_target(self):
+        with open(self.target, 'rb') as f:
+            return f.read()
+
+    def test_fetch(self):
+        session = StubSession(ranged(PAYLOAD))
+        received = download.fetch(Transport(session=session), 'https://example.com/granule.nc',
+                                  self.target)
+
+        assert received == len(PAYLOAD)
+        assert self.read_target() == PAYLOAD
+        assert sorted(os.listdir(self.path)) == ['granule.nc']
+        assert session.calls[0][2]['headers']['Accept-Encoding'] == 'identity'
+
+    def test_fetch_resumes_partial_file(self):
+        self.interrupted(1000, '"v1"')
+        session = StubSession(ranged(PAYLOAD))
+        received = download.fetch(Transport(session=session), 'https://example.com/granule.nc',
+                                  self.target)
+
+        assert received == len(PAYLOAD) - 1000
+        assert session.calls[0][2]['headers']['Range'] == 'bytes=1000-'
+        assert self.read_target() == PAYLOAD
+
+    def test_fetch_restarts_when_file_changed(self):
+        self.interrupted(1000, '"v0"')
+        received = download.fetch(Transport(session=StubSession(ranged(PAYLOAD))),
+                                  'https://example.com/granule.nc', self.target)
+
+        assert received == len(PAYLOAD)
+        assert self.read_target() == PAYLOAD
+
+    def test_fetch_rejects_short_transfer(self):
+        transport = Transport(session=StubSession(ranged(PAYLOAD, truncate=5000)))
+        assert_raises(IOError, download.fetch, transport, 'https://example.com/granule.nc',
+                      self.target)
+        assert not os.path.exists(self.target)
+        assert os.path.getsize(self.target + '.part') == 5000
+
+        received = download.fetch(Transport(session=StubSession(ranged(PAYLOAD))),
+                                  'https://example.com/granule.nc', self.target)
+        assert received == len(PAYLOAD) - 5000
+        assert self.read_target() == PAYLOAD
+
+    def test_fetch_segments(self):
+        session = StubSession(ranged(PAYLOAD))
+        received = download.fetch(Transport(session=session), 'https://example.com/granule.nc',
+                                  self.target, segments=4, min_segment_size=1024)
+
+        assert received == len(PAYLOAD)
+        assert self.read_target() == PAYLOAD
+        ranges = sorted(kwargs['headers']['Range'] for method, _, kwargs in session.calls
+                        if method == 'GET')
+        assert len(ranges) == 4
+        assert session.calls[0][0] == 'HEAD'
+
+    def test_fetch_decompress(self):
+        compressed = gzip_bytes(PAYLOAD)
+        download.fetch(Transport(session=StubSession(ranged(compressed))),
+                       'https://example.com/granule.nc.gz', self.target, decompress=True,
+                       chunk_size=4096)
+
+        assert self.read_target() == PAYLOAD
+        assert sorted(os.listdir(self.path)) == ['granule.nc']
+
+    def test_fetch_decompress_streams(self):
+        # a single stream is decompressed as it arrives, without a compressed copy
+        compressed = gzip_bytes(PAYLOAD) + gzip_bytes(b'second member')
+        transport = Transport(session=StubSession(ranged(compressed, truncate=-10)))
+        assert_raises(IOError, download.fetch, transport, 'https://example.com/granule.nc.gz',
+                      self.target, decompress=True, chunk_size=4096)
+        assert os.listdir(self.path) == []
+
+        session = StubSession(ranged(compressed))
+        received = download.fetch(Transport(session=session), 'https://example.com/granule.nc.gz',
+                                  self.target, decompress=True, chunk_size=4096)
+        assert received == len(compressed)
+        assert self.read_target() == PAYLOAD + b'second member'
+        assert sorted(os.listdir(self.path)) == ['granule.nc']
+
+    def test_fetch_decompress_segments(self):
+        compressed = gzip_bytes(PAYLOAD)
+        download.fetch(Transport(session=StubSession(ranged(compressed))),
+                       'https://example.com/granule.nc.gz', self.target, decompress=True,
+                       segments=4, min_segment_size=1024, chunk_size=4096)
+
+        assert self.read_target() == PAYLOAD
+        assert sorted(os.listdir(self.path)) == ['granule.nc']
+
+    def test_download_all_records_errors(self):
+        def fetch(url):
+            if url.endswith('missing.nc'):
+                raise IOError('not found')
+            return download.DownloadResult(url, url, 10, 0.5, False)
+        finished = []
+        urls = ['https://example.com/a.nc', 'https://example.com/missing.nc',
+                'https://example.com/b.nc']
+        report = download.download_all(fetch, urls, workers=2, callback=finished.append)
+
+        assert [result.url for result in report.results] == urls
+        assert len(finished) == 3 and report.size == 20
+        assert report.failed == [report.results[1]]
+        assert isinstance(report.results[1].error, IOError) and report.results[1].size == 0
+        assert report.results[0].error is None
+        assert '1 failed' in str(report)
+        assert_raises(IOError, download.download_all, fetch, urls, raise_errors=True)
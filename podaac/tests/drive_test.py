@@ -13,7 +13,12 @@
 # limitations under the License.
 
 from ..drive import Drive
+from ..transport import Transport
+from .stub import StubSession, fixture, gzip_bytes
 import os
+import requests
+import shutil
+import tempfile
 from glob import glob
 import unittest
 
@@ -39,3 +44,64 @@ class TestDrive(unittest.TestCase):
         self.assertEqual(6, len(drive_urls))
         drive.download_granules(granule_collection=drive_urls, path='./podaac/tests/')
         self.assertEqual(6, len([y for x in os.walk('./podaac/tests/allData') for y in glob(os.path.join(x[0], '*.nc'))]))
+
+    def test_mine_drive_urls_from_granule_search(self):
+        drive = Drive(None, 'podaac', 'ZAnTpYo', 'https://podaac-tools.jpl.nasa.gov/drive/files')
+        drive_urls = drive.mine_drive_urls_from_granule_search(
+            granule_search_response=fixture('granule_search.xml').decode('utf-8'))
+        self.assertEqual(6, len(drive_urls))
+        self.assertTrue(drive_urls[0].endswith('ascat_20180913_020000_metopa_61749_eps_o_coa_2401_ovw.l2.nc.gz'))
+        self.assertEqual([], drive.mine_drive_urls_from_granule_search(''))
+
+    def test_download_granules_concurrently(self):
+        payload = os.urandom(3 * 1024 * 1024 + 17)
+
+        def handler(method, url, kwargs):
+            if url.endswith('.gz'):
+                return gzip_bytes(payload)
+            return payload
+        session = StubSession(handler)
+        drive = Drive(None, 'podaac', 'ZAnTpYo', transport=Transport(session=session))
+        urls = ['https://podaac-tools.jpl.nasa.gov/drive/files/allData/test/2019/%03d/granule.nc%s'
+                % (day, '.gz' if day % 2 else '') for day in range(1, 7)]
+        path = tempfile.mkdtemp()
+        try:
+            report = drive.download_granules(granule_collection=urls, path=path, workers=3,
+                                             chunk_size=64 * 1024)
+            self.assertEqual(6, len(report.results))
+            self.assertEqual([], report.skipped)
+            for result in report.results:
+                self.assertTrue(result.path.endswith('/granule.nc'))
+                with open(result.path, 'rb') as f:
+                    self.assertEqual(payload, f.read())
+            self.assertEqual([], glob(os.path.join(path, 'allData', '*', '*', '*', '*.part')))
+
+            report = drive.download_granules(granule_collection=urls, path=path)
+            self.assertEqual(6, len(report.skipped))
+            self.assertEqual(6, len(session.calls))
+        finally:
+            shutil.rmtree(path)
+
+    def test_download_granules_errors(self):
+        def handler(method, url, kwargs):
+            if '/002/' in url:
+                return 401, b''
+            if '/003/' in url:
+                return 404, b''
+            return b'granule'
+        drive = Drive(None, 'podaac', 'ZAnTpYo', transport=Transport(session=StubSession(handler)))
+        urls = ['https://podaac-tools.jpl.nasa.gov/drive/files/allData/test/2019/%03d/granule.nc'
+                % day for day in range(1, 5)]
+        path = tempfile.mkdtemp()
+        try:
+            # refused credentials raise, as the other granules are still downloaded
+            self.assertRaises(PermissionError, drive.download_granules,
+                              granule_collection=urls, path=path)
+            report = drive.download_granules(granule_collection=urls, path=path,
+                                             raise_errors=False)
+            self.assertEqual([urls[1], urls[2]], [result.url for result in report.failed])
+            self.assertIsInstance(report.failed[0].error, PermissionError)
+            self.assertIsInstance(report.failed[1].error, requests.exceptions.HTTPError)
+            self.assertEqual(2, len(report.skipped))
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,472 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''A local stand-in for the PO.DAAC, L2SS, MCC, OBPG, Drive and OPeNDAP endpoints, \
+served over HTTP on 127.0.0.1, with configurable latency, bandwidth and \
+error injection. Point a transport at it with \
+Transport(session=emulator.session()): the clients keep their usual \
+URLs, which the session sends to the emulator instead.'''
+
+from datetime import datetime, timedelta
+from io import BytesIO
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zipfile
+import requests
+from future.moves.http.server import BaseHTTPRequestHandler, HTTPServer
+from future.moves.socketserver import ThreadingMixIn
+from future.moves.urllib.parse import parse_qs, urlsplit, urlunsplit
+from .stub import fixture, granule_feed
+
+GRANULE = 'ascat_20130719_230600_metopa_35024_eps_o_250_2200_ovw.l2_subsetted_.nc'
+ISO = ('<gmi:MI_Metadata xmlns:gmi="http://www.isotc211.org/2005/gmi">'
+       '<name>%s</name></gmi:MI_Metadata>')
+RSS = '<rss version="2.0"><channel><title>%s</title>%s</channel></rss>'
+# the grid of every emulated OPeNDAP granule: 2 degree cells, one time step
+DAP_SHAPE = {'time': 1, 'lat': 90, 'lon': 180}
+DAP_ERROR = 'Error {\n    code = %d;\n    message = "%s";\n};\n'
+CHUNK_SIZE = 64 * 1024
+
+
+class Emulator:
+
+    def __init__(self, granules=1000, file_size=None, latency=0.0, bandwidth=None,
+                 error_rate=0.0, error_status=503, retry_after=None, subset_polls=1, seed=0):
+        '''Emulates the services with recorded and generated fixtures.
+
+        :param granules: number of granules every granule search finds.
+        :type granules: :mod:`int`
+
+        :param file_size: size in bytes of the files served for download. \
+                Defaults to the bundled ASCAT netCDF granule.
+        :type file_size: :mod:`int`
+
+        :param latency: seconds waited before every response.
+        :type latency: :mod:`float`
+
+        :param bandwidth: bytes per second each response body is sent at. \
+                None does not limit it.
+        :type bandwidth: :mod:`float`
+
+        :param error_rate: fraction of requests answered with `error_status`.
+        :type error_rate: :mod:`float`
+
+        :param error_status: status of the injected errors.
+        :type error_status: :mod:`int`
+
+        :param retry_after: Retry-After value, in seconds, sent with \
+                injected errors. None sends no header.
+        :type retry_after: :mod:`int`
+
+        :param subset_polls: number of status checks a subset job reports \
+                'submitted' before it is done.
+        :type subset_polls: :mod:`int`
+
+        :param seed: seed of the error injection, for reproducible runs.
+        :type seed: :mod:`int`
+        '''
+        self.granules = granules
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.subset_polls = subset_polls
+        if file_size is None:
+            self.file = fixture(GRANULE)
+        else:
+            block = bytes(bytearray(range(256))) * 256
+            self.file = (block * (file_size // len(block) + 1))[:file_size]
+        self.hits = {}
+        self.errors = 0
+        self._jobs = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        '''Base URL of the running emulator.'''
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        '''Starts serving on a free local port, in a daemon thread.'''
+        emulator = self
+
+        class Handler(_Handler):
+            pass
+        Handler.emulator = emulator
+        self._server = _Server(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        '''Stops serving and closes the socket.'''
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def session(self):
+        '''Returns a :class:`requests.Session` sending every request to the \
+                emulator, whatever the host of its URL.'''
+        return EmulatorSession(self)
+
+    def rewrite(self, url):
+        '''Returns the URL of the emulator answering for `url`.'''
+        parts = urlsplit(url)
+        return urlunsplit(('http', urlsplit(self.url).netloc, parts.path, parts.query, ''))
+
+    def respond(self, method, path, query, body):
+        '''Answers one request.
+
+        :returns: a (status, headers, body) tuple.
+        '''
+        route = _route(path)
+        with self._lock:
+            self.hits[route] = self.hits.get(route, 0) + 1
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if failed:
+            headers = {'Content-Type': 'text/plain'}
+            if self.retry_after is not None:
+                headers['Retry-After'] = str(self.retry_after)
+            return self.error_status, headers, b'Injected error'
+        handler = getattr(self, '_' + route, None)
+        if handler is None:
+            return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+        return handler(method, path, query, body)
+
+    def _granule_search(self, method, path, query, body):
+        start_index = int(query.get('startIndex') or 0)
+        items_per_page = int(query.get('itemsPerPage') or 7)
+        feed = granule_feed(self.granules, start_index, items_per_page,
+                            query.get('datasetId') or 'PODAAC-TEST')
+        return _ok(feed, 'application/atom+xml')
+
+    def _granule_metadata(self, method, path, query, body):
+        if query.get('format') == 'datacasting':
+            count = min(self.granules, int(query.get('itemsPerPage') or 50))
+            items = ''.join('<item><title>granule_%05d.nc</title></item>' % index
+                            for index in range(count))
+            return _ok(RSS % (query.get('datasetId', ''), items), 'application/xml')
+        return _ok(ISO % query.get('granuleName', ''), 'application/xml')
+
+    def _dataset_metadata(self, method, path, query, body):
+        return _ok(ISO % (query.get('datasetId') or query.get('shortName', '')), 'application/xml')
+
+    def _subset_submit(self, method, path, query, body):
+        request = json.loads(parse_qs(body.decode('utf-8'))['query'][0])
+        with self._lock:
+            token = 'token-%d' % len(self._jobs)
+            self._jobs[token] = [request['query'][0]['granuleIds'][0], 0]
+        return _ok(json.dumps({'status': 'submitted', 'token': token}), 'application/json')
+
+    def _subset_status(self, method, path, query, body):
+        with self._lock:
+            job = self._jobs.get(query.get('token'))
+            if job is None:
+                return _ok(json.dumps({'status': 'unknown'}), 'application/json')
+            job[1] += 1
+            polls = job[1]
+        if polls <= self.subset_polls:
+            return _ok(json.dumps({'status': 'submitted'}), 'application/json')
+        url = 'https://podaac.jpl.nasa.gov/ws/results/%s.zip' % query.get('token')
+        return _ok(json.dumps({'status': 'done', 'resultURLs': [url]}), 'application/json')
+
+    def _subset_result(self, method, path, query, body):
+        token = path.rsplit('/', 1)[-1][:-len('.zip')]
+        with self._lock:
+            job = self._jobs.get(token)
+        if job is None:
+            return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('subsetted-' + job[0], self.file)
+        return _ok(buffer.getvalue(), 'application/zip')
+
+    def _l2ss_granule_search(self, method, path, query, body):
+        start_index = int(query.get('startIndex') or 0)
+        items_per_page = int(query.get('itemsPerPage') or 7)
+        docs = [{'Granule-Name': ['granule_%05d.nc' % index],
+                 'Granule-DatasetId': [query.get('datasetId', '')]}
+                for index in range(start_index, min(start_index + items_per_page, self.granules))]
+        return _ok(json.dumps({'response': {'numFound': self.granules, 'start': start_index,
+                                            'docs': docs}}), 'application/json')
+
+    def _l2ss_availability(self, method, path, query, body):
+        start = datetime.strptime(query['startTime'], '%Y-%m-%dT%H:%M:%SZ')
+        end = datetime.strptime(query['endTime'], '%Y-%m-%dT%H:%M:%SZ')
+        facets = {'gap': '+1DAY', 'start': query['startTime'], 'end': query['endTime']}
+        day = start
+        while day < end:
+            facets[day.strftime('%Y-%m-%dT%H:%M:%SZ')] = (day.toordinal() * 7) % 15
+            day += timedelta(days=1)
+        return _ok(json.dumps({'responseHeader': {'status': 0},
+                               'facet_counts': {'facet_dates': {'Granule-StartTime': facets}}}),
+                   'application/json')
+
+    def _mcc_check(self, method, path, query, body):
+        return _ok(json.dumps({'model': {'checkers': query.get('checkers', '')},
+                               'ACDD': {'score': 1.0}}), 'application/json')
+
+    def _file_search(self, method, path, query, body):
+        names = ['A2017%03d.L3m_DAY_CHL.nc' % day for day in range(1, 1 + min(self.granules, 365))]
+        if query.get('addurl') == '1':
+            names = ['https://oceandata.sci.gsfc.nasa.gov/cgi/getfile/' + name for name in names]
+        return _ok('\n'.join(names), 'text/plain')
+
+    def _opendap(self, method, path, query, body):
+        # a DAP2 server over a synthetic gridded granule; analysed_sst[t, i, j]
+        # is index * 1e6 + i * 1e3 + j, index being the number in the granule name
+        path, _, suffix = path.rpartition('.')
+        name = path.rsplit('/', 1)[-1]
+        number = re.match(r'granule_(\d+)', name)
+        if number is None:
+            message = DAP_ERROR % (404, 'Not Found: %s' % name)
+            return 404, {'Content-Type': 'text/plain'}, message.encode('utf-8')
+        variables = _dap_variables(int(number.group(1)))
+        expression = next((key for key, value in query.items() if not value), '')
+        try:
+            projections = _dap_projections(expression, variables)
+        except (KeyError, IndexError, ValueError) as error:
+            if isinstance(error, KeyError):
+                error = 'No such variable: %s' % error.args[0]
+            message = DAP_ERROR % (1001, str(error).replace('"', "'"))
+            return 400, {'Content-Type': 'text/plain'}, message.encode('utf-8')
+        declarations, data = [], []
+        for name, slices in projections:
+            kind, dimensions, value = variables[name]
+            if slices is not None:
+                value = value[tuple(slice(start, stop + 1, stride)
+                                    for start, stride, stop in slices)]
+            if name == 'analysed_sst':
+                maps = [(dimension, size) for dimension, size in zip(dimensions, value.shape)]
+                map_declarations = ''.join(
+                    '    ' + _dap_declaration(variables[dimension][0], dimension, [(dimension, n)])
+                    for dimension, n in maps)
+                declarations.append('    Grid {\n      Array:\n    %s\n      Maps:\n%s    } %s;\n'
+                                    % (_dap_declaration(kind, name, maps), map_declarations, name))
+                data.append(_xdr(kind, value))
+                for axis, dimension in enumerate(dimensions):
+                    index = slices[axis] if slices is not None else (0, 1, value.shape[axis] - 1)
+                    start, stride, stop = index
+                    data.append(_xdr('Int32' if dimension == 'time' else 'Float32',
+                                     variables[dimension][2][start:stop + 1:stride]))
+            else:
+                declarations.append(_dap_declaration(
+                    kind, name, list(zip(dimensions, value.shape))))
+                data.append(_xdr(kind, value))
+        dds = 'Dataset {\n%s} %s;\n' % (''.join(declarations), name)
+        if suffix == 'dds':
+            return _ok(dds, 'text/plain')
+        return _ok(dds.encode('utf-8') + b'\nData:\n' + b''.join(data),
+                   'application/octet-stream')
+
+    def _file(self, method, path, query, body):
+        return 200, {'Content-Type': 'application/octet-stream', 'Accept-Ranges': 'bytes',
+                     'ETag': '"%d"' % len(self.file)}, self.file
+
+
+def _route(path):
+    # the name of the Emulator method answering a path
+    routes = [('/ws/search/granule', 'granule_search'),
+              ('/ws/metadata/granule', 'granule_metadata'),
+              ('/ws/metadata/dataset', 'dataset_metadata'),
+              ('/ws/subset/granule', 'subset_submit'),
+              ('/ws/subset/status', 'subset_status'),
+              ('/ws/results/', 'subset_result'),
+              ('/l2ss-services/l2ss/granule/search', 'l2ss_granule_search'),
+              ('/l2ss-services/l2ss/granule/availability', 'l2ss_availability'),
+              ('/mcc/check', 'mcc_check'),
+              ('/api/file_search', 'file_search'),
+              ('/cgi/getfile/', 'file'),
+              ('/drive/files/', 'file'),
+              ('/opendap/allData/', 'file')]
+    if path.startswith('/opendap/') and path.endswith(('.dds', '.dods')):
+        return 'opendap'
+    for prefix, route in routes:
+        if path.startswith(prefix):
+            return route
+    return 'unknown'
+
+
+def _dap_variables(index):
+    # name -> (DAP type, dimensions, values) of an emulated OPeNDAP granule
+    import numpy as np
+    time_, lat, lon = DAP_SHAPE['time'], DAP_SHAPE['lat'], DAP_SHAPE['lon']
+    i, j = np.meshgrid(np.arange(lat), np.arange(lon), indexing='ij')
+    return {
+        'time': ('Int32', ('time',), np.array([index * 86400], dtype=np.int32)),
+        'lat': ('Float32', ('lat',), np.arange(-89, 90, 2, dtype=np.float32)),
+        'lon': ('Float32', ('lon',), np.arange(-179, 180, 2, dtype=np.float32)),
+        'analysed_sst': ('Float64', ('time', 'lat', 'lon'),
+                         (index * 1e6 + i * 1e3 + j).reshape(time_, lat, lon)),
+        'mask': ('Byte', ('time', 'lat', 'lon'), ((i + j) % 256).reshape(time_, lat, lon)),
+        'sea_ice_fraction': ('Int16', ('time', 'lat', 'lon'),
+                             (i - j).reshape(time_, lat, lon)),
+        'source': ('String', (), np.array('emulated granule %d' % index, dtype=object)),
+    }
+
+
+def _dap_projections(expression, variables):
+    # [(name, [(start, stride, stop), ...] or None)] selected by a constraint
+    names = ['time', 'lat', 'lon', 'analysed_sst', 'mask', 'sea_ice_fraction', 'source']
+    if not expression:
+        return [(name, None) for name in names]
+    projections = []
+    for projection in expression.split(','):
+        name, _, hyperslab = projection.partition('[')
+        kind, dimensions, value = variables[name]
+        if not hyperslab:
+            projections.append((name, None))
+            continue
+        slices = []
+        for item in hyperslab.rstrip(']').split(']['):
+            bounds = [int(bound) for bound in item.split(':')]
+            if len(bounds) == 1:
+                bounds = [bounds[0], 1, bounds[0]]
+            elif len(bounds) == 2:
+                bounds = [bounds[0], 1, bounds[1]]
+            start, stride, stop = bounds
+            if not 0 <= start <= stop < value.shape[len(slices)] or stride < 1:
+                raise IndexError('Invalid hyperslab %s of %s' % (item, name))
+            slices.append((start, stride, stop))
+        if len(slices) != len(dimensions):
+            raise ValueError('%s has %d dimensions' % (name, len(dimensions)))
+        projections.append((name, slices))
+    return projections
+
+
+def _dap_declaration(kind, name, dimensions):
+    shape = ''.join('[%s = %d]' % dimension for dimension in dimensions)
+    return '    %s %s%s;\n' % (kind, name, shape)
+
+
+def _xdr(kind, value):
+    # the XDR encoding of a DAP2 variable, written independently of podaac.opendap
+    import numpy as np
+    if kind == 'String':
+        encoded = value.item().encode('utf-8')
+        return struct.pack('>I', len(encoded)) + encoded + b'\0' * (-len(encoded) % 4)
+    wire = {'Byte': '>u1', 'Int16': '>i4', 'Int32': '>i4', 'Float32': '>f4', 'Float64': '>f8'}
+    data = np.ascontiguousarray(value, dtype=wire[kind]).tobytes()
+    return struct.pack('>II', value.size, value.size) + data + b'\0' * (-len(data) % 4)
+
+
+def _ok(body, content_type):
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    return 200, {'Content-Type': content_type}, body
+
+
+class EmulatorSession(requests.Session):
+    '''A session sending every request to an :class:`Emulator`.'''
+
+    def __init__(self, emulator):
+        super(EmulatorSession, self).__init__()
+        self.emulator = emulator
+
+    def request(self, method, url, **kwargs):
+        return super(EmulatorSession, self).request(method, self.emulator.rewrite(url), **kwargs)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    emulator = None
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_HEAD(self):
+        self._respond('HEAD')
+
+    def do_POST(self):
+        self._respond('POST')
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, method):
+        emulator = self.emulator
+        path, _, query_string = self.path.partition('?')
+        query = dict((key, value[-1]) for key, value in
+                     parse_qs(query_string, keep_blank_values=True).items())
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if emulator.latency:
+            time.sleep(emulator.latency)
+        status, headers, content = emulator.respond(method, path, query, body)
+        content = self._range(status, headers, content)
+        if content is None:
+            return
+        self.send_response(self._status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if method != 'HEAD':
+            self._write(content)
+
+    def _range(self, status, headers, content):
+        # answers 'Range: bytes=start-end' requests on downloadable files
+        self._status = status
+        value = self.headers.get('Range')
+        if status != 200 or not value or 'Accept-Ranges' not in headers:
+            return content
+        start, _, end = value[len('bytes='):].partition('-')
+        start = int(start)
+        end = min(int(end) if end else len(content) - 1, len(content) - 1)
+        if start > end:
+            self.send_response(416)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        self._status = 206
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, len(content))
+        return content[start:end + 1]
+
+    def _write(self, content):
+        bandwidth = self.emulator.bandwidth
+        started = time.time()
+        for offset in range(0, len(content), CHUNK_SIZE):
+            chunk = content[offset:offset + CHUNK_SIZE]
+            if bandwidth:
+                # a chunk leaves once the link could have carried it
+                ahead = (offset + len(chunk)) / float(bandwidth) - (time.time() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+            self.wfile.write(chunk)
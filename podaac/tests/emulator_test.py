@@ -0,0 +1,106 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import download
+from ..l2ss import L2SS
+from ..mcc import MCC
+from ..oceancolor import OceanColor
+from ..podaac import Podaac
+from ..retry import RetryPolicy
+from ..transport import Transport
+from .benchmark import Result, load_history, record, regressions, run
+from .emulator import Emulator
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class TestEmulator(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_clients(self):
+        with Emulator(granules=30, file_size=3 * 1024 * 1024) as emulator:
+            transport = Transport(session=emulator.session())
+            podaac = Podaac(transport=transport)
+            granules = list(podaac.iter_granules(dataset_id='PODAAC-TEST', items_per_page='7'))
+            assert [granule.name for granule in granules] == \
+                ['granule_%05d.nc' % index for index in range(30)]
+            assert '<name>g.nc</name>' in podaac.granule_metadata(dataset_id='PODAAC-TEST',
+                                                                  granule_name='g.nc')
+            result = L2SS(transport=transport).granule_search_all(dataset_id='PODAAC-TEST',
+                                                                  items_per_page='10')
+            assert len(result['response']['docs']) == 30
+            assert json.loads(MCC(transport=transport).check_remote_file(
+                'ACDD', 'https://podaac.jpl.nasa.gov/x.nc'))['ACDD']['score'] == 1.0
+            assert OceanColor(transport=transport).file_search(
+                sensor='aqua', search='*', add_url=1).startswith(
+                    'https://oceandata.sci.gsfc.nasa.gov/cgi/getfile/A2017001')
+
+            path = os.path.join(self.path, 'granule.nc')
+            download.fetch(transport, 'https://podaac-tools.jpl.nasa.gov/drive/files/allData/'
+                           'granule.nc', path, segments=4, min_segment_size=1024)
+            with open(path, 'rb') as f:
+                assert f.read() == emulator.file
+            assert emulator.hits['file'] == 5
+
+            name = podaac.granule_subset(os.path.join(os.path.dirname(__file__), 'test.json'),
+                                         path=self.path)
+            assert name.startswith('subsetted-ascat_20160409')
+
+    def test_error_injection(self):
+        policy = RetryPolicy(max_retries=10, backoff_factor=0)
+        with Emulator(error_rate=0.3, retry_after=0, seed=1) as emulator:
+            podaac = Podaac(transport=Transport(session=emulator.session(), retry=policy))
+            for index in range(40):
+                podaac.granule_metadata(dataset_id='PODAAC-TEST', granule_name='g_%d.nc' % index)
+
+        assert emulator.errors > 0
+        assert policy.metrics()['retries'] == emulator.errors
+        assert policy.metrics()['reasons'] == {503: emulator.errors}
+
+    def test_latency_and_bandwidth(self):
+        with Emulator(latency=0.05, bandwidth=1024 * 1024, file_size=256 * 1024) as emulator:
+            transport = Transport(session=emulator.session())
+            started = time.time()
+            transport.get('https://podaac.jpl.nasa.gov/ws/metadata/dataset/?datasetId=X')
+            assert time.time() - started >= 0.05
+            started = time.time()
+            transport.get('https://podaac-tools.jpl.nasa.gov/drive/files/allData/x.nc')
+            assert time.time() - started >= 0.25
+
+    def test_benchmark_history(self):
+        results = run(['parse_throughput'], repeat=1, quick=True)
+        assert [result.name for result in results] == ['parse_throughput']
+        assert results[0].value > 0
+
+        history = os.path.join(self.path, 'benchmarks.jsonl')
+        for value in (100, 110, 90):
+            record(history, [Result('requests_per_second', value, 'requests/s', True),
+                             Result('subset_turnaround', 1.0, 's', False)])
+        assert len(load_history(history)) == 3
+        found = regressions([Result('requests_per_second', 70, 'requests/s', True),
+                             Result('subset_turnaround', 1.1, 's', False)],
+                            load_history(history), tolerance=0.2)
+        assert [regression.name for regression in found] == ['requests_per_second']
+        assert abs(found[0].change - 0.3) < 1e-9
+        found = regressions([Result('subset_turnaround', 1.5, 's', False)], load_history(history))
+        assert [regression.name for regression in found] == ['subset_turnaround']
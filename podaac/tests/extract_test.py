@@ -0,0 +1,118 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..extract import extract_stream, fetch_zip
+from ..transport import Transport
+from .stub import StubSession
+from io import BytesIO
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+MEMBERS = [('granule_1.nc', os.urandom(3000) * 4), ('nested/granule_2.nc', b'x' * 50000),
+           ('granule_3.nc', b'')]
+
+
+class Unseekable:
+    '''A write-only file, which makes zipfile follow members with a data descriptor.'''
+
+    def __init__(self):
+        self.buffer = BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+
+def archive(compression=zipfile.ZIP_DEFLATED, seekable=True, members=MEMBERS):
+    target = BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(target, 'w', compression) as zip_file:
+        for name, data in members:
+            zip_file.writestr(name, data)
+    return (target if seekable else target.buffer).getvalue()
+
+
+def chunked(data, size=777):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestExtract(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_extract_stream(self):
+        for compression in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+            for seekable in (True, False):
+                if compression == zipfile.ZIP_STORED and not seekable:
+                    continue
+                directory = os.path.join(self.path, '%d-%s' % (compression, seekable))
+                paths = extract_stream(chunked(archive(compression, seekable)), directory)
+
+                assert paths == [os.path.join(directory, *name.split('/')) for name, _ in MEMBERS]
+                assert [self.read(p) for p in paths] == [data for _, data in MEMBERS]
+                assert not any(f.endswith('.part') for _, _, files in os.walk(directory)
+                               for f in files)
+
+    def test_selected_members(self):
+        paths = extract_stream(chunked(archive()), self.path, members=['granule_3.nc'])
+
+        assert paths == [os.path.join(self.path, 'granule_3.nc')]
+        assert os.listdir(self.path) == ['granule_3.nc']
+
+    def test_member_names_cannot_escape_the_directory(self):
+        data = archive(members=[('../../evil.nc', b'evil'), ('/abs.nc', b'abs')])
+        paths = extract_stream(chunked(data), self.path)
+
+        assert paths == [os.path.join(self.path, 'evil.nc'), os.path.join(self.path, 'abs.nc')]
+
+    def test_corrupt_member(self):
+        data = bytearray(archive(zipfile.ZIP_STORED, members=[('a.nc', b'a' * 100)]))
+        data[60] ^= 0xff
+        with self.assertRaises(IOError):
+            extract_stream(chunked(bytes(data)), self.path)
+        assert os.listdir(self.path) == []
+
+    def test_truncated_archive(self):
+        data = archive(zipfile.ZIP_STORED)
+        for size in (20, 2000, len(MEMBERS[0][1]) + 50):
+            with self.assertRaises(IOError):
+                extract_stream(chunked(data[:size]), self.path)
+            assert not any(f.endswith('.part') for f in os.listdir(self.path))
+
+    def test_fetch_zip(self):
+        stored = archive(zipfile.ZIP_STORED, seekable=False)
+        session = StubSession(lambda method, url, kwargs: stored)
+        transport = Transport(session=session)
+        url = 'https://podaac.jpl.nasa.gov/ws/results/job.zip'
+
+        with self.assertRaises(ValueError):
+            fetch_zip(transport, url, self.path)
+        paths = fetch_zip(transport, url, self.path, members=['nested/granule_2.nc'],
+                          spool_size=1024)
+
+        assert paths == [os.path.join(self.path, 'nested', 'granule_2.nc')]
+        assert self.read(paths[0]) == MEMBERS[1][1]
+        assert session.calls[0][2]['stream'] is True
@@ -0,0 +1,73 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .benchmark import IMPORT_BUDGETS, measure_import
+import json
+import subprocess
+import sys
+import unittest
+
+
+def loaded(statement):
+    # the modules a fresh interpreter has loaded after running `statement`
+    output = subprocess.check_output([sys.executable, '-c', statement + '\n'
+                                      'import json, sys\n'
+                                      'print(json.dumps(sorted(sys.modules)))'])
+    return set(json.loads(output.decode('utf-8')))
+
+
+# the package imports its clients eagerly before Python 3.7
+EAGER = sys.version_info < (3, 7)
+
+
+class TestImports(unittest.TestCase):
+
+    @unittest.skipIf(EAGER, 'the package imports its clients eagerly')
+    def test_package_is_lazy(self):
+        modules = loaded('import podaac')
+        self.assertNotIn('requests', modules)
+        self.assertNotIn('bs4', modules)
+        self.assertFalse([module for module in modules if module.startswith('podaac.')])
+
+        modules = loaded('import podaac\nclient = podaac.Podaac()')
+        self.assertIn('podaac.podaac', modules)
+        self.assertIn('requests', modules)
+        self.assertNotIn('podaac.aio', modules)
+
+    @unittest.skipIf(EAGER, 'the package imports its clients eagerly')
+    def test_utils_defer_heavy_dependencies(self):
+        modules = loaded('import podaac.podaac_utils')
+        for module in ('bs4', 'requests', 'future', 'podaac.podaac'):
+            self.assertNotIn(module, modules)
+
+    @unittest.skipIf(EAGER, 'the package imports its clients eagerly')
+    def test_clients_defer_optional_dependencies(self):
+        modules = loaded('import podaac.podaac')
+        for module in ('bs4', 'numpy', 'asyncio', 'podaac.aio', 'podaac.opendap'):
+            self.assertNotIn(module, modules)
+
+        modules = loaded('import podaac.transport')
+        self.assertNotIn('requests', modules)
+
+    def test_import_budget(self):
+        for module, budget in sorted(IMPORT_BUDGETS.items()):
+            if EAGER:
+                budget = max(budget, IMPORT_BUDGETS['podaac.podaac'])
+            # the best of a few runs, so that a busy machine is not a failure
+            seconds = min(measure_import(module) for _ in range(5))
+            self.assertLess(seconds, budget, '%s took %.3fs to import' % (module, seconds))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..inventory import GranuleInventory, to_epoch, to_iso
+from ..podaac import Podaac
+from ..records import Granule
+from ..transport import Transport
+from .stub import ENTRY, FEED, StubSession, query_value
+from future.moves.urllib.parse import unquote
+from nose.tools import assert_raises
+import os
+import shutil
+import tempfile
+import unittest
+
+EPOCH = to_epoch('2018-01-01T00:00:00Z')
+RSS = '<rss version="2.0"><channel><title>Datacasting</title>%s</channel></rss>'
+
+
+class CatalogServer:
+    '''Simulates granule search and the Datacasting feed over a dataset \
+    of `size` one hour long granules starting on 2018-01-01. Searches \
+    return the granules overlapping the requested window; the feed lists \
+    the `recent` last granules.'''
+
+    def __init__(self, size, recent=2):
+        self.size = size
+        self.recent = recent
+        self.searches = []
+
+    def entry(self, index):
+        return ENTRY % {'name': 'granule_%05d.nc' % index, 'dataset_id': 'PODAAC-TEST',
+                        'box': '%d %d %d %d' % (0, index % 50, 10, index % 50 + 5),
+                        'start': to_iso(EPOCH + index * 3600),
+                        'end': to_iso(EPOCH + index * 3600 + 3599)}
+
+    def __call__(self, method, url, kwargs):
+        if 'format=datacasting' in url:
+            items = ''.join('<item><title>granule_%05d.nc</title></item>' % index
+                            for index in range(max(0, self.size - self.recent), self.size))
+            return RSS % items
+        start = to_epoch(unquote(query_value(url, 'startTime')))
+        end = to_epoch(unquote(query_value(url, 'endTime')))
+        self.searches.append((start, end))
+        indexes = [i for i in range(self.size)
+                   if EPOCH + i * 3600 + 3599 >= start and EPOCH + i * 3600 <= end]
+        start_index = int(query_value(url, 'startIndex', '0'))
+        items_per_page = int(query_value(url, 'itemsPerPage'))
+        page = indexes[start_index:start_index + items_per_page]
+        return FEED % (len(indexes), start_index, items_per_page,
+                       ''.join(self.entry(i) for i in page))
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'inventory', 'granules.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_times(self):
+        assert to_epoch('2018-01-01T00:00:00Z') == 1514764800
+        assert to_epoch('2018-01-01T00:00:00.500Z') == 1514764800.5
+        assert to_epoch('2018-01-01') == 1514764800
+        assert to_epoch('') is None
+        assert to_iso(1514764800) == '2018-01-01T00:00:00Z'
+
+    def test_incremental_sync(self):
+        server = CatalogServer(size=900)
+        podaac = Podaac(transport=Transport(session=StubSession(server)))
+        inventory = GranuleInventory(self.path)
+        assert_raises(ValueError, inventory.sync, podaac, 'PODAAC-TEST')
+
+        end = to_iso(EPOCH + 900 * 3600)
+        assert inventory.sync(podaac, 'PODAAC-TEST', start_time='2018-01-01T00:00:00Z',
+                              end_time=end) == 900
+        assert inventory.synced_until('PODAAC-TEST') == to_iso(EPOCH + 899 * 3600 + 3599)
+
+        server.size = 910
+        stored = inventory.sync(podaac, 'PODAAC-TEST', end_time=to_iso(EPOCH + 910 * 3600),
+                                overlap=3600)
+        assert stored == 12
+        assert server.searches[-1][0] == EPOCH + 898 * 3600 + 3599
+        assert inventory.count('PODAAC-TEST') == inventory.count() == 910
+
+        # the Datacasting feed holds nothing new: no search is made
+        searches = len(server.searches)
+        assert inventory.sync(podaac, 'PODAAC-TEST') == 0
+        assert len(server.searches) == searches
+        server.size = 911
+        assert inventory.sync(podaac, 'PODAAC-TEST') == 3
+        assert len(server.searches) == searches + 1
+        inventory.close()
+
+        inventory = GranuleInventory(self.path)
+        assert inventory.count('PODAAC-TEST') == 911
+        inventory.clear('PODAAC-TEST')
+        assert inventory.count() == 0 and inventory.synced_until('PODAAC-TEST') is None
+
+    def test_queries(self):
+        server = CatalogServer(size=200)
+        podaac = Podaac(transport=Transport(session=StubSession(server)))
+        inventory = GranuleInventory(':memory:')
+        inventory.sync(podaac, 'PODAAC-TEST', start_time='2018-01-01T00:00:00Z',
+                       end_time='2018-01-31T00:00:00Z')
+
+        found = inventory.granules('PODAAC-TEST', start_time='2018-01-02T00:30:00Z',
+                                   end_time='2018-01-02T03:00:00Z')
+        assert [g.name for g in found] == ['granule_%05d.nc' % i for i in range(24, 28)]
+        assert found[0].box == (0.0, 24.0, 10.0, 29.0)
+        assert found[0].opendap_url.endswith('granule_00024.nc.html')
+        assert found[0].links[0][0] == 'OPeNDAP URL'
+
+        found = inventory.granules('PODAAC-TEST', bbox='0,0,2,10')
+        assert sorted(set(int(g.name[8:13]) % 50 for g in found)) == [0, 1, 2]
+        found = inventory.granules('PODAAC-TEST', start_time='2018-01-01T00:00:00Z',
+                                   end_time='2018-01-03T00:00:00Z', bbox=(0, 0, 2, 10))
+        assert [g.name for g in found] == ['granule_00000.nc', 'granule_00001.nc',
+                                           'granule_00002.nc']
+        assert inventory.granules('OTHER') == []
+
+    def test_antimeridian(self):
+        def granule(name, box):
+            return Granule(name, 'PODAAC-TEST', 'TEST', '2018-01-01T00:00:00Z',
+                           '2018-01-01T01:00:00Z', '', '', '', '', box, ())
+        inventory = GranuleInventory(':memory:')
+        # boxes are (south, west, north, east); 185..200 is -175..-160 in 0..360 longitudes
+        inventory.add([granule('crossing', (0, 170, 10, -170)), granule('east', (0, 185, 10, 200)),
+                       granule('far', (0, 10, 10, 20))])
+
+        def names(bbox):
+            return sorted(g.name for g in inventory.granules('PODAAC-TEST', bbox=bbox))
+        assert names('175,0,-175,5') == ['crossing', 'east']
+        assert names('-178,0,-176,5') == ['crossing']
+        assert names('-179,0,179,5') == ['crossing', 'east', 'far']
+        assert names('350,0,15,5') == ['far']
+        assert names('-160,20,-150,30') == []
@@ -0,0 +1,97 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..cache import ResponseCache
+from ..metrics import MetricsRegistry
+from ..podaac import Podaac
+from ..retry import RetryPolicy
+from ..transport import Transport
+from .stub import StubSession, granule_feed
+import requests
+import unittest
+
+
+def server():
+    answers = {'metadata': 0}
+
+    def handler(method, url, kwargs):
+        if 'search/granule' in url:
+            return granule_feed(3, 0, 3)
+        if 'metadata/granule' in url:
+            answers['metadata'] += 1
+            if answers['metadata'] == 1:
+                return 503, 'Busy'
+            return '<metadata/>'
+        if 'missing' in url:
+            raise requests.exceptions.ConnectionError('refused')
+        return 200, b'0123456789', {'Content-Length': '10'}
+    return StubSession(handler)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_label(self):
+        metrics = MetricsRegistry()
+        assert metrics.label('https://x.org/ws/metadata/granule/?a=1', 'granule_metadata') == \
+            'granule_metadata'
+        assert metrics.label('https://PODAAC.jpl.nasa.gov/ws/search/granule/?a=1') == \
+            'podaac.jpl.nasa.gov/ws/search/granule'
+        assert metrics.label('https://podaac-tools.jpl.nasa.gov/drive/files/allData/ghrsst/'
+                             'data/x.nc') == 'podaac-tools.jpl.nasa.gov/drive/files/allData/ghrsst'
+        assert metrics.label('https://oceandata.sci.gsfc.nasa.gov/cgi/getfile/A2017.nc') == \
+            'oceandata.sci.gsfc.nasa.gov/cgi/getfile'
+
+    def test_transport_metrics(self):
+        metrics = MetricsRegistry(buckets=(0.5, 60))
+        events = []
+        metrics.add_hook(events.append)
+        transport = Transport(session=server(), cache=ResponseCache(':memory:'), metrics=metrics,
+                              retry=RetryPolicy(backoff_factor=0))
+        podaac = Podaac(transport=transport)
+        for _ in range(2):
+            podaac.granule_metadata(dataset_id='PODAAC-TEST', granule_name='g.nc')
+        assert len(podaac.granule_search(dataset_id='PODAAC-TEST', parse=True)) == 3
+        transport.get('https://podaac-tools.jpl.nasa.gov/drive/files/allData/g.nc', stream=True)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            transport.get('https://podaac.jpl.nasa.gov/missing', data=b'abc')
+
+        snapshot = metrics.as_dict()
+        granule = snapshot['granule_metadata']
+        assert granule['requests'] == 2 and granule['statuses'] == {200: 2}
+        assert granule['retries'] == 1 and granule['cache_hits'] == 1
+        assert granule['latency']['count'] == 1 and granule['latency']['buckets'][60] == 1
+        assert granule['bytes_received'] == 2 * len('<metadata/>')
+        search = snapshot['podaac.jpl.nasa.gov/ws/search/granule']
+        assert search['requests'] == 1 and search['bytes_received'] > 0
+        assert snapshot['granule_search']['parse']['count'] == 1
+        assert snapshot['podaac-tools.jpl.nasa.gov/drive/files/allData']['bytes_received'] == 10
+        missing = snapshot['podaac.jpl.nasa.gov/missing']
+        assert missing['errors'] == 1 and missing['bytes_sent'] == 3
+
+        assert [event.kind for event in events] == ['request'] * 3 + ['parse'] + ['request'] * 2
+        assert events[1].cached and events[0].retries == 1
+        assert isinstance(events[-1].error, requests.exceptions.ConnectionError)
+
+        text = metrics.to_prometheus()
+        assert '# TYPE podaac_requests_total counter' in text
+        assert 'podaac_requests_total{endpoint="granule_metadata",status="200"} 2' in text
+        assert 'podaac_requests_total{endpoint="podaac.jpl.nasa.gov/missing",status="error"} 1' \
+            in text
+        assert 'podaac_retries_total{endpoint="granule_metadata"} 1' in text
+        assert 'podaac_request_duration_seconds_bucket{endpoint="granule_metadata",le="+Inf"} 1' \
+            in text
+        assert 'podaac_parse_duration_seconds_count{endpoint="granule_search"} 1' in text
+
+        metrics.reset()
+        assert metrics.as_dict() == {}
@@ -0,0 +1,206 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..metrics import MetricsRegistry
+from ..podaac import Podaac
+from ..transport import Transport
+from .emulator import Emulator
+from nose.tools import assert_raises
+from future.moves.urllib.parse import parse_qs, unquote, urlsplit
+import struct
+import unittest
+
+try:
+    import numpy as np
+    from .. import opendap
+    from ..opendap import DAPError, Declaration
+except ImportError:  # optional dependency
+    np = None
+
+URL = 'https://podaac-opendap.jpl.nasa.gov/opendap/allData/granule_00007.nc.html'
+
+DDS = '''Dataset {
+    Int32 time[time = 1];
+    GRID {
+      ARRAY:
+        Int16 sst[time = 1][lat = 2][lon = 3];
+      MAPS:
+        Int32 time[time = 1];
+        Float32 lat[lat = 2];
+        Float32 lon[lon = 3];
+    } sst;
+    Structure {
+        Byte flag;
+        String name;
+        Byte bits[5];
+    } info;
+} test.nc;
+'''
+
+
+def dap_server(emulator):
+    '''A stub handler answering OPeNDAP requests as `emulator` does.'''
+    def handler(method, url, kwargs):
+        parts = urlsplit(url)
+        query = dict((key, value[-1]) for key, value in
+                     parse_qs(unquote(parts.query), keep_blank_values=True).items())
+        status, headers, content = emulator.respond(method, parts.path, query, b'')
+        return status, content, headers
+    return handler
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestOpendap(unittest.TestCase):
+
+    def test_constraint(self):
+        assert opendap.constraint() == ''
+        assert opendap.constraint('sst') == 'sst'
+        assert opendap.constraint(['sst', 'lat'], np.s_[0, 10:20:3, 5]) == \
+            'sst[0][10:3:19][5],lat[0][10:3:19][5]'
+        assert opendap.constraint(['sst', 'lat'], {'sst': np.s_[0, 0:2, 0:3], 'lat': 1}) == \
+            'sst[0][0:1:1][0:1:2],lat[1]'
+        # open and negative bounds resolve against the shape, missing dimensions are whole
+        assert opendap.hyperslab(np.s_[-1, ::2], (4, 10, 3)) == '[3][0:2:8][0:1:2]'
+        assert opendap.needs_shapes('sst', np.s_[0, 10:])
+        assert opendap.needs_shapes(['sst'], {'sst': -1})
+        assert not opendap.needs_shapes('sst', np.s_[0, 10:20])
+        assert_raises(ValueError, opendap.hyperslab, np.s_[0, 10:])
+        assert_raises(ValueError, opendap.hyperslab, np.s_[0:10:-1])
+        assert_raises(IndexError, opendap.hyperslab, np.s_[5:5])
+        assert_raises(IndexError, opendap.hyperslab, np.s_[4], (4,))
+        assert opendap.request_url(URL, 'sst', np.s_[0, 1:3]) == \
+            URL[:-len('.html')] + '.dods?sst%5B0%5D%5B1:1:2%5D'
+
+    def test_parse_dds(self):
+        time, sst, info = opendap.parse_dds(DDS)
+
+        assert time == Declaration('time', 'Int32', (('time', 1),), ())
+        assert sst.type == 'Grid' and [member.name for member in sst.members] == \
+            ['sst', 'time', 'lat', 'lon']
+        assert sst.members[0].dimensions == (('time', 1), ('lat', 2), ('lon', 3))
+        assert info.members[2] == Declaration('bits', 'Byte', ((None, 5),), ())
+        assert opendap.shapes([time, sst, info]) == {
+            'time': (1,), 'sst': (1, 2, 3), 'lat': (2,), 'lon': (3,),
+            'info.flag': (), 'info.name': (), 'info.bits': (5,)}
+        assert_raises(ValueError, opendap.parse_dds, 'Dataset { Int64 x; } test.nc;')
+        assert_raises(ValueError, opendap.parse_dds, 'Dataset { Int32 x }')
+
+    def test_decode(self):
+        def array(values, wire):
+            data = np.asarray(values, dtype=wire).tobytes()
+            return struct.pack('>II', len(values), len(values)) + data + \
+                b'\0' * (-len(data) % 4)
+        content = DDS.encode('utf-8') + b'\nData:\n' + b''.join([
+            array([86400], '>i4'),
+            array([-2, -1, 0, 1, 2, 32767], '>i4'),
+            array([86400], '>i4'), array([-1.5, 1.5], '>f4'), array([0, 120, 240], '>f4'),
+            struct.pack('>I', 255), struct.pack('>I', 2) + b'ok\0\0', array([1, 2, 3, 4, 5], 'u1')])
+        arrays = opendap.decode(content)
+
+        assert list(arrays) == ['time', 'sst', 'lat', 'lon', 'info.flag', 'info.name',
+                                'info.bits']
+        assert arrays['sst'].dtype == np.dtype('>i2') and arrays['sst'].shape == (1, 2, 3)
+        assert arrays['sst'].tolist() == [[[-2, -1, 0], [1, 2, 32767]]]
+        assert arrays['lat'].tolist() == [-1.5, 1.5]
+        assert arrays['info.flag'] == 255 and arrays['info.flag'].dtype == np.uint8
+        assert arrays['info.name'] == 'ok'
+        assert arrays['info.bits'].tolist() == [1, 2, 3, 4, 5]
+        # values are read-only views of the response, not copies
+        buffer = np.frombuffer(content, np.uint8)
+        assert np.shares_memory(arrays['lon'], buffer) and not arrays['lon'].flags.writeable
+        assert_raises(ValueError, opendap.decode, content[:-4])
+        assert_raises(ValueError, opendap.decode, content + b'\0\0\0\0')
+
+        error = b'Error {\n    code = 1001;\n    message = "No such variable: \\"sst\\"";\n};\n'
+        with assert_raises(DAPError) as raised:
+            opendap.decode(error)
+        assert 'No such variable' in str(raised.exception)
+
+    def test_granule_opendap(self):
+        with Emulator() as emulator:
+            transport = Transport(session=emulator.session(), metrics=MetricsRegistry())
+            podaac = Podaac(transport=transport)
+            whole = podaac.granule_opendap(URL)
+            sliced = podaac.granule_opendap(URL, ['analysed_sst', 'sea_ice_fraction'],
+                                            np.s_[0, 10:20:3, -5:])
+
+            assert list(whole) == ['time', 'lat', 'lon', 'analysed_sst', 'mask',
+                                   'sea_ice_fraction', 'source']
+            assert whole['analysed_sst'][0, 12, 34] == 7012034
+            assert whole['source'] == 'emulated granule 7'
+            assert list(sliced) == ['analysed_sst', 'time', 'lat', 'lon', 'sea_ice_fraction']
+            assert np.array_equal(sliced['analysed_sst'], whole['analysed_sst'][:, 10:20:3, -5:])
+            assert np.array_equal(sliced['sea_ice_fraction'],
+                                  whole['sea_ice_fraction'][:, 10:20:3, -5:])
+            assert sliced['lon'].tolist() == [171, 173, 175, 177, 179]
+            # the open slice was resolved with one .dds request
+            assert emulator.hits['opendap'] == 3
+
+            metrics = transport.metrics.as_dict()['granule_opendap']
+            assert metrics['parse']['count'] == 3
+            # only the hyperslab is sent, not the granule
+            assert opendap.fetch(transport, URL, 'analysed_sst', np.s_[0, 0:2, 0:2])[
+                'analysed_sst'].tolist() == [[[7000000, 7000001], [7001000, 7001001]]]
+            assert transport.metrics.as_dict()['opendap']['bytes_received'] < 1024
+
+            with assert_raises(DAPError) as raised:
+                podaac.granule_opendap(URL, 'sst')
+            assert str(raised.exception) == 'No such variable: sst'
+
+    def test_bbox_window(self):
+        lat, lon = np.arange(-89, 90, 2.0), np.arange(-179, 180, 2.0)
+        assert opendap.bbox_window(lat, lon, '-10,-20,10,20') == (slice(35, 55), slice(85, 95))
+        # descending latitudes and longitudes from 0 to 360
+        assert opendap.bbox_window(lat[::-1], np.arange(1, 360, 2.0), (-170, 0, -160, 4)) == \
+            (slice(43, 45), slice(95, 100))
+        assert_raises(ValueError, opendap.bbox_window, lat, lon, '170,0,-170,10')
+        assert_raises(ValueError, opendap.bbox_window, lat, lon, '0.5,0.5,0.6,0.6')
+
+    def test_aggregate(self):
+        urls = [URL.replace('00007', '%05d' % index) for index in range(12)]
+        urls[0] = URL.replace('granule_00007', 'missing')
+        urls[5] = URL.replace('granule_00007', 'missing_too')
+        done = []
+        with Emulator() as emulator:
+            podaac = Podaac(transport=Transport(session=emulator.session()))
+            result = podaac.granule_opendap_all(urls, 'analysed_sst', bbox='-10,-20,10,20',
+                                                max_workers=4,
+                                                callback=lambda url, error: done.append(url))
+
+            assert result.values.shape == (12, 20, 10) and result.values.dtype == np.float64
+            assert sorted(result.errors) == sorted([urls[0], urls[5]])
+            assert sorted(done) == sorted(urls)
+            assert np.isnan(result.values[0]).all() and np.isnan(result.values[5]).all()
+            assert result.values[3, 0, 0] == 3 * 1e6 + 35 * 1e3 + 85
+            assert result.coordinates['lat'].tolist() == list(range(-19, 20, 2))
+            assert result.coordinates['lon'].tolist() == list(range(-9, 10, 2))
+            assert result.coordinates['time'][1:5].tolist() == [86400, 172800, 259200, 345600]
+            # the first granule which answers is described, then one slab is read per granule
+            assert emulator.hits['opendap'] == 1 + 2 + 11
+
+            out = np.zeros((11, 2, 3), dtype=np.int32)
+            result = opendap.aggregate(podaac.transport, urls[1:], 'sea_ice_fraction',
+                                       np.s_[0, 1:5:2, -3:], out=out, fill_value=-1)
+            assert result.values is out
+            assert out[:, 0, 0].tolist() == [1 - 177] * 4 + [-1] + [1 - 177] * 6
+            assert result.coordinates == {}
+
+            assert_raises(ValueError, opendap.aggregate, podaac.transport, urls[1:], 'sst')
+            assert_raises(ValueError, opendap.aggregate, podaac.transport, urls[1:],
+                          'analysed_sst', out=out)
+            assert_raises(ValueError, opendap.aggregate, podaac.transport, [], 'analysed_sst')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..paging import fetch_remaining_pages
+from ..podaac import Podaac
+from ..l2ss import L2SS
+from ..records import Dataset
+from ..transport import Transport
+from .stub import StubSession, granule_feed, query_value
+import json
+import threading
+import time
+import unittest
+
+
+def atom_search(total_results):
+    def handler(method, url, kwargs):
+        start_index = int(query_value(url, 'startIndex', '0'))
+        items_per_page = int(query_value(url, 'itemsPerPage'))
+        return granule_feed(total_results, start_index, items_per_page)
+    return StubSession(handler)
+
+
+class TestPaging(unittest.TestCase):
+
+    def test_fetch_remaining_pages_is_concurrent_and_ordered(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def fetch_page(start_index):
+            with lock:
+                active.append(start_index)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(start_index)
+            return start_index
+
+        pages = fetch_remaining_pages(fetch_page, 95, 0, 10, max_workers=3)
+
+        assert pages == [10, 20, 30, 40, 50, 60, 70, 80, 90]
+        assert max(peak) == 3
+        assert fetch_remaining_pages(fetch_page, 10, 0, 10) == []
+
+    def test_granule_search_all(self):
+        session = atom_search(25)
+        podaac = Podaac(transport=Transport(session=session))
+        granules = podaac.granule_search_all(dataset_id='PODAAC-TEST', items_per_page='10')
+
+        assert [granule.name for granule in granules] == ['granule_%05d.nc' % i for i in range(25)]
+        assert granules.total_results == 25 and granules.text is None
+        assert sorted(query_value(url, 'startIndex') for _, url, _ in session.calls) == \
+            ['0', '10', '20']
+
+    def test_dataset_search_all(self):
+        session = atom_search(7)
+        podaac = Podaac(transport=Transport(session=session))
+        datasets = podaac.dataset_search_all(process_level='4', items_per_page='3')
+
+        assert len(datasets) == 7 and all(isinstance(d, Dataset) for d in datasets)
+        assert len(session.calls) == 3
+        assert all('processLevel=4' in url for _, url, _ in session.calls)
+
+    def test_l2ss_granule_search_all(self):
+        def handler(method, url, kwargs):
+            start_index = int(query_value(url, 'startIndex'))
+            items_per_page = int(query_value(url, 'itemsPerPage'))
+            docs = [{'Granule-Name': 'granule_%d' % i}
+                    for i in range(start_index, min(start_index + items_per_page, 12))]
+            return json.dumps({'response': {'numFound': 12, 'docs': docs}})
+        l2ss = L2SS(transport=Transport(session=StubSession(handler)))
+        result = l2ss.granule_search_all(dataset_id='PODAAC-TEST', items_per_page='5')
+
+        assert [doc['Granule-Name'] for doc in result['response']['docs']] == \
+            ['granule_%d' % i for i in range(12)]
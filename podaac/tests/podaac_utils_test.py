@@ -0,0 +1,115 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..podaac_utils import PodaacUtils
+from ..transport import Transport
+from .stub import ENTRY, FEED, StubSession, fixture, query_value
+import json
+import threading
+import unittest
+
+DATASETS = [('PODAAC-A', 'A_L2'), ('PODAAC-B', 'B_L4'), ('PODAAC-C', 'C_L3')]
+
+DATASET_ENTRY = ('<entry><title>%s</title><podaac:datasetId>%s</podaac:datasetId>'
+                 '<podaac:shortName>%s</podaac:shortName></entry>')
+
+EXTRACT_PAGE = ('<html><body><table id="tblDataset">'
+                '<tr><th>Dataset ID</th><th>Short Name</th></tr>'
+                '<tr><td>PODAAC-B</td><td>B_L4</td></tr></table></body></html>')
+
+
+def catalog_server():
+    def handler(method, url, kwargs):
+        if url.endswith('/l2ssIngest/datasets'):
+            return json.dumps({'datasets': [{'persistentId': 'PODAAC-A', 'shortName': 'A_L2'}]})
+        if 'extract/granule/index.html' in url:
+            return EXTRACT_PAGE
+        datasets = DATASETS
+        if query_value(url, 'processLevel') == '4':
+            datasets = DATASETS[1:2]
+        entries = ''.join(DATASET_ENTRY % (short_name, dataset_id, short_name)
+                          for dataset_id, short_name in datasets)
+        return FEED % (len(datasets), 0, 400, entries)
+    return StubSession(handler)
+
+
+class TestPodaacUtils(unittest.TestCase):
+
+    def test_listings_share_one_catalog_fetch(self):
+        session = catalog_server()
+        utils = PodaacUtils(transport=Transport(session=session))
+
+        assert utils.list_all_available_granule_search_dataset_ids() == ['PODAAC-B', 'PODAAC-C']
+        assert utils.list_all_available_granule_search_dataset_short_names() == ['B_L4', 'C_L3']
+        assert utils.list_available_granule_search_level2_dataset_ids() == ['PODAAC-A']
+        assert utils.list_level4_dataset_ids() == ['PODAAC-B']
+        assert utils.list_level4_dataset_short_names() == ['B_L4']
+        assert utils.list_all_available_extract_granule_dataset_ids() == [b'PODAAC-B']
+        assert utils.list_all_available_extract_granule_dataset_short_names() == [b'B_L4']
+        assert len(session.calls) == 4
+
+    def test_catalog_expires_and_refreshes(self):
+        session = catalog_server()
+        utils = PodaacUtils(transport=Transport(session=session), catalog_max_age=60)
+        utils.list_level4_dataset_ids()
+        utils.list_level4_dataset_short_names()
+        assert len(session.calls) == 1
+
+        utils.refresh_catalog()
+        utils.list_level4_dataset_ids()
+        assert len(session.calls) == 2
+
+        fetched, datasets = utils.catalog._parts['level4']
+        utils.catalog._parts['level4'] = (fetched - 61, datasets)
+        utils.list_level4_dataset_short_names()
+        assert len(session.calls) == 3
+
+    def test_slow_listing_does_not_block_the_others(self):
+        level2_requested, extract_done = threading.Event(), threading.Event()
+        serve = catalog_server().handler
+
+        def handler(method, url, kwargs):
+            if url.endswith('/l2ssIngest/datasets'):
+                level2_requested.set()
+                extract_done.wait(5)
+            return serve(method, url, kwargs)
+        utils = PodaacUtils(transport=Transport(session=StubSession(handler)))
+        level2 = []
+        thread = threading.Thread(target=lambda: level2.append(
+            utils.list_available_granule_search_level2_dataset_ids()))
+        thread.start()
+        level2_requested.wait(5)
+        assert utils.list_all_available_extract_granule_dataset_ids() == [b'PODAAC-B']
+        assert thread.is_alive()
+        extract_done.set()
+        thread.join()
+        assert level2 == [['PODAAC-A']]
+
+    def test_mine_granules_from_granule_search(self):
+        entry = ENTRY % {'name': 'MUR SST 2018-01-01', 'dataset_id': 'PODAAC-TEST',
+                         'box': '-90 -180 90 180', 'start': '', 'end': ''}
+        response = FEED % (1, 0, 1, entry)
+
+        assert PodaacUtils().mine_granules_from_granule_search(response) == ['MUR SST 2018-01-01']
+        assert len(PodaacUtils().mine_granules_from_granule_search(
+            fixture('granule_search.xml'))) == 6
+
+    def test_mine_opendap_urls_from_granule_search(self):
+        urls = PodaacUtils.mine_opendap_urls_from_granule_search(fixture('granule_search.xml'))
+
+        assert len(urls) == 6
+        assert urls[0] == ('https://podaac-opendap.jpl.nasa.gov/opendap/allData/ascat/preview/L2/'
+                           'metop_a/coastal_opt/2018/256/'
+                           'ascat_20180913_020000_metopa_61749_eps_o_coa_2401_ovw.l2.nc.gz.html')
+        assert PodaacUtils.mine_opendap_urls_from_granule_search() == []
@@ -0,0 +1,70 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..l2ss import L2SS
+from ..polling import PollingStrategy, PollingTimeout
+from ..transport import Transport
+from .stub import StubSession
+from nose.tools import assert_raises
+import json
+import unittest
+
+
+def job(*states):
+    states = list(states)
+    return lambda: {'status': states.pop(0) if len(states) > 1 else states[0]}
+
+
+class TestPolling(unittest.TestCase):
+
+    def test_delay_backs_off_to_the_maximum(self):
+        polling = PollingStrategy(initial_interval=1, max_interval=10, backoff=2, jitter=0)
+        assert [polling.delay(attempt) for attempt in range(6)] == [1, 2, 4, 8, 10, 10]
+
+        polling = PollingStrategy(initial_interval=4, jitter=0.25)
+        for _ in range(100):
+            assert 3 <= polling.delay(0) <= 5
+
+    def test_poll_resets_backoff_on_state_change(self):
+        transitions = []
+        waits = []
+        polling = PollingStrategy(jitter=0, callback=lambda *args: transitions.append(args))
+        result = polling.poll('t1', job('queued', 'queued', 'queued', 'processing', 'processing',
+                                        'done'), sleep=waits.append)
+
+        assert result == {'status': 'done'}
+        assert waits == [1, 2, 4, 1, 2]
+        assert transitions == [('t1', None, 'queued'), ('t1', 'queued', 'processing'),
+                               ('t1', 'processing', 'done')]
+
+    def test_poll_deadline(self):
+        polling = PollingStrategy(initial_interval=0.01, jitter=0, deadline=0.05)
+        assert_raises(PollingTimeout, polling.poll, 't1', job('processing'))
+
+    def test_granule_download_reports_states(self):
+        statuses = ['queued', 'processing', 'processing', 'partial error']
+
+        def handler(method, url, kwargs):
+            if method == 'POST':
+                return json.dumps({'token': 't1'})
+            return json.dumps({'status': statuses.pop(0)})
+        session = StubSession(handler)
+        transitions = []
+        polling = PollingStrategy(initial_interval=0,
+                                  callback=lambda *args: transitions.append(args))
+        l2ss = L2SS(transport=Transport(session=session))
+
+        assert_raises(Exception, l2ss.granule_download, '{}', polling=polling)
+        assert [status for _, _, status in transitions] == ['queued', 'processing', 'partial error']
+        assert len(session.calls) == 5
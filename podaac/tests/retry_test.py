@@ -0,0 +1,104 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..mcc import MCC
+from ..oceancolor import OceanColor
+from ..podaac import Podaac
+from ..retry import RetryPolicy
+from ..transport import Transport
+from .stub import StubSession
+import requests
+import unittest
+
+
+def flaky_server(failures):
+    '''Answers with each of `failures` in turn, a status or an exception \
+    to raise, then with 200.'''
+    failures = list(failures)
+
+    def handler(method, url, kwargs):
+        if failures:
+            failure = failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return failure, 'Failed'
+        return '<metadata/>'
+    return StubSession(handler)
+
+
+class TestRetry(unittest.TestCase):
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=0)
+        assert [policy.backoff(attempt) for attempt in range(4)] == [1, 2, 4, 5]
+        policy = RetryPolicy(backoff_factor=1, jitter=0.5)
+        assert all(2 <= policy.backoff(2) <= 4 for _ in range(50))
+
+        response = requests.Response()
+        response.headers['Retry-After'] = '3'
+        assert RetryPolicy(backoff_factor=0).backoff(0, response) == 3
+        assert RetryPolicy(backoff_factor=0, max_backoff=1).backoff(0, response) == 1
+        assert RetryPolicy(backoff_factor=0, respect_retry_after=False).backoff(0, response) == 0
+
+    def test_transient_failures_are_retried(self):
+        session = flaky_server([503, requests.exceptions.ConnectionError('reset'), 408])
+        policy = RetryPolicy(backoff_factor=0)
+        podaac = Podaac(transport=Transport(session=session, retry=policy))
+
+        assert podaac.dataset_metadata(dataset_id='PODAAC-ASOP2-25X01') == '<metadata/>'
+        assert len(session.calls) == 4
+        assert policy.metrics() == {'retries': 3, 'recovered': 1, 'exhausted': 0,
+                                    'reasons': {503: 1, 408: 1, 'ConnectionError': 1}}
+
+    def test_permanent_failures_fail_fast(self):
+        session = flaky_server([404])
+        policy = RetryPolicy(backoff_factor=0)
+        podaac = Podaac(transport=Transport(session=session, retry=policy))
+        with self.assertRaises(requests.exceptions.HTTPError):
+            podaac.dataset_metadata(dataset_id='PODAAC-ASOP2-25X01')
+        assert len(session.calls) == 1
+
+        session = flaky_server([503] * 3)
+        transport = Transport(session=session, retry=policy)
+        assert transport.post('https://podaac.jpl.nasa.gov/ws/').status_code == 503
+        assert len(session.calls) == 1
+
+        session = flaky_server([503] * 3)
+        transport = Transport(session=session, retry=RetryPolicy(max_retries=1, backoff_factor=0))
+        assert transport.get('https://podaac.jpl.nasa.gov/ws/').status_code == 503
+        assert len(session.calls) == 2
+        assert transport.retry.metrics()['exhausted'] == 1
+        assert policy.metrics()['retries'] == 0
+
+    def test_policy_is_shared_between_clients(self):
+        policy = RetryPolicy(backoff_factor=0)
+        session = flaky_server([502, 504])
+        transport = Transport(session=session, retry=policy)
+        Podaac(transport=transport).dataset_metadata(dataset_id='PODAAC-ASOP2-25X01')
+        MCC(transport=transport).check_remote_file('ACDD', 'https://podaac.jpl.nasa.gov/x.nc')
+
+        assert policy.metrics()['retries'] == 2
+        policy.reset()
+        assert policy.metrics() == {'retries': 0, 'recovered': 0, 'exhausted': 0, 'reasons': {}}
+
+    def test_read_only_post_is_retried(self):
+        policy = RetryPolicy(backoff_factor=0)
+        session = flaky_server([503, 502])
+        ocean_color = OceanColor(transport=Transport(session=session, retry=policy))
+
+        assert ocean_color.file_search(sensor='aqua', search='*DAY_CHL*') == '<metadata/>'
+        assert [call[0] for call in session.calls] == ['POST'] * 3
+        assert policy.metrics()['retries'] == 2 and 'POST' not in policy.methods
+        policy.reset()
+        assert policy.allowing('post').metrics()['retries'] == 0
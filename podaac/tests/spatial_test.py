@@ -0,0 +1,101 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .. import spatial
+from ..atom import Feed
+from ..records import Granule
+from ..spatial import SpatialIndex, bbox_polygon, intersects
+from .stub import FEED, fixture
+import unittest
+
+# A diagonal swath from (0, 0) to (40, 40) which is 2 degrees wide. Its
+# bounding box covers (0, 40) but the swath itself does not.
+SWATH = ((((0, 0), (2, 0), (42, 40), (40, 40)),),)
+# A square crossing the antimeridian with a gap in its middle.
+RING = ((((170, -10), (190, -10), (190, 10), (170, 10)),
+         ((175, -5), (185, -5), (185, 5), (175, 5))),)
+
+ENTRIES = ('<entry xmlns:gml="http://www.opengis.net/gml"><title>polygon.nc</title>'
+           '<georss:box>0 0 40 42</georss:box>'
+           '<georss:polygon>0 0 0 2 40 42 40 40 0 0</georss:polygon></entry>'
+           '<entry xmlns:gml="http://www.opengis.net/gml"><title>gml.nc</title><georss:where>'
+           '<gml:Polygon><gml:exterior><gml:LinearRing><gml:posList>'
+           '-10 170 -10 -170 10 -170 10 170</gml:posList></gml:LinearRing></gml:exterior>'
+           '<gml:interior><gml:LinearRing><gml:posList>-5 175 -5 -175 5 -175 5 175'
+           '</gml:posList></gml:LinearRing></gml:interior></gml:Polygon></georss:where></entry>'
+           '<entry><title>box.nc</title><georss:box>-10 350 10 370</georss:box></entry>'
+           '<entry><title>none.nc</title></entry>')
+
+
+def granule(name, footprint=None, box=None):
+    return Granule(name, None, None, None, None, None, None, None, None, box, (), footprint)
+
+
+class TestSpatial(unittest.TestCase):
+
+    def check_intersects(self):
+        assert intersects(SWATH, bbox_polygon('10,9,12,12'))
+        assert not intersects(SWATH, bbox_polygon('0,30,5,40'))
+        assert intersects(RING, bbox_polygon('-179,8,-178,9'))
+        assert intersects(RING, bbox_polygon('188,-9,189,-8'))
+        assert not intersects(RING, bbox_polygon('179,-1,-179,1'))
+        assert intersects(RING, bbox_polygon('172,-1,-178,1'))
+        assert not intersects(RING, bbox_polygon('0,-1,10,1'))
+        # a query surrounding the whole footprint
+        assert intersects(SWATH, bbox_polygon('-50,-50,50,50'))
+
+    def test_intersects(self):
+        self.check_intersects()
+
+    def test_intersects_without_numpy(self):
+        numpy, spatial.np = spatial.np, None
+        try:
+            self.check_intersects()
+        finally:
+            spatial.np = numpy
+
+    def test_footprints_are_parsed(self):
+        granules = list(Feed(FEED % (4, 0, 4, ENTRIES)).granules())
+
+        assert granules[0].footprint == ((((0, 0), (2, 0), (42, 40), (40, 40), (0, 0)),),)
+        assert granules[1].footprint == ((((170, -10), (-170, -10), (-170, 10), (170, 10)),
+                                          ((175, -5), (-175, -5), (-175, 5), (175, 5))),)
+        assert granules[2].footprint is None and granules[3].footprint is None
+        assert all(g.footprint is None for g in Feed(fixture('granule_search.xml')).granules())
+
+    def test_index(self):
+        granules = list(Feed(FEED % (4, 0, 4, ENTRIES)).granules())
+        index = SpatialIndex(granules, cell_size=5)
+
+        assert len(index) == 3
+        assert [g.name for g in index.query('11,9,12,12')] == ['polygon.nc']
+        assert [g.name for g in index.candidates('0,30,5,40')] == ['polygon.nc']
+        assert index.query('0,30,5,40') == []
+        assert [g.name for g in index.query('-179,8,-178,9')] == ['gml.nc']
+        assert index.query('179,-1,-179,1') == []
+        assert [g.name for g in index.query('355,-1,-5,1')] == ['box.nc']
+        assert [g.name for g in index.query('355,-1,5,1')] == ['polygon.nc', 'box.nc']
+        assert [g.name for g in index.query(polygon=(((-5, -5), (5, -5), (0, 5)),))] == \
+            ['polygon.nc', 'box.nc']
+
+        boxes = [granule('g%d' % i, box=(i % 80, i % 300 - 150, i % 80 + 1, i % 300 - 149))
+                 for i in range(5000)]
+        many = SpatialIndex(boxes)
+        found = many.query('0,10,20,30')
+        assert len(many.candidates('0,10,20,30')) < 1000
+        assert found and found == [g for g in boxes
+                                   if 0 <= g.box[1] + 1 and g.box[1] <= 20 and
+                                   10 <= g.box[0] + 1 and g.box[0] <= 30]
+        with self.assertRaises(ValueError):
+            many.query()
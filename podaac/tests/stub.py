@@ -0,0 +1,111 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from io import BytesIO
+import gzip
+import os
+import threading
+import requests
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+
+
+def fixture(name):
+    '''Returns the bytes of a file in the tests directory.'''
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def gzip_bytes(data):
+    '''Returns `data` as a gzip member; gzip.compress is Python 3 only.'''
+    buffer = BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+class StubSession(requests.Session):
+    '''A session which answers requests locally. `handler` is called with \
+    (method, url, kwargs) and returns a body, or a (status, body) or \
+    (status, body, headers) tuple. Every call is recorded in `calls`.'''
+
+    def __init__(self, handler=None):
+        super(StubSession, self).__init__()
+        self.handler = handler or (lambda method, url, kwargs: b'')
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.calls.append((method, url, kwargs))
+        result = self.handler(method, url, kwargs)
+        status, headers = 200, {}
+        if isinstance(result, tuple):
+            if len(result) == 3:
+                status, result, headers = result
+            else:
+                status, result = result
+        if not isinstance(result, bytes):
+            result = result.encode('utf-8')
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers.update(headers)
+        response._content = result
+        response.raw = BytesIO(result)
+        return response
+
+
+FEED = ('<feed xmlns="http://www.w3.org/2005/Atom" '
+        'xmlns:georss="http://www.georss.org/georss" '
+        'xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+        'xmlns:podaac="https://podaac.jpl.nasa.gov/opensearch/" '
+        'xmlns:time="http://a9.com/-/opensearch/extensions/time/1.0/">'
+        '<title>PO.DAAC Granule Search Results</title>'
+        '<opensearch:totalResults>%d</opensearch:totalResults>'
+        '<opensearch:startIndex>%d</opensearch:startIndex>'
+        '<opensearch:itemsPerPage>%d</opensearch:itemsPerPage>%s</feed>')
+
+ENTRY = ('<entry><title>%(name)s</title>'
+         '<link href="https://podaac-opendap.jpl.nasa.gov/opendap/allData/%(name)s.html" '
+         'title="OPeNDAP URL"/>'
+         '<link href="https://podaac-tools.jpl.nasa.gov/drive/files/allData/%(name)s" '
+         'title="HTTP URL"/>'
+         '<podaac:datasetId>%(dataset_id)s</podaac:datasetId>'
+         '<georss:box>%(box)s</georss:box>'
+         '<time:start>%(start)s</time:start><time:end>%(end)s</time:end></entry>')
+
+
+def granule_feed(total_results, start_index, items_per_page, dataset_id='PODAAC-TEST'):
+    '''Builds one page of a granule search Atom feed whose entries are \
+    named granule_<index>.nc and are one hour long each, starting on \
+    2018-01-01.'''
+    entries = []
+    for index in range(start_index, min(start_index + items_per_page, total_results)):
+        entries.append(ENTRY % {
+            'name': 'granule_%05d.nc' % index,
+            'dataset_id': dataset_id,
+            'box': '%d %d %d %d' % (-10 + index % 5, -20, 10 + index % 5, 20),
+            'start': '2018-01-%02dT%02d:00:00Z' % (1 + index // 24, index % 24),
+            'end': '2018-01-%02dT%02d:59:59Z' % (1 + index // 24, index % 24)})
+    return FEED % (total_results, start_index, items_per_page, ''.join(entries))
+
+
+def query_value(url, name, default=None):
+    '''Returns the value of a query parameter of a URL.'''
+    for pair in url.split('?', 1)[-1].split('&'):
+        key, _, value = pair.partition('=')
+        if key == name:
+            return value
+    return default
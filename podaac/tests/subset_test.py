@@ -0,0 +1,118 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..podaac import Podaac
+from ..polling import PollingStrategy
+from ..subset import SubsetJobManager
+from ..transport import Transport
+from .stub import StubSession, query_value
+from io import BytesIO
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
+from future.moves.urllib.parse import parse_qs
+
+
+def result_zip(name):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr(name, b'subsetted ' + name.encode('utf-8'))
+    return buffer.getvalue()
+
+
+class SubsetServer:
+    '''Simulates the PO.DAAC subset service: each job reports 'submitted' \
+    for `polls` status calls, then 'done' with the URL of a result zip \
+    holding one granule named after the requested granule id.'''
+
+    def __init__(self, polls=2, failing=()):
+        self.polls = polls
+        self.failing = failing
+        self.jobs = {}
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, kwargs):
+        with self.lock:
+            if method == 'POST':
+                query = json.loads(parse_qs(kwargs['data'])['query'][0])
+                token = 'token-%d' % len(self.jobs)
+                self.jobs[token] = [query['query'][0]['granuleIds'][0], 0]
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+                return json.dumps({'status': 'submitted', 'token': token})
+            if 'subset/status' in url:
+                job = self.jobs[query_value(url, 'token')]
+                job[1] += 1
+                if job[1] <= self.polls:
+                    return json.dumps({'status': 'submitted'})
+                if job[1] == self.polls + 1:
+                    self.running -= 1
+                if job[0] in self.failing:
+                    return json.dumps({'status': 'error'})
+                return json.dumps({'status': 'done',
+                                   'resultURLs': ['https://podaac.jpl.nasa.gov/ws/results/%s.zip'
+                                                  % job[0]]})
+        name = url.split('/')[-1][:-len('.zip')]
+        return result_zip('subsetted-' + name)
+
+
+def subset_request(granule):
+    return {'email': '', 'query': [{'compact': 'true', 'datasetId': 'PODAAC-ASOP2-25X01',
+                                    'bbox': '-180,-90,180,90', 'variables': ['wvc_index'],
+                                    'granuleIds': [granule]}]}
+
+
+class TestSubset(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_granule_subset(self):
+        request_path = os.path.join(self.path, 'request.json')
+        with open(request_path, 'w') as f:
+            json.dump(subset_request('ascat_1.l2.nc'), f)
+        podaac = Podaac(transport=Transport(session=StubSession(SubsetServer(polls=0))))
+
+        assert podaac.granule_subset(request_path, path=self.path) == 'subsetted-ascat_1.l2.nc'
+        assert sorted(os.listdir(self.path)) == ['request.json', 'subsetted-ascat_1.l2.nc']
+        with self.assertRaises(ValueError) as raised:
+            podaac.granule_subset(request_path, path=self.path, members=['missing.nc'])
+        assert 'ascat_1.l2.nc.zip' in str(raised.exception)
+        assert 'missing.nc' in str(raised.exception)
+
+    def test_granule_subset_all(self):
+        server = SubsetServer(polls=2, failing=('ascat_3.l2.nc',))
+        podaac = Podaac(transport=Transport(session=StubSession(server)))
+        manager = SubsetJobManager(podaac, max_jobs=3, polling=PollingStrategy(initial_interval=0))
+        finished = []
+        granules = ['ascat_%d.l2.nc' % i for i in range(10)]
+        results = manager.run([subset_request(g) for g in granules], path=self.path,
+                              callback=finished.append)
+
+        assert server.max_running == 3
+        assert len(finished) == 10
+        assert [r.granules for r in results if r.error is None] == \
+            [[os.path.join(self.path, 'subsetted-' + g)] for g in granules if g != 'ascat_3.l2.nc']
+        assert results[3].status == 'error' and results[3].granules == []
+        assert sorted(os.listdir(self.path)) == \
+            sorted('subsetted-' + g for g in granules if g != 'ascat_3.l2.nc')
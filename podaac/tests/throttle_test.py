@@ -0,0 +1,157 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..podaac import Podaac
+from ..throttle import HostThrottle, host, retry_after
+from ..transport import Transport
+from .stub import StubSession, query_value
+import requests
+import threading
+import time
+import unittest
+
+URL = 'https://podaac.jpl.nasa.gov/ws/metadata/granule/'
+ISO = ('<gmi:MI_Metadata xmlns:gmi="http://www.isotc211.org/2005/gmi">'
+       '<name>%s</name></gmi:MI_Metadata>')
+
+
+def metadata_server(missing=(), delay=0.01):
+    '''Answers granule metadata requests after `delay` seconds, with 404 \
+    for the granules in `missing`, and records the peak number of \
+    requests in flight in `max_in_flight`.'''
+    state = {'in_flight': 0, 'max_in_flight': 0}
+    lock = threading.Lock()
+
+    def handler(method, url, kwargs):
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        time.sleep(delay)
+        with lock:
+            state['in_flight'] -= 1
+        name = query_value(url, 'granuleName')
+        if name in missing:
+            return 404, 'Not Found'
+        return ISO % name
+    session = StubSession(handler)
+    session.state = state
+    return session
+
+
+class TestThrottle(unittest.TestCase):
+
+    def test_host(self):
+        assert host('https://PODAAC.jpl.nasa.gov/ws/metadata/granule/?a=1') == 'podaac.jpl.nasa.gov'
+        assert host('http://localhost:8080/x') == 'localhost:8080'
+
+    def test_rate_is_kept_per_host(self):
+        throttle = HostThrottle(rate=10)
+        delays = [throttle.delay('https://podaac.jpl.nasa.gov/ws/%d' % i) for i in range(3)]
+        other = throttle.delay('https://oceandata.sci.gsfc.nasa.gov/')
+
+        assert delays[0] == 0 and 0.09 < delays[1] <= 0.1 and 0.19 < delays[2] <= 0.2
+        assert other == 0
+        assert HostThrottle().delay('https://podaac.jpl.nasa.gov/') == 0
+
+    def test_granule_metadata_all(self):
+        session = metadata_server(missing=('g_3.nc', 'g_7.nc'))
+        podaac = Podaac(transport=Transport(session=session))
+        names = ['g_%d.nc' % i for i in range(20)]
+        done = []
+        results = podaac.granule_metadata_all(
+            names, dataset_id='PODAAC-GHK10-41N01', max_workers=8,
+            throttle=HostThrottle(max_in_flight=3),
+            callback=lambda name, metadata, error: done.append(name))
+
+        assert session.state['max_in_flight'] == 3
+        assert sorted(done) == sorted(names)
+        assert sorted(results) == sorted(n for n in names if n not in ('g_3.nc', 'g_7.nc'))
+        assert results['g_0.nc'].find('name').text == 'g_0.nc'
+        assert sorted(results.errors) == ['g_3.nc', 'g_7.nc']
+        assert isinstance(results.errors['g_3.nc'], requests.exceptions.HTTPError)
+        assert not results.complete
+
+        text = podaac.granule_metadata_all(['g_1.nc'], dataset_id='PODAAC-GHK10-41N01',
+                                           parse=False)
+        assert text == {'g_1.nc': ISO % 'g_1.nc'} and text.complete
+        with self.assertRaises(Exception):
+            podaac.granule_metadata_all(['g_1.nc'])
+
+    def test_token_bucket(self):
+        throttle = HostThrottle(rate=10, burst=3)
+        delays = [throttle.delay(URL) for _ in range(4)]
+
+        assert delays[:3] == [0, 0, 0] and 0.09 < delays[3] <= 0.1
+
+    def test_retry_after(self):
+        assert retry_after({'Retry-After': '120'}) == 120
+        assert retry_after({'Retry-After': 'Wed, 21 Oct 2015 07:28:30 GMT'},
+                           now=1445412480) == 30
+        assert retry_after({}) is None and retry_after(None) is None
+
+    def test_adapts_to_throttled_responses(self):
+        def response(status, headers=None):
+            result = requests.Response()
+            result.status_code = status
+            result.headers.update(headers or {})
+            return result
+        throttle = HostThrottle(rate=100, cooldown=0.5)
+        throttle.start(URL)
+        throttle.finish(URL, response(503, {'Retry-After': '2'}))
+        metrics = throttle.metrics()['podaac.jpl.nasa.gov']
+        assert metrics['throttled'] == 1 and metrics['rate'] == 50
+        assert 1.9 < metrics['pause'] <= 2
+        assert 1.9 < throttle.delay(URL) <= 2
+        assert throttle.delay('https://oceandata.sci.gsfc.nasa.gov/') == 0
+
+        throttle = HostThrottle(max_cooldown=5)
+        throttle.start(URL)
+        throttle.finish(URL, response(503, {'Retry-After': '86400'}))
+        assert 4.9 < throttle.delay(URL) <= 5
+
+        throttle = HostThrottle(cooldown=0.5)
+        pauses = []
+        for _ in range(2):
+            throttle.start(URL)
+            throttle.finish(URL, response(429))
+            pauses.append(throttle.metrics()['podaac.jpl.nasa.gov']['pause'])
+        assert 0.4 < pauses[0] <= 0.5 and 0.9 < pauses[1] <= 1
+
+        throttle = HostThrottle(rate=100)
+        throttle.start(URL)
+        throttle.finish(URL, response(503, {'Retry-After': '0'}))
+        throttle.start(URL)
+        throttle.finish(URL, response(200))
+        assert throttle.metrics()['podaac.jpl.nasa.gov']['rate'] == 60
+
+    def test_transport_throttle_is_shared(self):
+        answers = {'count': 0}
+
+        def handler(method, url, kwargs):
+            answers['count'] += 1
+            if answers['count'] == 1:
+                return 503, 'Busy', {'Retry-After': '0'}
+            return ISO % query_value(url, 'granuleName')
+        throttle = HostThrottle(max_in_flight=2)
+        transport = Transport(session=StubSession(handler), throttle=throttle, max_retries=0)
+        podaac = Podaac(transport=transport)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            podaac.granule_metadata(dataset_id='PODAAC-GHK10-41N01', granule_name='g_0.nc')
+        results = podaac.granule_metadata_all(['g_%d.nc' % i for i in range(6)],
+                                              dataset_id='PODAAC-GHK10-41N01')
+
+        assert results.complete and len(results) == 6
+        metrics = throttle.metrics()['podaac.jpl.nasa.gov']
+        assert metrics['requests'] == 7 and metrics['throttled'] == 1
+        assert metrics['in_flight'] == 0 and metrics['peak_in_flight'] <= 2
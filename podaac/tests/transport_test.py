@@ -0,0 +1,106 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ..cache import ResponseCache
+from ..throttle import HostThrottle
+from ..transport import Transport
+from ..podaac import Podaac
+from ..podaac_utils import PodaacUtils
+from ..l2ss import L2SS
+from ..mcc import MCC
+from ..oceancolor import OceanColor
+from ..drive import Drive
+from .stub import StubSession
+from .throttle_test import metadata_server
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_adapter_configuration(self):
+        transport = Transport(pool_connections=4, pool_maxsize=32, max_retries=5)
+        adapter = transport.session.get_adapter('https://podaac.jpl.nasa.gov/ws/')
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(adapter.max_retries.total, 0)
+        self.assertEqual(transport.retry.max_retries, 5)
+        self.assertIn(503, transport.retry.status_codes)
+        transport.close()
+
+    def test_clients_share_transport(self):
+        transport = Transport()
+        clients = [Podaac(transport=transport), PodaacUtils(transport=transport),
+                   L2SS(transport=transport), MCC(transport=transport),
+                   OceanColor(transport=transport),
+                   Drive(None, 'podaac', 'ZAnTpYo', transport=transport)]
+        for client in clients:
+            self.assertIs(client.transport, transport)
+        self.assertIsNot(Podaac().transport, Podaac().transport)
+
+    def test_requests_go_through_session(self):
+        session = StubSession(lambda method, url, kwargs: '<feed/>')
+        transport = Transport(timeout=30, session=session)
+        podaac = Podaac(transport=transport)
+        podaac.dataset_metadata(dataset_id='PODAAC-CCF35-01AD5')
+        podaac.granule_search(dataset_id='PODAAC-ASOP2-25X01')
+
+        self.assertEqual(len(session.calls), 2)
+        method, url, kwargs = session.calls[0]
+        self.assertEqual(method, 'GET')
+        self.assertTrue(url.startswith('https://podaac.jpl.nasa.gov/ws/metadata/dataset/'))
+        self.assertEqual(kwargs['timeout'], 30)
+
+    def test_client_lifecycle(self):
+        shared = Transport(session=StubSession())
+        shared_closes = []
+        shared.close = lambda: shared_closes.append(True)
+        with Podaac(transport=shared) as podaac:
+            self.assertIs(podaac.transport, shared)
+        self.assertEqual(shared_closes, [])
+
+        owned = Podaac()
+        owned_closes = []
+        owned.transport.close = lambda: owned_closes.append(True)
+        with owned as podaac:
+            self.assertIs(podaac, owned)
+        self.assertEqual(owned_closes, [True])
+
+        cache = ResponseCache(':memory:')
+        with Transport(session=StubSession(), cache=cache):
+            pass
+        self.assertRaises(Exception, cache.lookup, 'key')
+
+    def test_client_shared_between_threads(self):
+        session = metadata_server(delay=0.005)
+        transport = Transport(session=session, cache=ResponseCache(':memory:'),
+                              throttle=HostThrottle(max_in_flight=4))
+        names = ['g_%d.nc' % (i % 32) for i in range(128)]
+
+        def fetch(name):
+            return podaac.granule_metadata(dataset_id='PODAAC-GHK10-41N01', granule_name=name)
+        with Podaac(transport=transport) as podaac:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(fetch, names))
+            calls = len(session.calls)
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                cached = list(executor.map(fetch, names))
+
+        for name, result in zip(names, results):
+            self.assertIn('<name>%s</name>' % name, result)
+        self.assertEqual(cached, results)
+        self.assertLessEqual(session.state['max_in_flight'], 4)
+        # the second pass is answered by the cache alone
+        self.assertEqual(len(session.calls), calls)
+        transport.close()
@@ -0,0 +1,230 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from contextlib import contextmanager
+import threading
+import time
+from ._compat import urlparse
+
+# Responses telling the client to slow down.
+THROTTLE_STATUS_CODES = (408, 429, 503)
+# Slowest request rate, per second, the adaptive rate falls to.
+MIN_RATE = 0.1
+
+
+def host(url):
+    '''Returns the lower cased host name, and port if any, of a URL.'''
+    return urlparse(url).netloc.lower()
+
+
+def retry_after(headers, now=None):
+    '''Returns the seconds a Retry-After header, given in seconds or as an \
+            HTTP date, asks to wait, or None when there is none.'''
+    value = (headers or {}).get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    from email.utils import mktime_tz, parsedate_tz
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - (time.time() if now is None else now))
+
+
+class HostThrottle:
+
+    def __init__(self, max_in_flight=4, rate=None, burst=1, cooldown=1.0, max_cooldown=60.0):
+        '''Limits the load requests put on each host. At most \
+                `max_in_flight` requests to one host run at once and, when \
+                `rate` is given, a token bucket holding up to `burst` \
+                tokens lets no more than `rate` requests per second start. \
+                Limits are kept per host, so requests to PO.DAAC never wait \
+                for requests to another service.
+
+                The throttle adapts to the server: a 408, 429 or 503 \
+                response pauses every request to its host for as long as \
+                its Retry-After header asks, or else for `cooldown` \
+                seconds doubled on every consecutive throttled response, \
+                at most `max_cooldown` seconds either way, and halves the rate of the host, which then recovers by a \
+                tenth of `rate` with each successful response. Pass one \
+                throttle to a :class:`podaac.transport.Transport` to share \
+                it between every client of the transport; it may be shared \
+                between threads.
+
+        :param max_in_flight: maximum number of concurrent requests per host. \
+                None does not limit concurrency.
+        :type max_in_flight: :mod:`int`
+
+        :param rate: maximum number of requests started per second per host. \
+                None does not limit the rate.
+        :type rate: :mod:`float`
+
+        :param burst: number of requests which may start at once after an \
+                idle period, within the rate.
+        :type burst: :mod:`int`
+
+        :param cooldown: first pause, in seconds, after a throttled \
+                response without Retry-After.
+        :type cooldown: :mod:`float`
+
+        :param max_cooldown: longest pause, in seconds, after a throttled \
+                response, also capping the wait a Retry-After header asks for.
+        :type max_cooldown: :mod:`float`
+        '''
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = burst
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._semaphores = {}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def delay(self, url):
+        '''Reserves the next start time for a request to the host of `url`.
+
+        :returns: the seconds to wait before sending the request.
+        '''
+        with self._lock:
+            state = self._state(host(url))
+            now = time.time()
+            wait = max(0.0, state.paused_until - now)
+            if state.rate:
+                state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+                state.tokens -= 1
+                if state.tokens < 0:
+                    wait = max(wait, -state.tokens / state.rate)
+            state.waited += wait
+        return wait
+
+    def start(self, url):
+        '''Records a request to the host of `url` as in flight, and \
+                reserves its start time as :meth:`delay` does.
+
+        :returns: the seconds to wait before sending the request.
+        '''
+        with self._lock:
+            state = self._state(host(url))
+            state.requests += 1
+            state.in_flight += 1
+            state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+        return self.delay(url)
+
+    def finish(self, url, response=None):
+        '''Records the end of a request started with :meth:`start`, and \
+                adapts the limits of its host to the response.
+
+        :param url: the URL requested.
+        :type url: :mod:`string`
+
+        :param response: the response, or None if the request failed \
+                without one.
+        :type response: :class:`requests.Response`
+        '''
+        with self._lock:
+            state = self._state(host(url))
+            state.in_flight -= 1
+            if response is None:
+                state.errors += 1
+            elif response.status_code in THROTTLE_STATUS_CODES:
+                now = time.time()
+                state.throttled += 1
+                state.strikes += 1
+                pause = retry_after(response.headers, now)
+                if pause is None:
+                    pause = self.cooldown * 2 ** (state.strikes - 1)
+                pause = min(self.max_cooldown, pause)
+                state.paused_until = max(state.paused_until, now + pause)
+                if state.rate:
+                    state.rate = max(MIN_RATE, state.rate / 2.0)
+            elif response.status_code < 400:
+                state.strikes = 0
+                if self.rate and state.rate < self.rate:
+                    state.rate = min(self.rate, state.rate + self.rate / 10.0)
+
+    @contextmanager
+    def slot(self, url, sleep=time.sleep):
+        '''Context manager which waits for a free slot for the host of \
+                `url`, and for its turn under the rate limit, and keeps the \
+                slot until the block exits. It yields a callable to which \
+                the block passes the response, so the throttle can adapt.'''
+        semaphore = self._semaphore(host(url))
+        if semaphore is not None:
+            semaphore.acquire()
+        responses = []
+        try:
+            wait = self.start(url)
+            try:
+                if wait > 0:
+                    sleep(wait)
+                yield responses.append
+            finally:
+                self.finish(url, responses[-1] if responses else None)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    def metrics(self):
+        '''Returns a snapshot of the counters of every host, as a dict \
+                mapping each host to a dict of: `requests` started, \
+                `in_flight` and `peak_in_flight` requests, `throttled` \
+                responses, `errors` without a response, total `waited` \
+                seconds, current `rate` (None if unlimited) and seconds \
+                left in the current `pause`.'''
+        with self._lock:
+            now = time.time()
+            return dict((key, {'requests': state.requests,
+                               'in_flight': state.in_flight,
+                               'peak_in_flight': state.peak_in_flight,
+                               'throttled': state.throttled,
+                               'errors': state.errors,
+                               'waited': state.waited,
+                               'rate': state.rate,
+                               'pause': max(0.0, state.paused_until - now)})
+                        for key, state in self._hosts.items())
+
+    def _state(self, key):
+        # callers hold self._lock
+        if key not in self._hosts:
+            self._hosts[key] = _HostState(self.rate, self.burst)
+        return self._hosts[key]
+
+    def _semaphore(self, key):
+        if self.max_in_flight is None:
+            return None
+        with self._lock:
+            if key not in self._semaphores:
+                self._semaphores[key] = threading.BoundedSemaphore(self.max_in_flight)
+            return self._semaphores[key]
+
+
+class _HostState(object):
+    __slots__ = ('rate', 'tokens', 'updated', 'paused_until', 'strikes', 'requests',
+                 'in_flight', 'peak_in_flight', 'throttled', 'errors', 'waited')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.time()
+        self.paused_until = 0.0
+        self.strikes = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.throttled = 0
+        self.errors = 0
+        self.waited = 0.0
@@ -0,0 +1,247 @@
+# Copyright 2016-2019 California Institute of Technology.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from .cache import normalize_url
+from .metrics import request_size
+from .retry import RetryPolicy
+
+
+class Transport:
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_retries=3,
+                 backoff_factor=0.5, timeout=None, session=None, cache=None, throttle=None,
+                 retry=None, metrics=None):
+        '''A shared HTTP transport for the podaacpy service clients. \
+                The transport wraps a single :class:`requests.Session` so that \
+                TCP and TLS connections to PO.DAAC, L2SS, MCC and OBPG are kept \
+                alive and reused between calls. Pass the same instance to \
+                several clients to share one connection pool per host.
+
+        :param pool_connections: number of per-host connection pools to cache.
+        :type pool_connections: :mod:`int`
+
+        :param pool_maxsize: maximum number of connections kept open per host.
+        :type pool_maxsize: :mod:`int`
+
+        :param max_retries: number of times idempotent requests are retried \
+                on connection errors and on 408, 429, 500, 502, 503 and 504 \
+                responses. Ignored when `retry` is given.
+        :type max_retries: :mod:`int`
+
+        :param backoff_factor: backoff factor, in seconds, applied between \
+                retries. Ignored when `retry` is given.
+        :type backoff_factor: :mod:`float`
+
+        :param timeout: default timeout, in seconds, for every request. \
+                None waits forever.
+        :type timeout: :mod:`float`
+
+        :param session: an existing session to configure instead of a new one.
+        :type session: :class:`requests.Session`
+
+        :param cache: an optional :class:`podaac.cache.ResponseCache`. GET \
+                requests tagged with an endpoint the cache has a time to live \
+                for are answered from, and stored in, the cache. The cache \
+                is closed with the transport.
+        :type cache: :class:`podaac.cache.ResponseCache`
+
+        :param throttle: an optional :class:`podaac.throttle.HostThrottle` \
+                limiting the requests in flight, and their rate, per host, \
+                for every client sharing the transport. It slows down when \
+                a host answers 408, 429 or 503.
+        :type throttle: :class:`podaac.throttle.HostThrottle`
+
+        :param retry: the :class:`podaac.retry.RetryPolicy` deciding which \
+                failed requests are sent again, and counting the retries. \
+                Share one policy between transports to count them together.
+        :type retry: :class:`podaac.retry.RetryPolicy`
+
+        :param metrics: an optional :class:`podaac.metrics.MetricsRegistry` \
+                recording every request sent through the transport.
+        :type metrics: :class:`podaac.metrics.MetricsRegistry`
+        '''
+        self.timeout = timeout
+        self.metrics = metrics
+        self.cache = cache
+        self.throttle = throttle
+        self.retry = retry if retry is not None else \
+            RetryPolicy(max_retries=max_retries, backoff_factor=backoff_factor)
+        # requests is imported on first use, so that importing podaac stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = session if session is not None else requests.Session()
+        # retries are left to the policy, so that they are throttled and counted
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, endpoint=None, retry=None, **kwargs):
+        '''Sends a request through the pooled session.
+
+        :param method: HTTP method, e.g. 'GET' or 'POST'.
+        :type method: :mod:`string`
+
+        :param url: the URL to request.
+        :type url: :mod:`string`
+
+        :param endpoint: name of the service endpoint being called, e.g. \
+                'granule_metadata'. It selects the cache time to live.
+        :type endpoint: :mod:`string`
+
+        :param retry: a policy used for this request instead of the \
+                transport's, e.g. to retry a read-only POST.
+        :type retry: :class:`podaac.retry.RetryPolicy`
+
+        :returns: a :class:`requests.Response`.
+        '''
+        if retry is not None:
+            kwargs['_retry'] = retry
+        kwargs.setdefault('timeout', self.timeout)
+        if self.metrics is None:
+            return self._request(method, url, endpoint, kwargs)
+        started = time.time()
+        try:
+            response = self._request(method, url, endpoint, kwargs)
+        except Exception as error:
+            self.metrics.observe_request(method, url, endpoint, None, time.time() - started,
+                                         request_size(kwargs), error)
+            raise
+        self.metrics.observe_request(method, url, endpoint, response, time.time() - started,
+                                     request_size(kwargs))
+        return response
+
+    def _request(self, method, url, endpoint, kwargs):
+        ttl = self.cache.ttl(endpoint) if self.cache is not None and endpoint else None
+        if ttl is None or method != 'GET' or kwargs.get('stream'):
+            return self._send(method, url, kwargs)
+        return self._cached_request(method, url, ttl, kwargs)
+
+    def _send(self, method, url, kwargs):
+        policy = kwargs.pop('_retry', self.retry)
+        retries = policy.retries(method)
+        attempts = []
+        for attempt in range(retries + 1):
+            response = error = None
+            try:
+                response = self._attempt(method, url, kwargs)
+            except Exception as failure:
+                error = failure
+            if attempt == retries or not policy.retryable(response, error):
+                break
+            attempts.append((response, error))
+            if response is not None:
+                response.close()
+            time.sleep(policy.backoff(attempt, response))
+        policy.record(attempts, response, error)
+        if error is not None:
+            raise error
+        response.retries = len(attempts)
+        return response
+
+    def _attempt(self, method, url, kwargs):
+        if self.throttle is None:
+            return self.session.request(method, url, **kwargs)
+        with self.throttle.slot(url) as record:
+            response = self.session.request(method, url, **kwargs)
+            record(response)
+            return response
+
+    def _cached_request(self, method, url, ttl, kwargs):
+        key = normalize_url(url, kwargs.get('params'))
+        entry = self.cache.lookup(key)
+        if entry is not None and entry.expires > time.time():
+            return _cached_response(entry, url)
+        if entry is not None:
+            headers = dict(kwargs.get('headers') or {})
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+            kwargs['headers'] = headers
+        response = self._send(method, url, kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, ttl)
+            return _cached_response(entry, url)
+        if response.status_code == 200:
+            self.cache.store(key, response, ttl)
+        return response
+
+    def get(self, url, **kwargs):
+        '''Sends a GET request through the pooled session.'''
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        '''Sends a POST request through the pooled session.'''
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        '''Closes every pooled connection held by the transport, and its cache.'''
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Client:
+    '''Lifecycle shared by the service clients. A client keeps no state \
+            between calls besides its transport, whose session, cache and \
+            throttle are thread-safe, so one instance may be shared by \
+            many worker threads. Time spent parsing responses is recorded \
+            in the metrics registry of the transport, if any. A client \
+            owns the transport it creates when none is passed in: \
+            :meth:`close`, or leaving a with block, closes it. A transport \
+            passed in is left open for the other clients sharing it.'''
+
+    def _use_transport(self, transport, factory=None):
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else (factory or Transport)()
+
+    def close(self):
+        '''Closes the transport of the client if the client created it.'''
+        if self._owns_transport:
+            self.transport.close()
+
+    def _parse(self, endpoint, parse, *args):
+        metrics = getattr(self.transport, 'metrics', None)
+        if metrics is None:
+            return parse(*args)
+        with metrics.timer(endpoint):
+            return parse(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _cached_response(entry, url):
+    import requests
+    from requests.utils import get_encoding_from_headers
+    response = requests.Response()
+    response.status_code = entry.status
+    response.reason = 'OK'
+    response.url = url
+    response.headers.update(entry.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = entry.body
+    response.from_cache = True
+    return response
@@ -34,7 +34,9 @@ _classifiers = [
 ]
 _description = 'PO.DAAC Python API'
 _download_url = 'http://pypi.python.org/pypi/podaacpy/'
-_requirements = ["beautifulsoup4", "configparser", "defusedxml", "future", "pathlib2", "requests"]
+_requirements = ["beautifulsoup4", "configparser", "defusedxml", "future",
+                 "futures; python_version < '3'", "pathlib2", "requests"]
+_extras = {'aio': ["aiohttp; python_version >= '3.6'"], 'numpy': ["numpy"]}
 _keywords = ['dataset', 'granule', 'compliance', 'nasa', 'jpl', 'podaac']
 _license = 'Apache License, Version 2.0'
 _long_description = 'A python utility library for interacting with NASA JPLs PO.DAAC'
@@ -67,6 +69,7 @@ setup(
     classifiers=_classifiers,
     description=_description,
     download_url=_download_url,
+    extras_require=_extras,
     include_package_data=True,
     install_requires=_requirements,
     keywords=_keywords,